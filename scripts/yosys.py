@@ -1,7 +1,14 @@
 #!/usr/bin/python3
 
 import os
+import re
+import json
+import hashlib
+import argparse
 import subprocess
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from pyosys import libyosys as ys
 
 default_run_opts = dict(
@@ -17,27 +24,109 @@ def run(c,run_opts=default_run_opts):
 
 root = '..'
 design = ys.Design()
+# Bump when the QoR script changes, cached results are keyed by it
+qor_script_version = 1
+ltp_pattern = re.compile(r'Longest topological path in \S+ \(length=(\d+)\)')
 
-ys.run_pass(f"verilog_defaults -add -I{root}/src/main/resources/rtl_v1/include",design)
-ys.run_pass(f"read_verilog {root}/work/chisel/copperv2.v",design)
-ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/execution.v",design)
-ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/register_file.v",design)
-ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/idecoder.v",design)
+def read_design(rtl):
+    ys.run_pass(f"verilog_defaults -add -I{root}/src/main/resources/rtl_v1/include",design)
+    ys.run_pass(f"read_verilog {rtl}",design)
+    ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/execution.v",design)
+    ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/register_file.v",design)
+    ys.run_pass(f"read_verilog {root}/src/main/resources/rtl_v1/idecoder.v",design)
 
-ys.run_pass(f"prep -auto-top", design)
+    ys.run_pass(f"prep -auto-top", design)
 
-ys.run_pass("select -module Copperv2Core c:$*",design)
-ys.run_pass("submod -name bus_if",design)
-ys.run_pass("cd", design)
+    ys.run_pass("select -module Copperv2Core c:$*",design)
+    ys.run_pass("submod -name bus_if",design)
+    ys.run_pass("cd", design)
 
-modules = [module.name.str().lstrip('\\') for module in design.selected_whole_modules_warn()]
-ys.run_pass(f"design -save top", design)
+    modules = [module.name.str().lstrip('\\') for module in design.selected_whole_modules_warn()]
+    ys.run_pass(f"design -save top", design)
+    return modules
 
-for module in modules:
-    json = f"{root}/work/{module}.json"
+def render(modules):
+    for module in modules:
+        json = f"{root}/work/{module}.json"
+        ys.run_pass(f"hierarchy -top {module}", design)
+        ys.run_pass(f"write_json {json}", design)
+        ys.run_pass("design -load top", design)
+        run(f"netlistsvg {json} -o {root}/work/{module}.svg")
+
+def module_hash(module,work_dir):
+    """ Hash of the module and its submodules after prep, the cache key of its QoR """
+    rtlil = work_dir/f"{module}.il"
     ys.run_pass(f"hierarchy -top {module}", design)
-    ys.run_pass(f"write_json {json}", design)
+    ys.run_pass(f"write_rtlil {rtlil}", design)
+    ys.run_pass("design -load top", design)
+    h = hashlib.sha1(rtlil.read_bytes())
+    h.update(str(qor_script_version).encode())
+    return h.hexdigest()
+
+def parse_stat(stat):
+    """ Totals of a stat -json report of a flattened module """
+    modules = stat.get('modules',{})
+    totals = stat.get('design') or (next(iter(modules.values())) if len(modules) == 1 else {})
+    return dict(
+        cells = int(totals.get('num_cells',0)),
+        wires = int(totals.get('num_wires',0)),
+        wire_bits = int(totals.get('num_wire_bits',0)),
+        transistors = int(totals.get('estimated_num_transistors',0) or 0),
+        cells_by_type = {k:int(v) for k,v in totals.get('num_cells_by_type',{}).items()},
+    )
+
+def parse_ltp(output):
+    lengths = [int(n) for n in ltp_pattern.findall(output)]
+    return max(lengths,default=0)
+
+def module_qor(module,work_dir):
+    """ Runs in a forked worker, on its own copy of the design """
+    stat_path = work_dir/f"{module}.stat.json"
+    ltp_path = work_dir/f"{module}.ltp.txt"
     ys.run_pass("design -load top", design)
-    run(f"netlistsvg {json} -o {root}/work/{module}.svg")
+    ys.run_pass(f"hierarchy -top {module}", design)
+    ys.run_pass(f"synth -flatten -top {module}", design)
+    ys.run_pass(f"tee -q -o {stat_path} stat -json -tech cmos", design)
+    ys.run_pass(f"tee -q -o {ltp_path} ltp -noff", design)
+    return dict(**parse_stat(json.loads(stat_path.read_text())),logic_depth=parse_ltp(ltp_path.read_text()))
+
+def qor(modules,work_dir,jobs=None):
+    """ Cell, transistor and logic depth figures of every module, cached by module hash """
+    work_dir.mkdir(parents=True,exist_ok=True)
+    cache_dir = work_dir/'cache'
+    cache_dir.mkdir(exist_ok=True)
+    results, pending = {}, {}
+    for module in modules:
+        key = module_hash(module,work_dir)
+        cached = cache_dir/f"{key}.json"
+        if cached.exists():
+            results[module] = json.loads(cached.read_text())
+        else:
+            pending[module] = key
+    print(f"QoR: {len(results)} modules cached, {len(pending)} to synthesize")
+    with ProcessPoolExecutor(jobs,mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = {module:executor.submit(module_qor,module,work_dir) for module in pending}
+        for module,future in futures.items():
+            result = dict(**future.result(),rtl_hash=pending[module])
+            (cache_dir/f"{pending[module]}.json").write_text(json.dumps(result))
+            results[module] = result
+    return {module:results[module] for module in modules}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Netlist diagrams and synthesis QoR of the copperv2 modules')
+    parser.add_argument('-rtl',default=f"{root}/work/rtl/copperv2.v",help='Generated copperv2 verilog')
+    parser.add_argument('-qor',action='store_true',help='Report cells, transistors and logic depth instead of rendering')
+    parser.add_argument('-jobs',type=int,default=None,help='Parallel synthesis jobs, default the CPU count')
+    parser.add_argument('-o',dest='output',type=Path,default=Path(f"{root}/work/qor.json"),help='QoR JSON output path')
+    args = parser.parse_args()
+    modules = read_design(args.rtl)
+    if args.qor:
+        results = qor(modules,args.output.parent/'qor',args.jobs)
+        args.output.write_text(json.dumps(results,indent=2))
+        for module,result in results.items():
+            print(f"{module:<24} cells={result['cells']:<8} transistors={result['transistors']:<10} depth={result['logic_depth']}")
+        print(f"Generated: {args.output.resolve()}")
+    else:
+        render(modules)
 
-print("Done")
+    print("Done")
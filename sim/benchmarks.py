@@ -0,0 +1,76 @@
+import re
+import json
+import argparse
+from pathlib import Path
+
+DHRYSTONES_PER_DMIPS = 1757
+
+dhrystone_patterns = dict(
+    microseconds = re.compile(r'Microseconds for one run through Dhrystone:\s*(-?\d+)'),
+    dhrystones_per_second = re.compile(r'Dhrystones per Second:\s*(-?\d+)'),
+    user_time = re.compile(r'DEBUG: User_Time = (\d+)'),
+    runs = re.compile(r'Number_Of_Runs = (\d+)'),
+)
+
+def parse_dhrystone(output,period_ns):
+    """ Compute Dhrystone results from the fake UART output.
+    The exact figures need the DEBUG_RUNTIME line, the timer counts clock cycles. """
+    reported = {}
+    for name,pattern in dhrystone_patterns.items():
+        matches = pattern.findall(output)
+        if len(matches) != 0:
+            reported[name] = int(matches[-1])
+    if 'user_time' not in reported or 'runs' not in reported:
+        raise ValueError("Dhrystone output has no DEBUG_RUNTIME line, build with -DDEBUG_RUNTIME")
+    clock_mhz = 1e3/period_ns
+    cycles_per_run = reported['user_time']/reported['runs']
+    dhrystones_per_second = clock_mhz*1e6/cycles_per_run
+    return dict(
+        runs = reported['runs'],
+        cycles = reported['user_time'],
+        cycles_per_run = cycles_per_run,
+        clock_mhz = clock_mhz,
+        dhrystones_per_second = dhrystones_per_second,
+        dmips = dhrystones_per_second/DHRYSTONES_PER_DMIPS,
+        dmips_per_mhz = dhrystones_per_second/DHRYSTONES_PER_DMIPS/clock_mhz,
+        reported = reported,
+    )
+
+kernel_pattern = re.compile(r'^KERNEL (\w+)((?: \w+=\d+)*)$',re.MULTILINE)
+
+def parse_kernels(output):
+    """ Collect the kernel_report lines (see tests/common/util.h) from the fake UART output """
+    kernels = {}
+    for name,fields in kernel_pattern.findall(output):
+        result = {key:int(value) for key,value in (field.split('=') for field in fields.split())}
+        iterations = max(result.get('iterations',1),1)
+        result['cycles_per_iteration'] = result['cycles']/iterations
+        if result.get('bytes',0) != 0:
+            result['bytes_per_cycle'] = result['bytes']/max(result['cycles'],1)
+        kernels[name] = result
+    if len(kernels) == 0:
+        raise ValueError("No KERNEL lines in the output")
+    return kernels
+
+def kernel_summary(paths):
+    """ Combine *_kernels.json reports into {kernel: {dut: cycles/iteration}} """
+    summary = {}
+    for path in paths:
+        report = json.loads(Path(path).read_text())
+        for name,result in report['data'].items():
+            summary.setdefault(name,{})[report['dut']] = result['cycles_per_iteration']
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Combine per kernel benchmark reports')
+    parser.add_argument('sim_dir',type=Path,help='Directory searched for *_kernels.json reports')
+    parser.add_argument('-o',type=Path,dest='output',help='Combined JSON output path')
+    args = parser.parse_args()
+    from tabulate import tabulate
+    summary = kernel_summary(sorted(args.sim_dir.glob('**/*_kernels.json')))
+    duts = sorted({dut for results in summary.values() for dut in results})
+    print(tabulate([[name,*[results.get(dut) for dut in duts]] for name,results in sorted(summary.items())],
+        headers=['kernel',*[f'{dut} cycles/iteration' for dut in duts]],floatfmt='.1f'))
+    if args.output is not None:
+        args.output.write_text(json.dumps(summary,indent=2))
+        print(f"Generated: {args.output.resolve()}")
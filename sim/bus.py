@@ -2,7 +2,7 @@ import dataclasses
 import typing
 
 import cocotb
-from cocotb.triggers import RisingEdge, ReadOnly, NextTimeStep, Combine
+from cocotb.triggers import RisingEdge, ReadOnly, NextTimeStep, Combine, ClockCycles
 from cocotb_bus.monitors import Monitor
 from cocotb_bus.drivers import Driver
 from cocotb.log import SimLog
@@ -265,21 +265,40 @@ class BusMonitor(Monitor):
             self._recv(transaction)
 
 class BusSourceDriver(Driver):
-    def __init__(self,name,transaction_type,bfm_send_resp,bfm_drive_ready):
+    def __init__(self,name,transaction_type,bfm_send_resp,bfm_drive_ready,clock=None,latency_model=None,ready_pattern=None):
         self.name = name
         self.log = SimLog(f"cocotb.{self.name}")
         self.bfm_send_resp = bfm_send_resp
         self.bfm_drive_ready = bfm_drive_ready
         self.transaction_type = transaction_type
+        self.clock = clock
+        self.latency_model = latency_model
+        self.ready_pattern = ready_pattern
+        self.ready_enabled = False
+        self.ready_task = None
+        if (latency_model is not None or ready_pattern is not None) and clock is None:
+            raise ValueError(f"{name}: latency and ready models need a clock")
         super().__init__()
         ## reset
         self.append('assert_ready')
+    async def drive_ready_pattern(self):
+        while True:
+            await self.bfm_drive_ready(self.ready_enabled and self.ready_pattern.next())
     async def _driver_send(self, transaction, sync: bool = True):
         if isinstance(transaction, self.transaction_type):
+            if self.latency_model is not None:
+                cycles = self.latency_model.latency(transaction)
+                if cycles > 0:
+                    await ClockCycles(self.clock,cycles)
             transaction = self.transaction_type.to_reqresp(transaction)
             self.log.debug("%s responding read transaction: %s", self.name, transaction)
             await self.bfm_send_resp(**transaction['response'])
         elif transaction == "assert_ready":
-            await self.bfm_drive_ready(True)
+            self.ready_enabled = True
+            if self.ready_pattern is None:
+                await self.bfm_drive_ready(True)
+            elif self.ready_task is None:
+                self.ready_task = cocotb.start_soon(self.drive_ready_pattern())
         elif transaction == "deassert_ready":
+            self.ready_enabled = False
             await self.bfm_drive_ready(False)
@@ -0,0 +1,139 @@
+from array import array
+from collections import deque
+
+import cocotb
+from cocotb.log import SimLog
+from cocotb.triggers import RisingEdge, ReadOnly
+
+class LatencyHistogram:
+    """ Fixed size latency histogram, the last bin counts every latency >= size """
+    def __init__(self,size=64):
+        self.size = size
+        self.bins = array('Q',bytes(8*(size+1)))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+    def add(self,latency):
+        self.bins[min(latency,self.size)] += 1
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+    @property
+    def mean(self):
+        return self.total/self.count if self.count else 0.0
+    def percentile(self,p):
+        if self.count == 0:
+            return 0
+        target = p*self.count/100
+        acc = 0
+        for latency,n in enumerate(self.bins):
+            acc += n
+            if acc >= target:
+                return latency if latency < self.size else self.max
+        return self.max
+    def to_dict(self):
+        last = max((i for i,n in enumerate(self.bins) if n),default=-1)
+        return dict(
+            count = self.count,
+            mean = self.mean,
+            max = self.max,
+            p50 = self.percentile(50),
+            p90 = self.percentile(90),
+            p99 = self.percentile(99),
+            bins = list(self.bins[:last+1]),
+        )
+
+class ChannelStats:
+    def __init__(self,name,bfm):
+        self.name = name
+        self.ready = bfm.bus.ready
+        self.valid = bfm.bus.valid
+        self.busy = 0
+        self.backpressure = 0
+        self.starvation = 0
+        self.idle = 0
+    def sample(self):
+        ready = self.ready.value.binstr == '1'
+        valid = self.valid.value.binstr == '1'
+        if ready and valid:
+            self.busy += 1
+        elif valid:
+            self.backpressure += 1
+        elif ready:
+            self.starvation += 1
+        else:
+            self.idle += 1
+        return ready and valid
+    def to_dict(self):
+        return dict(busy=self.busy,backpressure=self.backpressure,starvation=self.starvation,idle=self.idle)
+
+class RequestResponseStats:
+    """ Request to response latency of an in order request/response channel pair """
+    def __init__(self,name,request,response,histogram_size):
+        self.name = name
+        self.request = request
+        self.response = response
+        self.pending = deque()
+        self.histogram = LatencyHistogram(histogram_size)
+        self.outstanding = 0
+    def sample(self,cycle,request_fire,response_fire):
+        if len(self.pending) != 0:
+            self.outstanding += 1
+        if request_fire:
+            self.pending.append(cycle)
+        if response_fire and len(self.pending) != 0:
+            self.histogram.add(cycle - self.pending.popleft())
+
+class BusStats:
+    """ Per cycle ready/valid accounting of the six CoppervBusBfm channels """
+    pairs = dict(
+        ir = ('ir_addr','ir_data'),
+        dr = ('dr_addr','dr_data'),
+        dw = ('dw_data_addr','dw_resp'),
+    )
+    def __init__(self,bus_bfm,histogram_size=64):
+        self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
+        self.bus_bfm = bus_bfm
+        self.channels = {}
+        self.latency = {}
+        for pair,(request,response) in self.pairs.items():
+            for name in (request,response):
+                self.channels[name] = ChannelStats(name,getattr(bus_bfm,f"{name}_bfm"))
+            self.latency[pair] = RequestResponseStats(pair,request,response,histogram_size)
+        self.cycles = 0
+        cocotb.start_soon(self.sample())
+    async def sample(self):
+        while True:
+            await RisingEdge(self.bus_bfm.clock)
+            await ReadOnly()
+            if self.bus_bfm.in_reset:
+                continue
+            self.cycles += 1
+            fired = {name:channel.sample() for name,channel in self.channels.items()}
+            for latency in self.latency.values():
+                latency.sample(self.cycles,fired[latency.request],fired[latency.response])
+    @property
+    def bound(self):
+        fetch = self.latency['ir'].outstanding
+        data = self.latency['dr'].outstanding + self.latency['dw'].outstanding
+        return 'fetch' if fetch >= data else 'load/store'
+    def to_dict(self):
+        return dict(
+            cycles = self.cycles,
+            bound = self.bound,
+            channels = {name:channel.to_dict() for name,channel in self.channels.items()},
+            latency = {name:dict(**latency.histogram.to_dict(),outstanding=latency.outstanding)
+                for name,latency in self.latency.items()},
+        )
+    def table(self):
+        from tabulate import tabulate
+        cycles = max(self.cycles,1)
+        channels = tabulate([[name,c.busy,f"{100*c.busy/cycles:.1f}",c.backpressure,c.starvation,c.idle]
+                for name,c in self.channels.items()],
+            headers=['channel','busy','util %','valid not ready','ready not valid','idle'])
+        latency = tabulate([[name,l.histogram.count,f"{l.histogram.mean:.2f}",l.histogram.percentile(50),
+                l.histogram.percentile(90),l.histogram.percentile(99),l.histogram.max,l.outstanding]
+                for name,l in self.latency.items()],
+            headers=['pair','count','mean','p50','p90','p99','max','outstanding cycles'])
+        return f"{channels}\n\n{latency}\n\n{self.cycles} cycles, {self.bound} bound"
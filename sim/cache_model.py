@@ -0,0 +1,131 @@
+from array import array
+
+from bus import BusWriteTransaction
+
+class Cache:
+    """ Set associative cache timing model with LRU replacement.
+    Only tags are modelled, data always comes from the Testbench memory. """
+    write_policies = ('write-back','write-through')
+    def __init__(self,name,size=4096,ways=2,line_size=16,hit_latency=0,miss_latency=10,
+            write_policy='write-back',write_allocate=True,uncached_base=0x80000000):
+        if write_policy not in self.write_policies:
+            raise ValueError(f"{name}: unknown write policy {write_policy}, expected one of {self.write_policies}")
+        if size % (ways*line_size) != 0:
+            raise ValueError(f"{name}: size {size} is not a multiple of ways*line_size {ways*line_size}")
+        self.name = name
+        self.size = size
+        self.ways = ways
+        self.line_size = line_size
+        self.sets = size // (ways*line_size)
+        if line_size & (line_size-1) or self.sets & (self.sets-1):
+            raise ValueError(f"{name}: line size and set count must be powers of two")
+        self.offset_bits = line_size.bit_length() - 1
+        self.set_mask = self.sets - 1
+        self.index_bits = self.sets.bit_length() - 1
+        self.hit_latency = hit_latency
+        self.miss_latency = miss_latency
+        self.write_policy = write_policy
+        self.write_allocate = write_allocate
+        self.uncached_base = uncached_base
+        lines = self.sets*ways
+        self.tags = array('L',[0])*lines
+        self.valid = bytearray(lines)
+        self.dirty = bytearray(lines)
+        self.last_use = array('Q',[0])*lines
+        self.accesses = 0
+        self.hits = 0
+        self.misses = 0
+        self.writebacks = 0
+        self.stall_cycles = 0
+    def lookup(self,addr):
+        line = addr >> self.offset_bits
+        base = (line & self.set_mask)*self.ways
+        tag = line >> self.index_bits
+        for way in range(base,base+self.ways):
+            if self.valid[way] and self.tags[way] == tag:
+                return base, tag, way
+        return base, tag, None
+    def victim(self,base):
+        victim = base
+        for way in range(base,base+self.ways):
+            if not self.valid[way]:
+                return way
+            if self.last_use[way] < self.last_use[victim]:
+                victim = way
+        return victim
+    def access(self,addr,write=False):
+        """ Return the cycles this access adds to the response """
+        if addr >= self.uncached_base:
+            return 0
+        self.accesses += 1
+        base, tag, way = self.lookup(addr)
+        latency = self.hit_latency
+        if way is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if not write or self.write_allocate:
+                way = self.victim(base)
+                latency += self.miss_latency
+                if self.valid[way] and self.dirty[way]:
+                    self.writebacks += 1
+                    latency += self.miss_latency
+                self.tags[way] = tag
+                self.valid[way] = 1
+                self.dirty[way] = 0
+        if write:
+            if self.write_policy == 'write-through':
+                latency += self.miss_latency
+            elif way is not None:
+                self.dirty[way] = 1
+            else:
+                latency += self.miss_latency
+        if way is not None:
+            self.last_use[way] = self.accesses
+        self.stall_cycles += latency
+        return latency
+    def latency(self,transaction):
+        return self.access(transaction.addr,write=isinstance(transaction,BusWriteTransaction))
+    @property
+    def hit_rate(self):
+        return self.hits/self.accesses if self.accesses else 0.0
+    def to_dict(self):
+        return dict(
+            size = self.size,
+            ways = self.ways,
+            line_size = self.line_size,
+            write_policy = self.write_policy,
+            accesses = self.accesses,
+            hits = self.hits,
+            misses = self.misses,
+            hit_rate = self.hit_rate,
+            writebacks = self.writebacks,
+            stall_cycles = self.stall_cycles,
+        )
+
+cache_spec_keys = dict(
+    size = ('size',int),
+    ways = ('ways',int),
+    line = ('line_size',int),
+    hit = ('hit_latency',int),
+    miss = ('miss_latency',int),
+    policy = ('write_policy',str),
+    allocate = ('write_allocate',lambda v: v.lower() in ('1','true','yes')),
+)
+
+def parse_cache_spec(name,spec):
+    """ Build a Cache from a "size=4096,ways=2,line=16,hit=0,miss=10,policy=write-back" spec """
+    kwargs = {}
+    for item in filter(None,spec.split(',')):
+        key, value = item.split('=')
+        if key not in cache_spec_keys:
+            raise ValueError(f"{name}: unknown cache parameter {key}, expected one of {list(cache_spec_keys)}")
+        arg, convert = cache_spec_keys[key]
+        kwargs[arg] = convert(value)
+    return Cache(name,**kwargs)
+
+def cache_table(caches):
+    from tabulate import tabulate
+    return tabulate([[c.name,f"{c.size}B {c.ways}-way {c.line_size}B",c.accesses,c.hits,c.misses,
+            f"{100*c.hit_rate:.2f}",c.writebacks,c.stall_cycles] for c in caches],
+        headers=['cache','geometry','accesses','hits','misses','hit %','writebacks','stall cycles'])
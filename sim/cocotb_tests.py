@@ -1,31 +1,31 @@
 import logging
 import dataclasses
+import functools
 import os
 from pathlib import Path
 
 import cocotb
-from cocotb.triggers import Join
 from cocotb.log import SimLog
-import toml
-import cocotb_utils as utils
+from cocotb.triggers import with_timeout
+from cocotb.utils import get_sim_steps, get_time_from_sim_steps
 
 from testbench import Testbench
-from riscv_utils import compile_instructions, parse_data_memory, compile_riscv_test
-
-import pyuvm as uvm
-from wb_adapter_uvm import WbAdapterTest
-
-from bus import CoppervBusSourceBfm
-from wishbone import WishboneBfm
+from profiling import profiled
 
 root_dir = Path(__file__).resolve().parent.parent
 sim_dir = root_dir/'sim'
 toml_path = sim_dir/"tests/unit_tests.toml"
-unit_tests = toml.loads(toml_path.read_text())
+
+@functools.lru_cache(maxsize=None)
+def load_unit_tests():
+    import toml
+    return toml.loads(toml_path.read_text())
 
 T_ADDR = 0x80000000
 O_ADDR = 0x80000004
 TC_ADDR = 0x80000008
+M_ADDR = 0x8000000C
+S_ADDR = 0x80000010
 T_PASS = 0x01000001
 T_FAIL = 0x02000001
 
@@ -42,13 +42,15 @@ class TestParameters:
         p = '\n'.join([f"{k} = {repr(v)}" for k,v in dataclasses.asdict(self).items()])
         return '\n' + p
 
-@cocotb.test(timeout_time=10,timeout_unit="us")
+@cocotb.test()
+@profiled
 async def unit_test(dut):
     """ Copperv unit tests """
     test_name = os.environ['TEST_NAME']
-    params = TestParameters(test_name,**unit_tests[test_name])
+    params = TestParameters(test_name,**load_unit_tests()[test_name])
     SimLog("cocotb").setLevel(logging.DEBUG)
 
+    from riscv_utils import compile_instructions, parse_data_memory
     instruction_memory = compile_instructions(params.instructions)
     data_memory = parse_data_memory(params.data_memory)
     tb = Testbench(dut,
@@ -59,17 +61,24 @@ async def unit_test(dut):
         expected_regfile_write=params.expected_regfile_write,
         instruction_memory=instruction_memory,
         data_memory=data_memory)
-    tb.bus_bfm.start_clock()
-    await tb.bus_bfm.reset()
-    await tb.finish()
-
-@cocotb.test(timeout_time=100,timeout_unit="us")
+    # The timeout is awaited in the test so that a timed out test still closes the testbench
+    try:
+        tb.bus_bfm.start_clock()
+        await tb.bus_bfm.reset()
+        await with_timeout(tb.finish(),10,'us')
+        tb.report()
+    finally:
+        tb.close()
+
+@cocotb.test()
+@profiled
 async def riscv_test(dut):
     """ RISCV compliance tests """
     test_name = os.environ['TEST_NAME']
     asm_path = Path(os.environ['ASM_PATH'])
     SimLog("cocotb").setLevel(logging.DEBUG)
 
+    from riscv_utils import compile_riscv_test
     instruction_memory, data_memory = compile_riscv_test(asm_path)
     tb = Testbench(dut,
         test_name,
@@ -79,90 +88,53 @@ async def riscv_test(dut):
         pass_fail_address = T_ADDR,
         pass_fail_values = {T_FAIL:False,T_PASS:True})
 
-    tb.bus_bfm.start_clock()
-    await tb.bus_bfm.reset()
-    await tb.end_test.wait()
-
-@cocotb.test(timeout_time=1,timeout_unit="us")
-async def verify_wishbone_adapter_test(dut):
-    """ Wishbone adapter tests """
-    wb_bfm = WishboneBfm(
-        clock=dut.clock,
-        reset=dut.reset,
-        entity=dut,
-        prefix="wb_")
-    bus_bfm = CoppervBusSourceBfm(
-        clock=dut.clock,
-        reset=dut.reset,
-        entity=dut,
-        prefix="bus_",
-    )
-    wb_bfm.start_clock()
-    await wb_bfm.reset()
-    #SimLog("bfm").setLevel(logging.DEBUG)
-    uvm.ConfigDB().set(None, "*.wb_agent.*", "BFM", wb_bfm)
-    uvm.ConfigDB().set(None, "*.bus_agent.*", "BFM", bus_bfm)
-    await uvm.uvm_root().run_test(WbAdapterTest,keep_singletons=True)
-
-async def get_adapter_test_bfms(dut):
-    SimLog("bfm").setLevel(logging.DEBUG)
-    wb_bfm = WishboneBfm(
-        clock=dut.clock,
-        reset=dut.reset,
-        entity=dut,
-        prefix="wb_")
-    bus_bfm = CoppervBusSourceBfm(
-        clock=dut.clock,
-        reset=dut.reset,
-        entity=dut,
-        prefix="bus_")
-    wb_bfm.sink_init()
-    bus_bfm.init()
-    wb_bfm.start_clock()
-    await wb_bfm.reset()
-    return wb_bfm, bus_bfm
-
-@cocotb.test(timeout_time=1,timeout_unit="us")
-async def wishbone_adapter_read_test(dut):
-    """ Wishbone adapter read test """
-    data = 101
-    addr = 123
-    wb_bfm, bus_bfm = await get_adapter_test_bfms(dut)
-    monitor = cocotb.start_soon(utils.Combine(
-        utils.anext(wb_bfm.sink_receive()),
-        utils.anext(wb_bfm.source_receive()),
-        utils.anext(bus_bfm.get_read_response()),
-        utils.anext(bus_bfm.get_read_request())))
-    cocotb.start_soon(bus_bfm.drive_ready(1))
-    await bus_bfm.send_read_request(addr)
-    cocotb.start_soon(wb_bfm.sink_reply(data))
-    wb_recv_sink, wb_recv_source, bus_resp_recv, bus_req_recv = await Join(monitor)
-    assert wb_recv_sink["addr"] == addr
-    assert wb_recv_source["data"] == data
-    assert bus_req_recv["addr"] == addr
-    assert bus_resp_recv["data"] == data
+    try:
+        tb.bus_bfm.start_clock()
+        await tb.bus_bfm.reset()
+        await with_timeout(tb.end_test.wait(),100,'us')
+        tb.report()
+    finally:
+        tb.close()
+
+@cocotb.test()
+@profiled
+async def c_test(dut):
+    """ C program tests """
+    test_name = os.environ['TEST_NAME']
+    test_dir = Path(os.environ['C_TEST_DIR'])
+    cflags = os.environ.get('C_TEST_CFLAGS','').split()
+    benchmark = os.environ.get('BENCHMARK',None)
 
-@cocotb.test(timeout_time=1,timeout_unit="us")
-async def wishbone_adapter_write_test(dut):
-    """ Wishbone adapter write test """
-    data = 101
-    addr = 123
-    strobe = 0b0100
-    wb_bfm, bus_bfm = await get_adapter_test_bfms(dut)
-    monitor = cocotb.start_soon(utils.Combine(
-        utils.anext(wb_bfm.sink_receive()),
-        utils.anext(wb_bfm.source_receive()),
-        utils.anext(bus_bfm.get_write_response()),
-        utils.anext(bus_bfm.get_write_request())))
-    cocotb.start_soon(bus_bfm.drive_ready(1))
-    await bus_bfm.send_write_request(data,addr,strobe)
-    cocotb.start_soon(wb_bfm.sink_reply())
-    wb_recv_sink, wb_recv_source, bus_resp_recv, bus_req_recv = await Join(monitor)
-    assert wb_recv_sink["addr"] == addr
-    assert wb_recv_sink["data"] == data
-    assert wb_recv_sink["sel"] == strobe
-    assert wb_recv_source["ack"] == True
-    assert bus_req_recv["addr"] == addr
-    assert bus_req_recv["data"] == data
-    assert bus_req_recv["strobe"] == strobe
-    assert bus_resp_recv["resp"] == 1
+    from riscv_utils import compile_c_test
+    instruction_memory, data_memory = compile_c_test(test_dir,cflags)
+    tb = Testbench(dut,
+        test_name,
+        instruction_memory=instruction_memory,
+        data_memory=data_memory,
+        enable_self_checking=False,
+        pass_fail_address = T_ADDR,
+        pass_fail_values = {T_FAIL:False,T_PASS:True},
+        output_address = O_ADDR,
+        timer_address = TC_ADDR,
+        marker_address = M_ADDR,
+        semihosting_address = S_ADDR)
+
+    try:
+        tb.bus_bfm.start_clock()
+        await tb.bus_bfm.reset()
+        await with_timeout(tb.end_test.wait(),100,'ms')
+        if benchmark == 'dhrystone':
+            from benchmarks import parse_dhrystone
+            period_ns = get_time_from_sim_steps(get_sim_steps(tb.bus_bfm.period,tb.bus_bfm.period_unit),'ns')
+            result = parse_dhrystone(''.join(tb.fake_uart),period_ns)
+            tb.log.info("Dhrystone: %d cycles/run, %.3f DMIPS/MHz",result['cycles_per_run'],result['dmips_per_mhz'])
+            tb.write_report('dhrystone',result)
+        elif benchmark == 'kernel':
+            from benchmarks import parse_kernels
+            kernels = parse_kernels(''.join(tb.fake_uart))
+            for name,result in kernels.items():
+                tb.log.info("Kernel %s: %.1f cycles/iteration",name,result['cycles_per_iteration'])
+            tb.write_report('kernels',kernels)
+        tb.report()
+    finally:
+        tb.close()
@@ -7,6 +7,7 @@ from cocotb.log import SimLog
 from cocotb.triggers import RisingEdge, ReadOnly, NextTimeStep, FallingEdge
 from cocotb.clock import Clock
 from cocotb.types import Logic
+from cocotb.utils import get_sim_time
 
 import typing
 import dataclasses
@@ -60,6 +61,10 @@ class SimpleBfm(Bfm):
             # self.log.debug(f"[{self.__class__.__qualname__}] in_reset: {self._reset_n._name}")
             return not bool(self._reset_n.value.integer)
         return False
+    @property
+    def cycle(self):
+        """Number of clock periods elapsed since the start of the simulation."""
+        return int(get_sim_time(self.period_unit)//self.period)
     def start_clock(self):
         cocotb.start_soon(Clock(self.clock,self.period,self.period_unit).start())
     async def reset(self):
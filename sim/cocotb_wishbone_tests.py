@@ -0,0 +1,242 @@
+import collections
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+import cocotb
+from cocotb.triggers import Join, ClockCycles, Combine
+from cocotb.utils import get_sim_time
+from cocotb.log import SimLog
+import pyuvm as uvm
+import cocotb_utils as utils
+
+from wb_adapter_uvm import WbAdapterTest, StressConfig, stress_items
+from bus import CoppervBusSourceBfm
+from wishbone import WishboneBfm
+from profiling import profiled
+from wb_interconnect import XbarConfig, XbarStats, RamSlave, serve
+
+@cocotb.test(timeout_time=1,timeout_unit="us")
+@profiled
+async def verify_wishbone_adapter_test(dut):
+    """ Wishbone adapter tests """
+    wb_bfm = WishboneBfm(
+        clock=dut.clock,
+        reset=dut.reset,
+        entity=dut,
+        prefix="wb_")
+    bus_bfm = CoppervBusSourceBfm(
+        clock=dut.clock,
+        reset=dut.reset,
+        entity=dut,
+        prefix="bus_",
+    )
+    wb_bfm.start_clock()
+    await wb_bfm.reset()
+    #SimLog("bfm").setLevel(logging.DEBUG)
+    uvm.ConfigDB().set(None, "*.wb_agent.*", "BFM", wb_bfm)
+    uvm.ConfigDB().set(None, "*.bus_agent.*", "BFM", bus_bfm)
+    await uvm.uvm_root().run_test(WbAdapterTest,keep_singletons=True)
+
+async def get_adapter_test_bfms(dut):
+    SimLog("bfm").setLevel(logging.DEBUG)
+    wb_bfm = WishboneBfm(
+        clock=dut.clock,
+        reset=dut.reset,
+        entity=dut,
+        prefix="wb_")
+    bus_bfm = CoppervBusSourceBfm(
+        clock=dut.clock,
+        reset=dut.reset,
+        entity=dut,
+        prefix="bus_")
+    wb_bfm.sink_init()
+    bus_bfm.init()
+    wb_bfm.start_clock()
+    await wb_bfm.reset()
+    return wb_bfm, bus_bfm
+
+@cocotb.test(timeout_time=1,timeout_unit="us")
+@profiled
+async def wishbone_adapter_read_test(dut):
+    """ Wishbone adapter read test """
+    data = 101
+    addr = 123
+    wb_bfm, bus_bfm = await get_adapter_test_bfms(dut)
+    monitor = cocotb.start_soon(utils.Combine(
+        utils.anext(wb_bfm.sink_receive()),
+        utils.anext(wb_bfm.source_receive()),
+        utils.anext(bus_bfm.get_read_response()),
+        utils.anext(bus_bfm.get_read_request())))
+    cocotb.start_soon(bus_bfm.drive_ready(1))
+    await bus_bfm.send_read_request(addr)
+    cocotb.start_soon(wb_bfm.sink_reply(data))
+    wb_recv_sink, wb_recv_source, bus_resp_recv, bus_req_recv = await Join(monitor)
+    assert wb_recv_sink["addr"] == addr
+    assert wb_recv_source["data"] == data
+    assert bus_req_recv["addr"] == addr
+    assert bus_resp_recv["data"] == data
+
+@cocotb.test(timeout_time=1,timeout_unit="us")
+@profiled
+async def wishbone_adapter_write_test(dut):
+    """ Wishbone adapter write test """
+    data = 101
+    addr = 123
+    strobe = 0b0100
+    wb_bfm, bus_bfm = await get_adapter_test_bfms(dut)
+    monitor = cocotb.start_soon(utils.Combine(
+        utils.anext(wb_bfm.sink_receive()),
+        utils.anext(wb_bfm.source_receive()),
+        utils.anext(bus_bfm.get_write_response()),
+        utils.anext(bus_bfm.get_write_request())))
+    cocotb.start_soon(bus_bfm.drive_ready(1))
+    await bus_bfm.send_write_request(data,addr,strobe)
+    cocotb.start_soon(wb_bfm.sink_reply())
+    wb_recv_sink, wb_recv_source, bus_resp_recv, bus_req_recv = await Join(monitor)
+    assert wb_recv_sink["addr"] == addr
+    assert wb_recv_sink["data"] == data
+    assert wb_recv_sink["sel"] == strobe
+    assert wb_recv_source["ack"] == True
+    assert bus_req_recv["addr"] == addr
+    assert bus_req_recv["data"] == data
+    assert bus_req_recv["strobe"] == strobe
+    assert bus_resp_recv["resp"] == 1
+
+def stress_read_data(addr):
+    return (addr*0x9E3779B1) & 0xFFFFFFFF
+
+async def stress_responder(wb_bfm,received):
+    """ Acknowledge every Wishbone request, reads return stress_read_data(addr) """
+    async for request in wb_bfm.sink_receive():
+        received.append(request)
+        await wb_bfm.sink_reply(stress_read_data(request['addr']))
+
+@cocotb.test()
+@profiled
+async def wishbone_adapter_stress_test(dut):
+    """ Wishbone adapter throughput under STRESS_COUNT random transactions """
+    log = SimLog('cocotb.'+__name__+'.wishbone_adapter_stress_test')
+    config = StressConfig(
+        count=int(os.environ.get('STRESS_COUNT',StressConfig.count)),
+        write_ratio=float(os.environ.get('STRESS_WRITE_RATIO',StressConfig.write_ratio)),
+        issue_rate=float(os.environ.get('STRESS_ISSUE_RATE',StressConfig.issue_rate)),
+        seed=int(os.environ.get('STRESS_SEED',StressConfig.seed)),
+    )
+    wb_bfm, bus_bfm = await get_adapter_test_bfms(dut)
+    # Per transaction debug logging would dominate the run time
+    SimLog("bfm").setLevel(logging.INFO)
+    received = collections.deque()
+    cocotb.start_soon(stress_responder(wb_bfm,received))
+    await bus_bfm.drive_ready(1)
+    read_responses = bus_bfm.get_read_response()
+    write_responses = bus_bfm.get_write_response()
+    writes = 0
+    start_wall, start_ns = time.perf_counter(), get_sim_time('ns')
+    # The adapter has a single outstanding transaction, the next request is
+    # issued as soon as the response of the previous one is received
+    for i,(delay,is_write,addr,data,strobe) in enumerate(stress_items(config)):
+        if delay != 0:
+            await ClockCycles(dut.clock,delay)
+        if is_write:
+            await bus_bfm.send_write_request(data,addr,strobe)
+            response = await write_responses.__anext__()
+            request = received.popleft()
+            assert response['resp'] == 1, f"Transaction {i}: write response {response}"
+            assert (request['addr'],request.get('data'),request.get('sel')) == (addr,data,strobe), \
+                f"Transaction {i}: Wishbone write {request}, expected addr 0x{addr:X} data 0x{data:X} sel 0x{strobe:X}"
+            writes += 1
+        else:
+            await bus_bfm.send_read_request(addr)
+            response = await read_responses.__anext__()
+            request = received.popleft()
+            assert request['addr'] == addr and 'data' not in request, \
+                f"Transaction {i}: Wishbone read {request}, expected addr 0x{addr:X}"
+            assert response['data'] == stress_read_data(addr), \
+                f"Transaction {i}: read data 0x{response['data']:X}, expected 0x{stress_read_data(addr):X}"
+    wall_time = time.perf_counter() - start_wall
+    cycles = (get_sim_time('ns') - start_ns)/wb_bfm.period
+    data = dict(
+        transactions=config.count,
+        reads=config.count-writes,
+        writes=writes,
+        issue_rate=config.issue_rate,
+        cycles=int(cycles),
+        transactions_per_cycle=config.count/cycles,
+        wall_time=wall_time,
+        transactions_per_second=config.count/wall_time,
+        cycles_per_second=cycles/wall_time,
+    )
+    test_name = f"wishbone_adapter_stress_rate{config.issue_rate:g}"
+    path = Path(f"{test_name}_throughput.json")
+    path.write_text(json.dumps(dict(test=test_name,dut="WishboneAdapter",data=data),indent=2))
+    log.info(f"{config.count} transactions in {int(cycles)} cycles: {data['transactions_per_cycle']:.3f} transactions/cycle, "
+        f"{data['transactions_per_second']:.0f} transactions/s, {data['cycles_per_second']:.0f} cycles/s")
+    log.info(f"Generated throughput report: {path.resolve()}")
+
+async def xbar_master(bfm,index,config,address_map):
+    """ Bursts of random reads and writes to one slave, each master in its own
+    slice of the slave memories so it can check its reads """
+    rng = random.Random(config.seed*1000 + index)
+    names = [region.name for region in address_map.regions]
+    references = {name:RamSlave(address_map[name].size,config.data_width) for name in ('ram','slow')}
+    remaining = config.count
+    while remaining != 0:
+        region = address_map[rng.choices(names,config.weights)[0]]
+        # An err ends the bus cycle, requests to the error device go alone
+        count = 1 if region.name == 'error' else min(config.burst,remaining)
+        slice_size = region.size//config.masters
+        issued = []
+        for _ in range(count):
+            bits = rng.getrandbits(64)
+            offset = index*slice_size + (bits & 0xFFFF) % slice_size
+            is_write = bits >> 63 == 1
+            data = (bits >> 16) & 0xFFFFFFFF
+            sel = ((bits >> 48) & 0xF) or 0xF
+            if region.name == 'error':
+                expected = dict(ack=False,err=True)
+            else:
+                request = dict(addr=offset,data=data,sel=sel) if is_write else dict(addr=offset)
+                read_data, _ = references[region.name].access(offset,request)
+                expected = dict(ack=True,err=False)
+                if not is_write:
+                    expected['data'] = read_data
+            done = await bfm.source_issue(data,region.base + offset,sel,is_write)
+            issued.append((done,expected,region.base + offset))
+        for done,expected,addr in issued:
+            await done.wait()
+            assert done.data == expected, f"Master {index} addr 0x{addr:X}: {done.data}, expected {expected}"
+        remaining -= count
+
+@cocotb.test()
+@profiled
+async def wbxbar_contention_test(dut):
+    """ Wishbone crossbar throughput, fairness and arbitration latency with every master busy """
+    log = SimLog('cocotb.'+__name__+'.wbxbar_contention_test')
+    config = XbarConfig.from_env()
+    address_map = config.address_map()
+    masters = [WishboneBfm(dut.clock,entity=dut,reset=dut.reset,prefix=f"m{i}_",pipelined=True,max_outstanding=4)
+        for i in range(config.masters)]
+    slaves = [WishboneBfm(dut.clock,entity=dut,reset=dut.reset,prefix=f"s{region.index}_",pipelined=True,max_outstanding=4)
+        for region in address_map.regions]
+    masters[0].start_clock()
+    await masters[0].reset()
+    # The pipelines sample reset, start them once it is driven
+    for bfm in masters:
+        bfm.source_init()
+    for bfm,region in zip(slaves,address_map.regions):
+        bfm.sink_init()
+        cocotb.start_soon(serve(bfm,region))
+    stats = XbarStats(masters,window_requests=config.count)
+    start_wall = time.perf_counter()
+    await Combine(*[cocotb.start_soon(xbar_master(bfm,i,config,address_map)) for i,bfm in enumerate(masters)])
+    wall_time = time.perf_counter() - start_wall
+    data = dict(**stats.to_dict(),wall_time=wall_time,cycles_per_second=stats.cycles/wall_time)
+    log.info(f"wbxbar with {config.masters} masters:\n{stats.table()}")
+    test_name = f"wbxbar_contention_m{config.masters}"
+    path = Path(f"{test_name}_throughput.json")
+    path.write_text(json.dumps(dict(test=test_name,dut="wbxbar",data=data),indent=2))
+    log.info(f"Generated throughput report: {path.resolve()}")
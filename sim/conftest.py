@@ -0,0 +1,142 @@
+import os
+import time
+import json
+import hashlib
+from pathlib import Path
+
+import pytest
+
+sim_work_dir = Path('work/sim')
+impact_dir = sim_work_dir/'impact'
+results_dir = sim_work_dir/'results'
+metrics_dir = sim_work_dir/'metrics'
+# junit properties of the tests by nodeid, written to work/sim/metrics.json
+test_metrics = {}
+
+def pytest_addoption(parser):
+    parser.addoption('--impacted',action='store_true',
+        help='Only run the tests whose RTL, testbench, program or toolchain inputs changed since they last passed')
+    parser.addoption('--result-cache',action='store_true',
+        help='Report simulation tests that already passed with the exact same inputs as cached without simulating')
+    parser.addoption('--import-profile',action='store_true',
+        help='Print the python import times of every simulation (PYTHONPROFILEIMPORTTIME), use with -s')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers','program(path): program sources of a simulation that are not in its parameters')
+    if config.getoption('import_profile'):
+        # Inherited by the simulator processes started by cocotb_test
+        os.environ['PYTHONPROFILEIMPORTTIME'] = '1'
+
+def pytest_collection_modifyitems(config, items):
+    if not config.getoption('impacted'):
+        return
+    from impact import ImpactStore, item_inputs
+    store = ImpactStore(impact_dir)
+    selected, deselected = [], []
+    for item in items:
+        (selected if store.is_impacted(item.nodeid,item_inputs(item)) else deselected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not pyfuncitem.config.getoption('result_cache'):
+        return None
+    from impact import ResultCache, is_simulation, result_key
+    if not is_simulation(pyfuncitem):
+        return None
+    pyfuncitem.result_key = result_key(pyfuncitem)
+    if ResultCache(results_dir).hit(pyfuncitem.result_key):
+        pyfuncitem.cached = True
+        return True
+    return None
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    key = getattr(item,'result_key',None)
+    if report.when == 'call' and key is not None:
+        from impact import ResultCache
+        if getattr(item,'cached',False):
+            report.cached = True
+        elif report.passed:
+            ResultCache(results_dir).store(key,item.nodeid)
+        else:
+            ResultCache(results_dir).invalidate(key)
+    if report.when == 'call' or report.outcome != 'passed':
+        from impact import ImpactStore, item_inputs
+        ImpactStore(impact_dir).save(item.nodeid,report.outcome,item_inputs(item))
+
+def pytest_report_teststatus(report, config):
+    if report.when == 'call' and getattr(report,'cached',False):
+        return 'cached', 'c', 'CACHED PASS'
+
+def pytest_sessionstart(session):
+    session.config.session_start_time = time.time()
+
+@pytest.fixture(autouse=True)
+def simulation_metrics(request, monkeypatch):
+    """ The Testbench of every simulation of the test appends its metrics to
+    TB_METRICS, they are attached to the junit report as properties """
+    from impact import is_simulation
+    if not is_simulation(request.node):
+        yield
+        return
+    path = (metrics_dir/f'{hashlib.sha1(request.node.nodeid.encode()).hexdigest()}.jsonl').resolve()
+    path.parent.mkdir(parents=True,exist_ok=True)
+    path.unlink(missing_ok=True)
+    monkeypatch.setenv('TB_METRICS',str(path))
+    yield
+    from metrics import read_metrics, combine_metrics, junit_properties
+    runs = read_metrics(path)
+    if len(runs) != 0:
+        request.node.user_properties.extend(junit_properties(combine_metrics(runs)))
+
+def pytest_runtest_logreport(report):
+    """ Collect the metrics of every test, on the xdist controller too """
+    if report.when == 'teardown' and len(report.user_properties) != 0:
+        test_metrics[report.nodeid] = dict(report.user_properties)
+
+def check_differential(session):
+    """ Compare the transaction digests of the riscv tests that ran on both
+    cores in this session, once every xdist worker is done """
+    start = getattr(session.config,'session_start_time',None)
+    if start is None or not sim_work_dir.exists():
+        return
+    from digest import session_divergences, divergence_string
+    diverged = session_divergences(sim_work_dir,start)
+    if len(diverged) == 0:
+        return
+    reporter = session.config.pluginmanager.get_plugin('terminalreporter')
+    if reporter is not None:
+        reporter.write_sep('-',f'{len(diverged)} riscv tests diverge between copperv2 and copperv1',red=True)
+        for test_name,divergences in diverged.items():
+            reporter.write_line(f"{test_name}:\n" + divergence_string(divergences,("copperv2","copperv1")))
+    session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+def pytest_sessionfinish(session, exitstatus):
+    if hasattr(session.config,'workerinput'):
+        return
+    check_differential(session)
+    if len(test_metrics) == 0:
+        return
+    from impact import atomic_write
+    atomic_write(sim_work_dir/'metrics.json',json.dumps(test_metrics,indent=2,sort_keys=True))
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """ Merge the functional coverage of this session, also across xdist workers """
+    start = getattr(config,'session_start_time',None)
+    if start is None or not sim_work_dir.exists():
+        return
+    paths = [p for p in sim_work_dir.glob('**/*_coverage.json') if p.stat().st_mtime >= start]
+    if len(paths) == 0:
+        return
+    from functional_coverage import merge_coverage, coverage_table
+    merged = merge_coverage(paths)
+    output = sim_work_dir/'coverage.json'
+    output.write_text(json.dumps({name:list(bins) for name,bins in merged.items()}))
+    terminalreporter.write_sep('-',f'functional coverage of {len(paths)} tests')
+    terminalreporter.write_line(coverage_table(merged))
+    terminalreporter.write_line(f'Generated: {output.resolve()}')
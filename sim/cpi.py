@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import argparse
+import dataclasses
+import json
+from pathlib import Path
+
+from cocotb.log import SimLog
+
+from riscv_utils import decode_instruction, is_control_transfer
+
+@dataclasses.dataclass
+class InstructionStat:
+    inst_class: str
+    count: int = 0
+    cycles: int = 0
+    taken: int = 0
+    taken_cycles: int = 0
+    writeback: int = 0
+    writeback_cycles: int = 0
+    @property
+    def cpi(self):
+        return self.cycles/self.count if self.count else 0.0
+    @property
+    def taken_cpi(self):
+        return self.taken_cycles/self.taken if self.taken else None
+    @property
+    def taken_penalty(self):
+        """Average extra cycles of a taken branch over the not taken ones, None
+        without both outcomes, e.g. for jumps that are always taken."""
+        not_taken = self.count - self.taken
+        if self.taken == 0 or not_taken == 0:
+            return None
+        return self.taken_cpi - (self.cycles - self.taken_cycles)/not_taken
+
+class CpiStats:
+    """ Attribute cycles to each fetched instruction.
+    An instruction is charged with the cycles between its own fetch and the next
+    fetch, a PC discontinuity after a branch/jump counts as taken. The last
+    fetched instruction has no successor and is not accounted. """
+    def __init__(self,bus_ir_monitor,regfile_write_monitor,get_cycle):
+        self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
+        self.get_cycle = get_cycle
+        self.stats = {}
+        self.last = None
+        self.last_writeback = True
+        bus_ir_monitor.add_callback(self.fetch_callback)
+        regfile_write_monitor.add_callback(self.regfile_callback)
+    def fetch_callback(self,transaction):
+        cycle = self.get_cycle()
+        if self.last is not None:
+            addr, decoded, last_cycle = self.last
+            stat = self.stats.get(decoded.mnemonic)
+            if stat is None:
+                stat = self.stats[decoded.mnemonic] = InstructionStat(decoded.inst_class)
+            stat.count += 1
+            stat.cycles += cycle - last_cycle
+            if is_control_transfer(decoded.inst_class) and transaction.addr != addr + 4:
+                stat.taken += 1
+                stat.taken_cycles += cycle - last_cycle
+        self.last = (transaction.addr, decode_instruction(transaction.data), cycle)
+        self.last_writeback = False
+    def regfile_callback(self,transaction):
+        if self.last is None or self.last_writeback:
+            return
+        _, decoded, fetch_cycle = self.last
+        stat = self.stats.get(decoded.mnemonic)
+        if stat is None:
+            stat = self.stats[decoded.mnemonic] = InstructionStat(decoded.inst_class)
+        stat.writeback += 1
+        stat.writeback_cycles += self.get_cycle() - fetch_cycle
+        self.last_writeback = True
+    @property
+    def instructions(self):
+        return sum(s.count for s in self.stats.values())
+    @property
+    def cycles(self):
+        return sum(s.cycles for s in self.stats.values())
+    def to_dict(self):
+        instructions = self.instructions
+        return dict(
+            instructions = instructions,
+            cycles = self.cycles,
+            cpi = self.cycles/instructions if instructions else 0.0,
+            opcodes = {k:dict(**dataclasses.asdict(v),cpi=v.cpi,taken_cpi=v.taken_cpi,taken_penalty=v.taken_penalty)
+                for k,v in sorted(self.stats.items())},
+        )
+    def table(self):
+        return cpi_table(self.to_dict())
+
+def cpi_table(data):
+    from tabulate import tabulate
+    instructions = data['instructions']
+    rows = []
+    for mnemonic,stat in sorted(data['opcodes'].items(),key=lambda i: -i[1]['count']):
+        rows.append([
+            mnemonic,
+            stat['inst_class'],
+            stat['count'],
+            f"{100*stat['count']/instructions:.1f}" if instructions else '-',
+            f"{stat['cpi']:.2f}",
+            stat['taken'] if is_control_transfer(stat['inst_class']) else '',
+            f"{stat['taken_cpi']:.2f}" if stat['taken'] else '',
+            f"{stat['taken_penalty']:.2f}" if stat['taken_penalty'] is not None else '',
+            f"{stat['writeback_cycles']/stat['writeback']:.2f}" if stat['writeback'] else '',
+        ])
+    rows.append(['total','',instructions,'100.0',f"{data['cpi']:.2f}",'','','',''])
+    return tabulate(rows,headers=['opcode','class','count','mix %','CPI','taken','taken CPI','taken penalty','writeback latency'])
+
+def merge_reports(paths):
+    """ Combine per test reports into {dut: {test: report}} """
+    merged = {}
+    for path in paths:
+        report = json.loads(Path(path).read_text())
+        merged.setdefault(report['dut'],{})[report['test']] = report['data']
+    return merged
+
+def class_summary(merged):
+    """ Per instruction class CPI of every DUT over all of its tests """
+    from tabulate import tabulate
+    totals = {}
+    for dut,tests in merged.items():
+        for data in tests.values():
+            for stat in data['opcodes'].values():
+                count, cycles = totals.setdefault(stat['inst_class'],{}).get(dut,(0,0))
+                totals[stat['inst_class']][dut] = (count + stat['count'], cycles + stat['cycles'])
+    duts = sorted(merged)
+    rows = []
+    for inst_class,per_dut in sorted(totals.items()):
+        row = [inst_class]
+        for dut in duts:
+            count, cycles = per_dut.get(dut,(0,0))
+            row.extend([count, f"{cycles/count:.2f}" if count else '-'])
+        rows.append(row)
+    headers = ['class'] + [f'{dut} {column}' for dut in duts for column in ('count','CPI')]
+    return tabulate(rows,headers=headers)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Combine per test CPI reports')
+    parser.add_argument('sim_dir',type=Path,help='Directory searched for *_cpi.json reports')
+    parser.add_argument('-o',type=Path,dest='output',help='Combined JSON output path')
+    args = parser.parse_args()
+    merged = merge_reports(sorted(args.sim_dir.glob('**/*_cpi.json')))
+    for dut,tests in sorted(merged.items()):
+        for test,data in sorted(tests.items()):
+            print(f'\n{dut} {test}')
+            print(cpi_table(data))
+    print()
+    print(class_summary(merged))
+    if args.output is not None:
+        args.output.write_text(json.dumps(merged,indent=2))
+        print(f"Generated: {args.output.resolve()}")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import deque
+from pathlib import Path
+
+from recorder import Channel, RECORD, encode, decode
+
+class InterfaceDigest:
+    """ Rolling digest of the transactions of one interface, cycles are not
+    included so the same program gives the same digest on both cores.
+    The digest of every prefix of checkpoint_interval transactions is kept,
+    once two streams diverge every later checkpoint differs too. Only the last
+    window transactions are kept to report the first divergent one. """
+    def __init__(self,channel,checkpoint_interval=256,window=4096):
+        self.channel = channel
+        self.checkpoint_interval = checkpoint_interval
+        self.hash = hashlib.blake2b(digest_size=8)
+        self.count = 0
+        self.checkpoints = []
+        self.window = deque(maxlen=window)
+    @property
+    def window_start(self):
+        """ Index of the first transaction in the window """
+        return self.count - len(self.window)
+    def add(self,transaction):
+        record = encode(self.channel,0,transaction)
+        self.hash.update(record)
+        self.window.append(record)
+        self.count += 1
+        if self.count % self.checkpoint_interval == 0:
+            self.checkpoints.append(self.hash.hexdigest())
+    def to_dict(self):
+        return dict(
+            count = self.count,
+            digest = self.hash.hexdigest(),
+            checkpoint_interval = self.checkpoint_interval,
+            checkpoints = self.checkpoints,
+            window_start = self.window_start,
+        )
+
+class TransactionDigests:
+    """ Per interface digests of the architectural transactions """
+    def __init__(self,monitors,checkpoint_interval=256,window=4096):
+        self.digests = {}
+        for channel,monitor in monitors.items():
+            digest = self.digests[channel] = InterfaceDigest(channel,checkpoint_interval,window)
+            monitor.add_callback(digest.add)
+    def to_dict(self):
+        return {channel.name:digest.to_dict() for channel,digest in self.digests.items()}
+    def write_streams(self,path):
+        """ Transaction window of every interface, used to locate the first divergence """
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        with tmp.open('wb') as f:
+            for digest in self.digests.values():
+                f.write(b''.join(digest.window))
+        os.replace(tmp,path)
+
+def first_divergent_checkpoint(a,b):
+    """ Binary search for the first differing checkpoint, len of the shorter list if none """
+    low, high = 0, min(len(a),len(b))
+    while low < high:
+        middle = (low + high)//2
+        if a[middle] == b[middle]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def read_streams(path):
+    streams = {}
+    if path is None or not Path(path).exists():
+        return streams
+    for fields in RECORD.iter_unpack(Path(path).read_bytes()):
+        streams.setdefault(Channel(fields[0]),[]).append(fields)
+    return streams
+
+def compare_digests(a,b,a_streams=None,b_streams=None):
+    """ Compare two digest reports, return {interface: divergence} for the
+    interfaces that differ. If the transaction streams are given and their
+    windows reach back to the divergent checkpoint, the first divergent
+    transaction of each side is included. """
+    divergences = {}
+    for name in a.keys() | b.keys():
+        if name not in a or name not in b:
+            divergences[name] = dict(index=None,reason='interface missing in one of the reports')
+            continue
+        da, db = a[name], b[name]
+        if da['digest'] == db['digest'] and da['count'] == db['count']:
+            continue
+        checkpoint = first_divergent_checkpoint(da['checkpoints'],db['checkpoints'])
+        start = checkpoint*da['checkpoint_interval']
+        divergence = dict(index=start,count=(da['count'],db['count']))
+        channel = Channel[name]
+        if a_streams is not None and b_streams is not None:
+            a_start, b_start = da.get('window_start',0), db.get('window_start',0)
+            if max(a_start,b_start) > start:
+                divergence['reason'] = 'checkpoint before the recorded window'
+                divergences[name] = divergence
+                continue
+            sa = a_streams.get(channel,[])[start-a_start:]
+            sb = b_streams.get(channel,[])[start-b_start:]
+            offset = 0
+            while offset < min(len(sa),len(sb)) and sa[offset] == sb[offset]:
+                offset += 1
+            divergence['index'] = start + offset
+            divergence['transactions'] = [str(decode(*s[offset]).transaction) if offset < len(s) else None
+                for s in (sa,sb)]
+        divergences[name] = divergence
+    return divergences
+
+def load_report(path):
+    path = Path(path)
+    report = json.loads(path.read_text())
+    return report, read_streams(path.with_suffix('.bin'))
+
+def compare_reports(a_path,b_path):
+    (a, a_streams), (b, b_streams) = load_report(a_path), load_report(b_path)
+    return compare_digests(a['data'],b['data'],a_streams,b_streams)
+
+def session_divergences(sim_work_dir,since):
+    """ {test: divergences} of the riscv tests of test_copperv2.py that wrote
+    both their copperv2 (test_riscv_<test>) and copperv1 (test_riscv_copperv1_<test>)
+    digest reports after since, reports of earlier sessions are not compared """
+    sim_work_dir = Path(sim_work_dir)
+    diverged = {}
+    for b_path in sorted(sim_work_dir.glob('test_riscv_copperv1_*/*_digest.json')):
+        test_name = b_path.name[:-len('_digest.json')]
+        a_path = sim_work_dir/f"test_riscv_{test_name}"/b_path.name
+        if not a_path.exists() or min(a_path.stat().st_mtime,b_path.stat().st_mtime) < since:
+            continue
+        divergences = compare_reports(a_path,b_path)
+        if divergences:
+            diverged[test_name] = divergences
+    return diverged
+
+def divergence_string(divergences,names=('a','b')):
+    lines = []
+    for name,divergence in sorted(divergences.items()):
+        lines.append(f"{name}: first divergence at transaction {divergence['index']}"
+            + (f" ({divergence['reason']})" if 'reason' in divergence else ''))
+        for side,transaction in zip(names,divergence.get('transactions',[])):
+            lines.append(f"  {side}: {transaction}")
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the transaction digests of two runs')
+    parser.add_argument('a',type=Path,help='<test>_digest.json of the first run')
+    parser.add_argument('b',type=Path,help='<test>_digest.json of the second run')
+    args = parser.parse_args()
+    divergences = compare_reports(args.a,args.b)
+    if divergences:
+        print(divergence_string(divergences,(args.a.parent.name,args.b.parent.name)))
+    else:
+        print('Digests match')
+    sys.exit(1 if divergences else 0)
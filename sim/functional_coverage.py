@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import argparse
+import json
+from array import array
+from pathlib import Path
+
+from riscv_constants import opcode_class_map, funct3_mnemonic_map, alt_mnemonic_map, reg_abi_map
+from riscv_utils import decode_instruction
+
+mnemonics = [
+    *[c for c in opcode_class_map.values() if c not in funct3_mnemonic_map],
+    *[m for inst_class in funct3_mnemonic_map.values() for m in inst_class.values()],
+    *alt_mnemonic_map.values(),
+    "unknown",
+]
+mnemonic_index = {m:i for i,m in enumerate(mnemonics)}
+branches = list(funct3_mnemonic_map["branch"].values())
+branch_index = {b:i for i,b in enumerate(branches)}
+registers = [reg_abi_map[i] for i in range(32)]
+
+coverpoint_labels = dict(
+    instruction = mnemonics,
+    rd_write = registers,
+    rs_pair = [f'{rs1},{rs2}' for rs1 in registers for rs2 in registers],
+    branch = [f'{b} {outcome}' for b in branches for outcome in ('not taken','taken')],
+    store_strobe = [f'{s:04b}' for s in range(16)],
+)
+
+class FunctionalCoverage:
+    """ Coverage bins fed by the Testbench monitors, every coverpoint is a
+    preallocated array of hit counters indexed as in coverpoint_labels """
+    def __init__(self,bus_ir_monitor,bus_dw_monitor,regfile_read_monitor,regfile_write_monitor):
+        self.bins = {name:array('Q',bytes(8*len(labels))) for name,labels in coverpoint_labels.items()}
+        self.instruction = self.bins['instruction']
+        self.rd_write = self.bins['rd_write']
+        self.rs_pair = self.bins['rs_pair']
+        self.branch = self.bins['branch']
+        self.store_strobe = self.bins['store_strobe']
+        self.last_branch = None
+        bus_ir_monitor.add_callback(self.fetch_callback)
+        bus_dw_monitor.add_callback(self.write_callback)
+        regfile_read_monitor.add_callback(self.regfile_read_callback)
+        regfile_write_monitor.add_callback(self.regfile_write_callback)
+    def fetch_callback(self,transaction):
+        if self.last_branch is not None:
+            index, addr = self.last_branch
+            self.branch[2*index + (transaction.addr != addr + 4)] += 1
+        mnemonic = decode_instruction(transaction.data).mnemonic
+        self.instruction[mnemonic_index[mnemonic]] += 1
+        index = branch_index.get(mnemonic)
+        self.last_branch = None if index is None else (index,transaction.addr)
+    def write_callback(self,transaction):
+        self.store_strobe[transaction.strobe & 0xF] += 1
+    def regfile_read_callback(self,transaction):
+        if transaction.reg2 is not None:
+            self.rs_pair[32*transaction.reg1 + transaction.reg2] += 1
+    def regfile_write_callback(self,transaction):
+        self.rd_write[transaction.reg] += 1
+    def to_dict(self):
+        return {name:list(bins) for name,bins in self.bins.items()}
+
+def merge_coverage(paths):
+    """ Sum the bins of per test coverage reports """
+    merged = {name:array('Q',bytes(8*len(labels))) for name,labels in coverpoint_labels.items()}
+    for path in paths:
+        data = json.loads(Path(path).read_text())['data']
+        for name,bins in data.items():
+            total = merged[name]
+            for i,n in enumerate(bins):
+                total[i] += n
+    return merged
+
+def coverage_table(bins):
+    from tabulate import tabulate
+    rows = []
+    for name,counts in bins.items():
+        hit = sum(1 for n in counts if n)
+        rows.append([name,hit,len(counts),f"{100*hit/len(counts):.1f}"])
+    return tabulate(rows,headers=['coverpoint','hit','bins','coverage %'])
+
+def uncovered(bins,name):
+    return [label for label,n in zip(coverpoint_labels[name],bins[name]) if n == 0]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge per test functional coverage reports')
+    parser.add_argument('sim_dir',type=Path,help='Directory searched for *_coverage.json reports')
+    parser.add_argument('-uncovered',choices=list(coverpoint_labels),action='append',default=[],
+        help='List the bins never hit of this coverpoint')
+    parser.add_argument('-o',type=Path,dest='output',help='Merged JSON output path')
+    args = parser.parse_args()
+    merged = merge_coverage(sorted(args.sim_dir.glob('**/*_coverage.json')))
+    print(coverage_table(merged))
+    for name in args.uncovered:
+        print(f'\n{name} not covered: {" ".join(uncovered(merged,name))}')
+    if args.output is not None:
+        args.output.write_text(json.dumps({name:list(bins) for name,bins in merged.items()}))
+        print(f"Generated: {args.output.resolve()}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+import argparse
+import enum
+import struct
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from cocotb.log import SimLog
+
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction
+
+# Written by verilog_testbench/testbench.v with $fwrite("%u"):
+# {aux, kind}, cycle, addr, data as little-endian 32 bit words
+TRACE_RECORD = struct.Struct('<IIII')
+
+class TraceKind(enum.IntEnum):
+    PC = 0
+    FETCH = 1
+    RD = 2
+    DR = 3
+    DW = 4
+
+TraceRecord = namedtuple('TraceRecord',['kind','aux','cycle','addr','data'])
+
+def read_trace(path, follow=None, chunk_records=4096, poll_interval=0.1):
+    """ Stream records from a binary trace file.
+    If follow is given, keep polling the file for new records while follow() is True """
+    chunk_size = TRACE_RECORD.size*chunk_records
+    pending = b''
+    with Path(path).open('rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if follow is None or not follow():
+                    break
+                time.sleep(poll_interval)
+                continue
+            buf = pending + chunk
+            usable = len(buf) - len(buf) % TRACE_RECORD.size
+            for header, cycle, addr, data in TRACE_RECORD.iter_unpack(buf[:usable]):
+                yield TraceRecord(header & 0xFF, (header >> 8) & 0xFF, cycle, addr, data)
+            pending = buf[usable:]
+    if len(pending) != 0:
+        SimLog(__name__+'.read_trace').warning("Ignoring %d trailing bytes in %s",len(pending),path)
+
+def write_trace(path, records):
+    with Path(path).open('wb') as f:
+        for r in records:
+            f.write(TRACE_RECORD.pack(r.kind | (r.aux << 8), r.cycle, r.addr, r.data))
+
+def to_transaction(record):
+    if record.kind == TraceKind.PC:
+        return record.addr
+    elif record.kind == TraceKind.FETCH:
+        return BusReadTransaction(bus_name='bus_ir',addr=record.addr,data=record.data)
+    elif record.kind == TraceKind.RD:
+        return RegFileWriteTransaction(reg=record.aux,data=record.data)
+    elif record.kind == TraceKind.DR:
+        return BusReadTransaction(bus_name='bus_dr',addr=record.addr,data=record.data)
+    elif record.kind == TraceKind.DW:
+        return BusWriteTransaction(bus_name='bus_dw',addr=record.addr,data=record.data,strobe=record.aux)
+    raise ValueError(f"Unsupported trace record: {record}")
+
+class TraceMonitor:
+    """ Stand-in for a cocotb Monitor fed from a trace instead of the simulator """
+    def __init__(self,name):
+        self.name = name
+        self._callbacks = []
+    def add_callback(self,callback):
+        self._callbacks.append(callback)
+    def _recv(self,transaction):
+        for callback in self._callbacks:
+            callback(transaction)
+
+class TraceReplay:
+    def __init__(self):
+        self.pc_monitor = TraceMonitor('pc_monitor')
+        self.bus_ir_monitor = TraceMonitor('bus_ir')
+        self.regfile_write_monitor = TraceMonitor('regfile_write')
+        self.bus_dr_monitor = TraceMonitor('bus_dr')
+        self.bus_dw_monitor = TraceMonitor('bus_dw')
+        self.monitors = {
+            TraceKind.PC: self.pc_monitor,
+            TraceKind.FETCH: self.bus_ir_monitor,
+            TraceKind.RD: self.regfile_write_monitor,
+            TraceKind.DR: self.bus_dr_monitor,
+            TraceKind.DW: self.bus_dw_monitor,
+        }
+    def run(self,records):
+        count = 0
+        for record in records:
+            self.monitors[record.kind]._recv(to_transaction(record))
+            count += 1
+        return count
+
+if __name__ == '__main__':
+    from riscv_utils import StackMonitor
+    parser = argparse.ArgumentParser(description='Read a verilog_testbench binary trace')
+    parser.add_argument('trace',type=Path,help='Trace file written with +TRACE_FILE')
+    parser.add_argument('-kind',choices=[k.name for k in TraceKind],action='append',help='Only print these record kinds')
+    parser.add_argument('-stack',action='store_true',help='Replay the trace through StackMonitor')
+    args = parser.parse_args()
+    kinds = None if args.kind is None else {TraceKind[k] for k in args.kind}
+    replay = TraceReplay()
+    if args.stack:
+        stack_monitor = StackMonitor(replay.regfile_write_monitor, replay.pc_monitor)
+    def printer(records):
+        for record in records:
+            if kinds is None or record.kind in kinds:
+                transaction = to_transaction(record)
+                if record.kind == TraceKind.PC:
+                    transaction = f'0x{transaction:X}'
+                print(f'{record.cycle:>10} {TraceKind(record.kind).name:<5} {transaction}')
+            yield record
+    count = replay.run(printer(read_trace(args.trace)))
+    if args.stack:
+        print('Stack:',stack_monitor.stack_string())
+    print(f'{count} records',file=sys.stderr)
@@ -0,0 +1,190 @@
+import ast
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from importlib import metadata
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+sim_dir = root_dir/'sim'
+tests_dir = sim_dir/'tests'
+
+# A change to any of these can affect every test, selection falls back to a full run
+infrastructure_files = [
+    sim_dir/'conftest.py',
+    sim_dir/'impact.py',
+    root_dir/'tox.ini',
+    root_dir/'requirements.txt',
+]
+program_common_dirs = [tests_dir/'common', tests_dir/'isa/macros']
+toolchain_commands = dict(
+    gcc = ['riscv64-unknown-elf-gcc','--version'],
+    icarus = ['iverilog','-V'],
+    verilator = ['verilator','--version'],
+)
+
+@functools.lru_cache(maxsize=None)
+def file_hash(path):
+    path = Path(path)
+    if not path.is_file():
+        return None
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def tool_version(name):
+    command = toolchain_commands[name]
+    if shutil.which(command[0]) is None:
+        return None
+    r = subprocess.run(command,capture_output=True,encoding='utf-8')
+    lines = (r.stdout or r.stderr).splitlines()
+    return lines[0] if lines else None
+
+def toolchain():
+    return {name:tool_version(name) for name in toolchain_commands}
+
+@functools.lru_cache(maxsize=None)
+def local_imports(path):
+    """ sim modules imported by a python file, recursively """
+    found = set()
+    pending = [Path(path)]
+    while pending:
+        module = pending.pop()
+        if module in found or not module.is_file():
+            continue
+        found.add(module)
+        for node in ast.walk(ast.parse(module.read_text())):
+            if isinstance(node,ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node,ast.ImportFrom) and node.level == 0 and node.module is not None:
+                names = [node.module]
+            else:
+                continue
+            pending += [sim_dir/f'{name.split(".")[0]}.py' for name in names]
+    return frozenset(found)
+
+def directory_files(path):
+    return [p for p in Path(path).rglob('*') if p.is_file()]
+
+def param_paths(value):
+    """ Program sources named by a test parameter: file or directory paths, or test directory names """
+    if isinstance(value,dict):
+        return [p for v in value.values() for p in param_paths(v)]
+    if not isinstance(value,str):
+        return []
+    for path in (Path(value),tests_dir/value):
+        if path.is_file():
+            return [path]
+        if path.is_dir() and path != tests_dir:
+            return directory_files(path)
+    return []
+
+def item_inputs(item):
+    """ {input name: content hash} of everything a collected test depends on:
+    RTL sources and includes, the testbench python modules, the program sources
+    and the toolchain. Programs are named by the test parameters or, when the
+    test passes a fixed one to run(), by @pytest.mark.program(path) """
+    module = getattr(item,'module',None)
+    if module is None:
+        return {}
+    files = set(local_imports(Path(module.__file__)))
+    for name,opts in vars(module).items():
+        if not name.endswith('run_opts') or not isinstance(opts,dict):
+            continue
+        files |= {Path(p) for p in opts.get('verilog_sources',[])}
+        for include in opts.get('includes',[]):
+            files |= set(directory_files(include))
+        if 'module' in opts:
+            files |= local_imports(sim_dir/f"{opts['module']}.py")
+    inputs = {}
+    params = getattr(getattr(item,'callspec',None),'params',{})
+    program = [p for value in params.values() for p in param_paths(value)]
+    for marker in item.iter_markers('program'):
+        program += [p for path in marker.args for p in param_paths(str(path))]
+    unit_tests = getattr(module,'unit_tests',None)
+    for value in params.values():
+        test_name = value.get('TEST_NAME') if isinstance(value,dict) else None
+        if isinstance(unit_tests,dict) and test_name in unit_tests:
+            inputs[f'unit_tests.toml[{test_name}]'] = hashlib.sha1(
+                json.dumps(unit_tests[test_name],sort_keys=True).encode()).hexdigest()
+    if program or inputs:
+        files |= set(program)
+        for common in program_common_dirs:
+            files |= set(directory_files(common))
+        inputs.update({f'toolchain[{k}]':v for k,v in toolchain().items()})
+    inputs.update({input_name(path):file_hash(path) for path in sorted(files)})
+    return inputs
+
+def input_name(path):
+    path = Path(path).resolve()
+    return str(path.relative_to(root_dir)) if path.is_relative_to(root_dir) else str(path)
+
+def infrastructure_hash():
+    return hashlib.sha1(json.dumps([file_hash(p) for p in infrastructure_files]).encode()).hexdigest()
+
+def atomic_write(path,text):
+    """ Readers, including other xdist workers, see either the old or the new file """
+    path = Path(path)
+    path.parent.mkdir(parents=True,exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp.write_text(text)
+    os.replace(tmp,path)
+
+class ImpactStore:
+    """ Inputs and outcome of the last run of every test, one file per test """
+    def __init__(self,path):
+        self.path = Path(path)
+    def record_path(self,nodeid):
+        return self.path/f'{hashlib.sha1(nodeid.encode()).hexdigest()}.json'
+    def load(self,nodeid):
+        path = self.record_path(nodeid)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+    def save(self,nodeid,outcome,inputs):
+        atomic_write(self.record_path(nodeid),json.dumps(dict(nodeid=nodeid,outcome=outcome,
+            infrastructure=infrastructure_hash(),inputs=inputs)))
+    def is_impacted(self,nodeid,inputs):
+        record = self.load(nodeid)
+        return record is None or record['outcome'] != 'passed' \
+            or record['infrastructure'] != infrastructure_hash() or record['inputs'] != inputs
+
+def changed_inputs(old,new):
+    return sorted(k for k in old.keys() | new.keys() if old.get(k) != new.get(k))
+
+result_env_vars = ['SIM','PLUSARGS','TB_PROFILE','WAVES','DHRYSTONE_RUNS','DHRYSTONE_CFLAGS','KERNEL_CFLAGS','STRESS_COUNT']
+
+def is_simulation(item):
+    module = getattr(item,'module',None)
+    return module is not None and any(name.endswith('run_opts') for name in vars(module))
+
+def result_key(item):
+    """ Hash of the exact inputs of a simulation test: its RTL, program and
+    toolchain inputs, every sim/*.py, the simulator and the plusargs/env """
+    sim = os.environ.get('SIM','icarus')
+    key = dict(
+        nodeid = item.nodeid,
+        inputs = item_inputs(item),
+        sim_py = {p.name:file_hash(p) for p in sorted(sim_dir.glob('*.py'))},
+        simulator = [sim,tool_version(sim) if sim in toolchain_commands else None],
+        packages = {name:metadata.version(name) for name in ('cocotb','cocotb-bus','cocotb-test')},
+        env = {name:os.environ.get(name) for name in result_env_vars},
+    )
+    return hashlib.sha256(json.dumps(key,sort_keys=True).encode()).hexdigest()
+
+class ResultCache:
+    """ Passing results by result_key, shared by the xdist workers through the file system """
+    def __init__(self,path):
+        self.path = Path(path)
+    def hit(self,key):
+        return (self.path/key).exists()
+    def store(self,key,nodeid):
+        atomic_write(self.path/key,json.dumps(dict(nodeid=nodeid,time=time.time())))
+    def invalidate(self,key):
+        try:
+            os.remove(self.path/key)
+        except FileNotFoundError:
+            pass
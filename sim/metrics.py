@@ -0,0 +1,127 @@
+import json
+import time
+from pathlib import Path
+
+import cocotb
+from cocotb.utils import get_sim_time
+
+def sign_extend(value,bits):
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+def is_successor(addr,inst,next_addr):
+    """ Whether next_addr is the architectural successor of inst at addr: the
+    next instruction, the target of a jal or of a taken branch, anything after
+    a jalr. A fetch followed by anything else was flushed or fetched again. """
+    if next_addr == addr + 4:
+        return True
+    opcode = inst & 0x7F
+    if opcode == 0x67:
+        return True
+    if opcode == 0x6F:
+        offset = ((inst >> 31) << 20) | (((inst >> 12) & 0xFF) << 12) | (((inst >> 20) & 1) << 11) | (((inst >> 21) & 0x3FF) << 1)
+        return next_addr == (addr + sign_extend(offset,21)) & 0xFFFFFFFF
+    if opcode == 0x63:
+        offset = ((inst >> 31) << 12) | (((inst >> 7) & 1) << 11) | (((inst >> 25) & 0x3F) << 5) | (((inst >> 8) & 0xF) << 1)
+        return next_addr == (addr + sign_extend(offset,13)) & 0xFFFFFFFF
+    return False
+
+class SimMetrics:
+    """ Cost of a simulation: wall and simulated time, cycles, transactions per
+    channel and retired instructions. An instruction retires when the next
+    fetch is its architectural successor (see is_successor), so flushed and
+    repeated fetches, which the bus_ir transaction count includes, are not
+    counted, nor is the last fetch of the simulation.
+    Python time is the time spent in the cocotb scheduler reacting to triggers,
+    the rest of the wall time is spent in the simulator. """
+    def __init__(self,monitors,get_cycle,get_time=None,scheduler=None,clock=time.perf_counter):
+        self.get_cycle = get_cycle
+        self.get_time = get_time or (lambda: get_sim_time('ns'))
+        self.clock = clock
+        self.transactions = {name:0 for name in monitors}
+        for name,monitor in monitors.items():
+            monitor.add_callback(self.counter_callback(name))
+        self.retired = 0
+        self.last_fetch = None
+        if 'bus_ir' in monitors:
+            monitors['bus_ir'].add_callback(self.fetch_callback)
+        self.python_time = 0.0
+        self.depth = 0
+        self.start_wall = self.clock()
+        self.start_time = self.get_time()
+        self.start_cycle = get_cycle()
+        self.end_wall = None
+        self.scheduler = scheduler or cocotb.scheduler
+        self.react = self.scheduler._react
+        # Every trigger primed from now on calls back into Python through this
+        self.scheduler._react = self.timed_react
+    def counter_callback(self,name):
+        def callback(transaction):
+            self.transactions[name] += 1
+        return callback
+    def fetch_callback(self,transaction):
+        if self.last_fetch is not None and is_successor(*self.last_fetch,transaction.addr):
+            self.retired += 1
+        self.last_fetch = (transaction.addr,transaction.data)
+    def timed_react(self,trigger):
+        self.depth += 1
+        start = self.clock()
+        try:
+            return self.react(trigger)
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.python_time += self.clock() - start
+    def close(self):
+        if self.end_wall is None:
+            self.end_wall = self.clock()
+            self.end_time = self.get_time()
+            self.end_cycle = self.get_cycle()
+            self.scheduler._react = self.react
+    def to_dict(self):
+        self.close()
+        wall_time = self.end_wall - self.start_wall
+        return dict(
+            wall_time = wall_time,
+            sim_time_ns = self.end_time - self.start_time,
+            cycles = self.end_cycle - self.start_cycle,
+            transactions = dict(self.transactions),
+            instructions = self.retired,
+            python_time = self.python_time,
+            simulator_time = max(wall_time - self.python_time,0.0),
+        )
+
+def append_metrics(path,test,data):
+    """ One JSON line per simulation, a pytest test can run several """
+    with Path(path).open('a') as f:
+        f.write(json.dumps(dict(test=test,**data)) + '\n')
+
+def read_metrics(path):
+    path = Path(path)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line]
+
+def combine_metrics(runs):
+    """ Sum the metrics of the simulations of one test """
+    combined = dict(simulations=len(runs),wall_time=0.0,sim_time_ns=0,cycles=0,transactions={},
+        instructions=0,python_time=0.0,simulator_time=0.0)
+    for run in runs:
+        for name,value in run.items():
+            if name == 'transactions':
+                for channel,count in value.items():
+                    combined['transactions'][channel] = combined['transactions'].get(channel,0) + count
+            elif name in combined and name != 'simulations':
+                combined[name] += value
+    return combined
+
+def junit_properties(metrics):
+    """ Flat (name, value) pairs for record_property / junit """
+    properties = []
+    for name,value in metrics.items():
+        if isinstance(value,dict):
+            properties += [(f'{name}_{k}',v) for k,v in sorted(value.items())]
+        elif isinstance(value,float):
+            properties.append((name,round(value,6)))
+        else:
+            properties.append((name,value))
+    return properties
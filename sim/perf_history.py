@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tabulate import tabulate
+
+default_db = Path(__file__).resolve().parent.parent/'work/perf_history.sqlite'
+# Set in the environment of the runs being recorded, they make up the default configuration
+config_env_vars = ['SIM','PLUSARGS','DHRYSTONE_RUNS','DHRYSTONE_CFLAGS','KERNEL_CFLAGS','STRESS_COUNT']
+
+schema = """
+create table if not exists runs (
+    id integer primary key,
+    commit_id text not null,
+    dirty integer not null,
+    config text not null,
+    time real not null
+);
+create table if not exists results (
+    run_id integer not null references runs(id),
+    metric text not null,
+    value real not null,
+    higher_is_better integer not null,
+    primary key (run_id, metric)
+);
+"""
+
+metric_kinds = ('core','synthesis','testbench')
+
+def metric_kind(metric):
+    """ core metrics depend only on the RTL and the program, synthesis ones on
+    the RTL (scripts/yosys.py -qor), testbench ones on the simulation speed """
+    if metric.startswith('test.'):
+        return 'testbench'
+    if metric.startswith('qor.'):
+        return 'synthesis'
+    return 'core'
+
+def collect_results(sim_dir,qor_path=None,since=None):
+    """ {metric: (value, higher_is_better)} from the reports of a regression run
+    and the synthesis QoR report if given. With since (a time) the reports
+    written before it, by earlier runs, are left out. """
+    sim_dir = Path(sim_dir)
+    def reports(pattern):
+        return [path for path in sorted(sim_dir.glob(pattern)) if since is None or path.stat().st_mtime >= since]
+    results = {}
+    if qor_path is not None and Path(qor_path).exists():
+        for module,qor in json.loads(Path(qor_path).read_text()).items():
+            for name in ('cells','transistors','logic_depth'):
+                results[f"qor.{module}.{name}"] = (qor[name],False)
+    for path in reports('**/*_dhrystone.json'):
+        report = json.loads(path.read_text())
+        data = report['data']
+        results[f"dhrystone.{report['dut']}.dmips_per_mhz"] = (data['dmips_per_mhz'],True)
+        results[f"dhrystone.{report['dut']}.cycles_per_run"] = (data['cycles_per_run'],False)
+    for path in reports('**/*_kernels.json'):
+        report = json.loads(path.read_text())
+        for name,result in report['data'].items():
+            results[f"kernel.{name}.{report['dut']}.cycles_per_iteration"] = (result['cycles_per_iteration'],False)
+    for path in reports('**/*_throughput.json'):
+        report = json.loads(path.read_text())
+        results[f"throughput.{report['test']}.{report['dut']}.transactions_per_cycle"] = \
+            (report['data']['transactions_per_cycle'],True)
+    for metrics_path in reports('metrics.json'):
+        cycles = wall_time = 0
+        for nodeid,metrics in json.loads(metrics_path.read_text()).items():
+            if 'wall_time' not in metrics:
+                continue
+            results[f"test.{nodeid}.wall_time"] = (metrics['wall_time'],False)
+            cycles += metrics.get('cycles',0)
+            wall_time += metrics['wall_time']
+        if wall_time != 0:
+            results["test.cycles_per_second"] = (cycles/wall_time,True)
+    return results
+
+def git_commit(repo=None):
+    def git(*args):
+        return subprocess.run(['git',*args],cwd=repo,capture_output=True,encoding='utf-8',check=True).stdout.strip()
+    return git('rev-parse','HEAD'), git('status','--porcelain','--untracked-files=no') != ''
+
+def default_config():
+    return ','.join(f'{name}={os.environ[name]}' for name in config_env_vars if os.environ.get(name)) or 'default'
+
+class PerfHistory:
+    """ Benchmark results of regression runs by commit and configuration """
+    def __init__(self,path=default_db):
+        Path(path).parent.mkdir(parents=True,exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(schema)
+    def close(self):
+        self.db.close()
+    def record(self,commit_id,config,results,dirty=False,timestamp=None):
+        """ Id of the new run, None if the last run of config has the same
+        commit and results, the same reports recorded twice """
+        last = self.runs(config,1)
+        if len(last) != 0 and last[0][1] == commit_id:
+            values, higher = self.results([last[0][0]])
+            if {metric:(by_run[last[0][0]],higher[metric]) for metric,by_run in values.items()} == \
+                    {metric:(value,bool(higher_is_better)) for metric,(value,higher_is_better) in results.items()}:
+                return None
+        with self.db:
+            run_id = self.db.execute('insert into runs (commit_id,dirty,config,time) values (?,?,?,?)',
+                (commit_id,int(dirty),config,time.time() if timestamp is None else timestamp)).lastrowid
+            self.db.executemany('insert into results values (?,?,?,?)',
+                [(run_id,metric,value,int(higher)) for metric,(value,higher) in results.items()])
+        return run_id
+    def runs(self,config,last=None):
+        """ [(run id, commit, dirty)] oldest first """
+        rows = self.db.execute('select id,commit_id,dirty from runs where config = ? order by time desc, id desc'
+            + ('' if last is None else ' limit ?'),(config,) if last is None else (config,last)).fetchall()
+        return rows[::-1]
+    def results(self,run_ids):
+        """ {metric: {run id: value}}, {metric: higher_is_better} """
+        values, higher = {}, {}
+        if len(run_ids) == 0:
+            return values, higher
+        marks = ','.join('?'*len(run_ids))
+        for run_id,metric,value,higher_is_better in self.db.execute(
+                f'select run_id,metric,value,higher_is_better from results where run_id in ({marks})',run_ids):
+            values.setdefault(metric,{})[run_id] = value
+            higher[metric] = bool(higher_is_better)
+        return values, higher
+    def compare(self,config,baseline=5,threshold=0.02,z_limit=3.0):
+        """ Compare the last run with the previous baseline runs, a metric regresses when
+        it gets worse than the baseline mean by more than threshold (relative) and, if the
+        baseline varies, by more than z_limit standard deviations """
+        runs = self.runs(config,baseline+1)
+        if len(runs) < 2:
+            raise ValueError(f"Need a run and at least one baseline run of configuration {config}")
+        current, baseline_runs = runs[-1][0], [r[0] for r in runs[:-1]]
+        values, higher = self.results([current,*baseline_runs])
+        rows = []
+        for metric,by_run in sorted(values.items()):
+            history = [by_run[r] for r in baseline_runs if r in by_run]
+            if current not in by_run or len(history) == 0:
+                continue
+            mean = statistics.fmean(history)
+            stdev = statistics.stdev(history) if len(history) > 1 else 0.0
+            value = by_run[current]
+            change = (value - mean)/mean if mean else 0.0
+            worse = -change if higher[metric] else change
+            z = abs(value - mean)/stdev if stdev else None
+            regression = worse > threshold and (z is None or z > z_limit)
+            rows.append(dict(metric=metric,kind=metric_kind(metric),value=value,baseline=mean,stdev=stdev,
+                change=change,z=z,regression=regression,improvement=-worse > threshold and (z is None or z > z_limit)))
+        return rows
+    def trend(self,config,last=10,pattern='*'):
+        runs = self.runs(config,last)
+        values, _ = self.results([r[0] for r in runs])
+        headers = ['metric',*[commit[:8] + ('+' if dirty else '') for _,commit,dirty in runs]]
+        rows = [[metric,*[by_run.get(r[0],'') for r in runs]]
+            for metric,by_run in sorted(values.items()) if fnmatch.fnmatch(metric,pattern)]
+        return tabulate(rows,headers=headers,floatfmt='.4g')
+
+def compare_table(rows,all_metrics=False):
+    shown = [r for r in rows if all_metrics or r['regression'] or r['improvement']]
+    return tabulate([[r['metric'],r['kind'],r['value'],r['baseline'],f"{100*r['change']:+.2f}",
+        '-' if r['z'] is None else f"{r['z']:.1f}",
+        'REGRESSION' if r['regression'] else 'improvement' if r['improvement'] else ''] for r in shown],
+        headers=['metric','kind','value','baseline','change %','z',''],floatfmt='.4g')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Performance history of the regression runs')
+    parser.add_argument('-db',type=Path,default=default_db,help='SQLite database path')
+    parser.add_argument('-config',default=None,help=f'Configuration name, default from {",".join(config_env_vars)}')
+    commands = parser.add_subparsers(dest='command',required=True)
+    record = commands.add_parser('record',help='Record the benchmark reports and test metrics of a run')
+    record.add_argument('sim_dir',type=Path,help='Directory searched for *_dhrystone.json, *_kernels.json, *_throughput.json and metrics.json')
+    record.add_argument('-commit',help='Commit id, default the git HEAD')
+    record.add_argument('-qor',type=Path,default=default_db.parent/'qor.json',help='QoR report of scripts/yosys.py -qor')
+    record.add_argument('-since',type=Path,help='Only record the reports written after this file, e.g. touched when the run started')
+    compare = commands.add_parser('compare',help='Compare the last run with a baseline window, exit 1 on regressions')
+    compare.add_argument('-baseline',type=int,default=5,help='Number of previous runs in the baseline')
+    compare.add_argument('-threshold',type=float,default=2.0,help='Relative change that counts, percent')
+    compare.add_argument('-z',type=float,default=3.0,help='Standard deviations that count, for noisy metrics')
+    compare.add_argument('-all',action='store_true',help='Show every metric, not only the changed ones')
+    trend = commands.add_parser('trend',help='Metrics of the last runs')
+    trend.add_argument('-last',type=int,default=10)
+    trend.add_argument('-metric',default='*',help='Metric glob pattern, e.g. "kernel.*"')
+    args = parser.parse_args()
+    config = args.config or default_config()
+    history = PerfHistory(args.db)
+    if args.command == 'record':
+        results = collect_results(args.sim_dir,args.qor,None if args.since is None else args.since.stat().st_mtime)
+        if len(results) == 0:
+            sys.exit(f"No reports found in {args.sim_dir}")
+        commit_id, dirty = (args.commit, False) if args.commit else git_commit(Path(__file__).parent)
+        if history.record(commit_id,config,results,dirty) is None:
+            print(f"Not recorded, the last run of {commit_id[:8]} ({config}) has the same results")
+        else:
+            print(f"Recorded {len(results)} metrics of {commit_id[:8]}{'+' if dirty else ''} ({config}) in {args.db}")
+    elif args.command == 'compare' and len(history.runs(config,2)) < 2:
+        print(f"No baseline yet for {config}, record another run to compare")
+    elif args.command == 'compare':
+        rows = history.compare(config,args.baseline,args.threshold/100,args.z)
+        print(compare_table(rows,args.all))
+        regressions = [r for r in rows if r['regression']]
+        for kind in metric_kinds:
+            count = sum(1 for r in regressions if r['kind'] == kind)
+            if count != 0:
+                print(f"{count} {kind} regressions")
+        sys.exit(1 if regressions else 0)
+    elif args.command == 'trend':
+        print(history.trend(config,args.last,args.metric))
+    history.close()
@@ -0,0 +1,76 @@
+import dataclasses
+
+REGION_END = 1 << 31
+
+@dataclasses.dataclass
+class RegionStat:
+    count: int = 0
+    cycles: int = 0
+    self_cycles: int = 0
+    instructions: int = 0
+    ir: int = 0
+    dr: int = 0
+    dw: int = 0
+    max_depth: int = 0
+    @property
+    def cpi(self):
+        return self.cycles/self.instructions if self.instructions else 0.0
+
+class PerfRegions:
+    """ Guest annotated regions, the firmware writes the region id to the marker
+    address on entry and id|REGION_END on exit (see tests/common/util.h).
+    Regions can nest, cycles are inclusive of the nested regions and
+    self_cycles exclude them. Instructions are counted on fetch, like CpiStats. """
+    counters = ('cycles','instructions','ir','dr','dw')
+    def __init__(self,bus_ir_monitor,bus_dr_monitor,bus_dw_monitor,get_cycle):
+        self.get_cycle = get_cycle
+        self.counts = dict(instructions=0,ir=0,dr=0,dw=0)
+        self.stats = {}
+        self.stack = []
+        bus_ir_monitor.add_callback(self.counter_callback('instructions','ir'))
+        bus_dr_monitor.add_callback(self.counter_callback('dr'))
+        bus_dw_monitor.add_callback(self.counter_callback('dw'))
+    def counter_callback(self,*names):
+        def callback(transaction):
+            for name in names:
+                self.counts[name] += 1
+        return callback
+    def snapshot(self):
+        return dict(cycles=self.get_cycle(),**self.counts)
+    def write(self,value):
+        region = value & ~REGION_END
+        if value & REGION_END:
+            self.end(region)
+        else:
+            self.begin(region)
+    def begin(self,region):
+        # [region, counters on entry, cycles spent in nested regions]
+        self.stack.append([region,self.snapshot(),0])
+    def end(self,region):
+        if len(self.stack) == 0 or self.stack[-1][0] != region:
+            open_region = self.stack[-1][0] if len(self.stack) != 0 else None
+            raise ValueError(f"Region {region} ended while region {open_region} is open")
+        _, start, nested_cycles = self.stack.pop()
+        now = self.snapshot()
+        stat = self.stats.get(region)
+        if stat is None:
+            stat = self.stats[region] = RegionStat()
+        stat.count += 1
+        for name in self.counters:
+            setattr(stat,name,getattr(stat,name) + now[name] - start[name])
+        cycles = now['cycles'] - start['cycles']
+        stat.self_cycles += cycles - nested_cycles
+        stat.max_depth = max(stat.max_depth,len(self.stack))
+        if len(self.stack) != 0:
+            self.stack[-1][2] += cycles
+    def to_dict(self):
+        return {region:dict(**dataclasses.asdict(stat),cpi=stat.cpi) for region,stat in sorted(self.stats.items())}
+    def table(self):
+        from tabulate import tabulate
+        rows = [[region,s.count,s.cycles,s.self_cycles,s.cycles/s.count,s.instructions,f"{s.cpi:.2f}",s.ir,s.dr,s.dw,s.max_depth]
+            for region,s in sorted(self.stats.items())]
+        table = tabulate(rows,headers=['region','count','cycles','self cycles','cycles/call','instructions','CPI',
+            'ir','dr','dw','depth'],floatfmt='.1f')
+        if len(self.stack) != 0:
+            table += f"\nRegions still open at the end of the test: {[r for r,_,_ in self.stack]}"
+        return table
@@ -0,0 +1,153 @@
+import collections
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cocotb
+from cocotb.log import SimLog
+
+SIMULATOR = '[simulator]'
+modes = ('cprofile','sample')
+
+def parse_mode(spec):
+    """ Profiler of a +profile plusarg or TB_PROFILE value: cprofile, sample or
+    sample:<interval ms>. Returns (mode, interval in seconds) or None. """
+    if spec is None or spec is False or spec == '':
+        return None
+    if spec is True:
+        spec = 'cprofile'
+    mode, _, interval = spec.partition(':')
+    if mode not in modes:
+        raise ValueError(f"Unknown profiler {mode}, expected one of {modes}")
+    return mode, float(interval or 1)/1000
+
+def frame_label(code):
+    return f"{Path(code.co_filename).stem}:{getattr(code,'co_qualname',code.co_name)}"
+
+class SamplingProfiler:
+    """ Samples the stack of the cocotb thread from a background thread.
+    While the simulator is running no Python frame is active, those samples
+    are counted as SIMULATOR. The outermost coroutine of a stack is the
+    cocotb task it runs in, so time is attributed to monitors and drivers
+    even when they share the same callees. The profiled wrapper of a test is
+    skipped, the task is the test itself. """
+    def __init__(self,interval=0.001):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = collections.Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.start_time = self.end_time = None
+    def stack(self,frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        return tuple(reversed(stack))
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        self.stacks[() if frame is None else self.stack(frame)] += 1
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.run,name='sampling_profiler',daemon=True)
+        self.thread.start()
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.end_time = time.perf_counter()
+    def task(self,stack):
+        for code in stack:
+            if code.co_filename == __file__:
+                continue
+            if code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+                return frame_label(code)
+        return None
+    def summary(self):
+        """ Sample counts by task, by function (self) and by function (total) """
+        tasks = collections.Counter()
+        self_samples = collections.Counter()
+        total_samples = collections.Counter()
+        for stack,count in self.stacks.items():
+            if len(stack) == 0:
+                tasks[SIMULATOR] += count
+                self_samples[SIMULATOR] += count
+                continue
+            tasks[self.task(stack) or '[no task]'] += count
+            self_samples[frame_label(stack[-1])] += count
+            for label in {frame_label(code) for code in stack}:
+                total_samples[label] += count
+        return tasks, self_samples, total_samples
+    def folded(self):
+        """ Collapsed stacks, the input format of flamegraph.pl and speedscope """
+        lines = []
+        for stack,count in sorted(self.stacks.items(),key=lambda s: -s[1]):
+            labels = [frame_label(code) for code in stack] or [SIMULATOR]
+            lines.append(f"{';'.join(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+    def table(self,limit=30):
+        total = max(sum(self.stacks.values()),1)
+        tasks, self_samples, total_samples = self.summary()
+        lines = [f"{total} samples every {self.interval*1000:g} ms over {self.end_time - self.start_time:.3f} s"]
+        for title,counter in (('task',tasks),('self',self_samples),('total',total_samples)):
+            lines.append(f"\n{'samples':>8} {'%':>6}  {title}")
+            for label,count in counter.most_common(limit):
+                lines.append(f"{count:>8} {100*count/total:>6.1f}  {label}")
+        return '\n'.join(lines) + '\n'
+    def write(self,prefix):
+        paths = [Path(f"{prefix}.folded"),Path(f"{prefix}.txt")]
+        paths[0].write_text(self.folded())
+        paths[1].write_text(self.table())
+        return paths
+
+class DeterministicProfiler:
+    """ cProfile of the cocotb thread, every resume of a coroutine counts as a
+    call and its time excludes the time it spends awaiting """
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+    def start(self):
+        self.profile.enable()
+    def stop(self):
+        self.profile.disable()
+    def write(self,prefix):
+        import io
+        import pstats
+        paths = [Path(f"{prefix}.prof"),Path(f"{prefix}.txt")]
+        self.profile.dump_stats(paths[0])
+        text = io.StringIO()
+        stats = pstats.Stats(self.profile,stream=text)
+        stats.sort_stats('tottime').print_stats(30)
+        stats.sort_stats('cumulative').print_stats(30)
+        paths[1].write_text(text.getvalue())
+        return paths
+
+def make_profiler(spec):
+    parsed = parse_mode(spec)
+    if parsed is None:
+        return None
+    mode, interval = parsed
+    return SamplingProfiler(interval) if mode == 'sample' else DeterministicProfiler()
+
+def profiled(test):
+    """ Profile a cocotb test when +profile[=mode] or TB_PROFILE=mode is given,
+    the profile is written to <test>_profile.* in the sim_build directory """
+    @functools.wraps(test)
+    async def wrapper(dut,*args,**kwargs):
+        profiler = make_profiler(cocotb.plusargs.get('profile',os.environ.get('TB_PROFILE')))
+        if profiler is None:
+            return await test(dut,*args,**kwargs)
+        profiler.start()
+        try:
+            return await test(dut,*args,**kwargs)
+        finally:
+            profiler.stop()
+            for path in profiler.write(f"{test.__name__}_profile"):
+                SimLog('cocotb.'+__name__).info(f"Generated profile: {path.resolve()}")
+    return wrapper
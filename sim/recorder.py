@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import argparse
+import enum
+import importlib
+import struct
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from cocotb.log import SimLog
+
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction, RegFileReadTransaction
+
+MAGIC = b'CPVREC01'
+# channel, reg, strobe, resp, cycle, addr, data
+RECORD = struct.Struct('<BBBBIII')
+NO_REG = 0xFF
+
+class Channel(enum.IntEnum):
+    BUS_IR = 0
+    BUS_DR = 1
+    BUS_DW = 2
+    REGFILE_WRITE = 3
+    REGFILE_READ = 4
+
+Record = namedtuple('Record',['channel','cycle','transaction'])
+
+def optional(value,default=0):
+    return default if value is None else value
+
+def encode(channel,cycle,transaction):
+    """ Pack a transaction, a regfile read keeps reg2 in strobe and data2 in addr """
+    if channel == Channel.REGFILE_WRITE:
+        return RECORD.pack(channel,transaction.reg,0,0,cycle,0,optional(transaction.data))
+    if channel == Channel.REGFILE_READ:
+        return RECORD.pack(channel,optional(transaction.reg1,NO_REG),optional(transaction.reg2,NO_REG),0,
+            cycle,optional(transaction.data2),optional(transaction.data1))
+    if channel == Channel.BUS_DW:
+        return RECORD.pack(channel,NO_REG,optional(transaction.strobe),optional(transaction.response),
+            cycle,transaction.addr,optional(transaction.data))
+    return RECORD.pack(channel,NO_REG,0,0,cycle,transaction.addr,optional(transaction.data))
+
+def decode(channel,reg,strobe,resp,cycle,addr,data):
+    if channel == Channel.REGFILE_WRITE:
+        transaction = RegFileWriteTransaction(reg=reg,data=data)
+    elif channel == Channel.REGFILE_READ:
+        reg2 = None if strobe == NO_REG else strobe
+        reg1 = None if reg == NO_REG else reg
+        transaction = RegFileReadTransaction(reg1=reg1,data1=None if reg1 is None else data,
+            reg2=reg2,data2=None if reg2 is None else addr)
+    elif channel == Channel.BUS_DW:
+        transaction = BusWriteTransaction(bus_name='bus_dw',addr=addr,data=data,strobe=strobe,response=resp)
+    else:
+        transaction = BusReadTransaction(bus_name=Channel(channel).name.lower(),addr=addr,data=data)
+    return Record(Channel(channel),cycle,transaction)
+
+class TransactionRecorder:
+    """ Append every transaction seen by the attached monitors to a binary file.
+    Records are buffered and written every flush_interval transactions. """
+    def __init__(self,path,get_cycle,flush_interval=1024):
+        self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
+        self.path = Path(path)
+        self.get_cycle = get_cycle
+        self.flush_interval = flush_interval
+        self.buffer = bytearray()
+        self.pending = 0
+        self.count = 0
+        self.file = self.path.open('wb')
+        self.file.write(MAGIC)
+    def attach(self,monitor,channel):
+        monitor.add_callback(lambda transaction: self.record(channel,transaction))
+    def record(self,channel,transaction):
+        # Transactions after the end of the test are not recorded
+        if self.file.closed:
+            return
+        self.buffer += encode(channel,self.get_cycle(),transaction)
+        self.pending += 1
+        if self.pending >= self.flush_interval:
+            self.flush()
+    def flush(self):
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.count += self.pending
+        self.buffer.clear()
+        self.pending = 0
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+        self.log.info(f"Recorded {self.count} transactions: {self.path.resolve()}")
+
+def read_recording(path,chunk_records=4096):
+    with Path(path).open('rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a transaction recording")
+        while True:
+            chunk = f.read(RECORD.size*chunk_records)
+            if not chunk:
+                break
+            usable = len(chunk) - len(chunk) % RECORD.size
+            for fields in RECORD.iter_unpack(chunk[:usable]):
+                yield decode(*fields)
+            if usable != len(chunk):
+                SimLog(__name__+'.read_recording').warning("Ignoring truncated record at the end of %s",path)
+                break
+
+class ReplayScoreboard:
+    """ In order comparison against expected transactions, like the cocotb_bus
+    Scoreboard used by Testbench but fed from a recording """
+    def __init__(self,expected,strict=False):
+        self.expected = {channel:list(transactions) for channel,transactions in expected.items()}
+        self.strict = strict
+        self.errors = []
+    def check(self,record):
+        if record.channel not in self.expected:
+            return
+        expected = self.expected[record.channel]
+        if len(expected) == 0:
+            if self.strict:
+                self.errors.append(f"{record.cycle}: unexpected {record.transaction}")
+            return
+        exp = expected.pop(0)
+        if exp != record.transaction:
+            self.errors.append(f"{record.cycle}: {record.channel.name} expected {exp} received {record.transaction}")
+    def finish(self):
+        for channel,expected in self.expected.items():
+            if len(expected) != 0:
+                self.errors.append(f"{channel.name}: still expecting {len(expected)} transactions, next {expected[0]}")
+        return self.errors
+
+def unit_test_expected(test):
+    return {
+        Channel.REGFILE_WRITE: [RegFileWriteTransaction.from_string(t) for t in test['expected_regfile_write']],
+        Channel.REGFILE_READ: [RegFileReadTransaction.from_string(t) for t in test['expected_regfile_read']],
+        Channel.BUS_DR: [BusReadTransaction.from_string(t) for t in test['expected_data_read']],
+        Channel.BUS_DW: [BusWriteTransaction.from_string(t) for t in test['expected_data_write']],
+    }
+
+def load_checker(spec):
+    """ "module:function", the function gets the records and returns a list of errors """
+    module, function = spec.split(':')
+    return getattr(importlib.import_module(module),function)
+
+if __name__ == '__main__':
+    import toml
+    parser = argparse.ArgumentParser(description='Replay a transaction recording written with +record')
+    parser.add_argument('recording',type=Path)
+    parser.add_argument('-unit-test',dest='unit_test',help='Check against the expected transactions of this unit test')
+    parser.add_argument('-unit-tests',dest='unit_tests',type=Path,default=Path(__file__).parent/'tests/unit_tests.toml')
+    parser.add_argument('-strict',action='store_true',help='Unexpected extra transactions are errors')
+    parser.add_argument('-checker',action='append',default=[],help='Extra checker as module:function')
+    parser.add_argument('-print',action='store_true',help='Print every record')
+    args = parser.parse_args()
+    records = list(read_recording(args.recording))
+    if args.print:
+        for record in records:
+            print(f'{record.cycle:>10} {record.channel.name:<13} {record.transaction}')
+    errors = []
+    if args.unit_test is not None:
+        scoreboard = ReplayScoreboard(unit_test_expected(toml.loads(args.unit_tests.read_text())[args.unit_test]),args.strict)
+        for record in records:
+            scoreboard.check(record)
+        errors += scoreboard.finish()
+    for spec in args.checker:
+        errors += [f'{spec}: {error}' for error in load_checker(spec)(records)]
+    for error in errors:
+        print(error)
+    print(f'{len(records)} records, {len(errors)} errors',file=sys.stderr)
+    sys.exit(1 if errors else 0)
@@ -35,3 +35,33 @@ abi_reg_map = {
 }
 
 reg_abi_map = {v:k for k,v in abi_reg_map.items()}
+
+opcode_class_map = {
+    0b0110111:"lui",
+    0b0010111:"auipc",
+    0b1101111:"jal",
+    0b1100111:"jalr",
+    0b1100011:"branch",
+    0b0000011:"load",
+    0b0100011:"store",
+    0b0010011:"int_imm",
+    0b0110011:"int_reg",
+    0b0001111:"fence",
+    0b1110011:"system",
+}
+
+funct3_mnemonic_map = {
+    "branch":{0:"beq",1:"bne",4:"blt",5:"bge",6:"bltu",7:"bgeu"},
+    "load":{0:"lb",1:"lh",2:"lw",4:"lbu",5:"lhu"},
+    "store":{0:"sb",1:"sh",2:"sw"},
+    "int_imm":{0:"addi",1:"slli",2:"slti",3:"sltiu",4:"xori",5:"srli",6:"ori",7:"andi"},
+    "int_reg":{0:"add",1:"sll",2:"slt",3:"sltu",4:"xor",5:"srl",6:"or",7:"and"},
+    "system":{0:"ecall",1:"csrrw",2:"csrrs",3:"csrrc",5:"csrrwi",6:"csrrsi",7:"csrrci"},
+}
+
+# funct7 bit 30 selects the alternative operation
+alt_mnemonic_map = {
+    "srli":"srai",
+    "add":"sub",
+    "srl":"sra",
+}
@@ -1,18 +1,21 @@
+import functools
+from collections import namedtuple
 from pathlib import Path
 
 from cocotb_bus.monitors import Monitor
 from cocotb.log import SimLog
-from elftools.elf.elffile import ELFFile
 
 from regfile import RegFileWriteTransaction
 from bus import BusWriteTransaction, BusReadTransaction
 from cocotb_utils import run, to_bytes
+from riscv_constants import opcode_class_map, funct3_mnemonic_map, alt_mnemonic_map
 from cocotb.triggers import Edge
 
 sim_dir = Path(__file__).resolve().parent
 linker_script = sim_dir/'tests/common/linker.ld'
 
 def read_elf(test_elf,sections=['.text']):
+    from elftools.elf.elffile import ELFFile
     log = SimLog(__name__+'.read_elf')
     with test_elf.open('rb') as file:
         elffile = ELFFile(file)
@@ -48,13 +51,15 @@ def compile_test(instructions):
     elf = read_elf(test_elf)
     return elf
 
-def compile_riscv_test(asm_path):
-    log = SimLog(__name__+".compile_riscv_test")
-    test_s = asm_path
+def build_riscv_test(asm_path,build_dir='.'):
+    """ Assemble and link a riscv-tests program, return the ELF path """
+    log = SimLog(__name__+".build_riscv_test")
+    test_s = Path(asm_path)
+    build_dir = Path(build_dir)
     crt0_s = sim_dir/'tests/common/crt0.S'
-    crt0_obj = Path(crt0_s.name).with_suffix('.o')
-    test_obj = Path(test_s.name).with_suffix('.o')
-    test_elf = Path(test_s.name).with_suffix('.elf')
+    crt0_obj = build_dir/Path(crt0_s.name).with_suffix('.o')
+    test_obj = build_dir/Path(test_s.name).with_suffix('.o')
+    test_elf = build_dir/Path(test_s.name).with_suffix('.elf')
     common_dir = sim_dir/'tests/common'
     macros_dir = sim_dir/'tests/isa/macros/scalar'
     cmd_crt0 = f"riscv64-unknown-elf-gcc -march=rv32i -mabi=ilp32 -I{common_dir} -I{macros_dir} -g -DENTRY_POINT={test_s.stem} -c {crt0_s} -o {crt0_obj}"
@@ -63,14 +68,42 @@ def compile_riscv_test(asm_path):
     run(cmd_crt0)
     run(cmd_test)
     run(cmd_link)
-    return process_elf(test_elf)
+    return test_elf
+
+def compile_riscv_test(asm_path):
+    return process_elf(build_riscv_test(asm_path))
+
+def build_c_test(test_dir,cflags=(),build_dir='.'):
+    """ Build a C test from sim/tests with the shared crt0.S and syscalls.c, return the ELF path """
+    test_dir = Path(test_dir)
+    build_dir = Path(build_dir)
+    common_dir = sim_dir/'tests/common'
+    test_elf = build_dir/Path(test_dir.name).with_suffix('.elf')
+    cflags = ' '.join(cflags)
+    sources = [common_dir/'crt0.S', common_dir/'syscalls.c', *sorted(test_dir.glob('*.c'))]
+    objects = []
+    for source in sources:
+        obj = build_dir/Path(source.name).with_suffix('.o')
+        run(f"riscv64-unknown-elf-gcc -march=rv32i -mabi=ilp32 -I{common_dir} -I{test_dir} {cflags} -c {source} -o {obj}")
+        objects.append(str(obj))
+    run(f"riscv64-unknown-elf-gcc -march=rv32i -mabi=ilp32 -Wl,-T,{linker_script},-Bstatic -nostartfiles -ffreestanding {' '.join(objects)} -o {test_elf}")
+    return test_elf
+
+def compile_c_test(test_dir,cflags=()):
+    return process_elf(build_c_test(test_dir,cflags))
+
+def write_hex(test_elf):
+    """ Verilog hex of the program for the fake_memory.v $readmemh """
+    test_hex = Path(test_elf).with_suffix('.hex')
+    run(f"riscv64-unknown-elf-objcopy -O verilog {test_elf} {test_hex}")
+    return test_hex
 
 def process_elf(test_elf):
     log = SimLog(__name__+".process_elf")
     i_elf = read_elf(test_elf,
         sections=['.init','.text'])
     d_elf = read_elf(test_elf,
-        sections=['.data','.rodata'])
+        sections=['.data','.rodata','.sdata'])
     instruction_memory = elf_to_memory(i_elf)
     data_memory = elf_to_memory(d_elf)
     return instruction_memory,data_memory
@@ -93,6 +126,22 @@ def parse_data_memory(params_data_memory):
             data_memory[t.addr+i] = to_bytes(t.data)[i]
     return data_memory
 
+DecodedInstruction = namedtuple('DecodedInstruction',['mnemonic','inst_class'])
+
+@functools.lru_cache(maxsize=4096)
+def decode_instruction(inst):
+    inst_class = opcode_class_map.get(inst & 0x7F,"unknown")
+    mnemonic = inst_class
+    funct3_map = funct3_mnemonic_map.get(inst_class)
+    if funct3_map is not None:
+        mnemonic = funct3_map.get((inst >> 12) & 0x7,"unknown")
+        if (inst >> 30) & 1 and (inst_class == "int_reg" or mnemonic == "srli"):
+            mnemonic = alt_mnemonic_map.get(mnemonic,mnemonic)
+    return DecodedInstruction(mnemonic,inst_class)
+
+def is_control_transfer(inst_class):
+    return inst_class in ("branch","jal","jalr")
+
 class StackMonitor:
     def __init__(self,regfile_write_monitor: Monitor, pc_monitor: Monitor):
         self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
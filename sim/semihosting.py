@@ -0,0 +1,126 @@
+import re
+import struct
+from enum import IntEnum
+from pathlib import Path
+
+from cocotb.log import SimLog
+
+from cocotb_utils import from_array, to_bytes
+
+class SemihostOp(IntEnum):
+    """ Keep in sync with SEMIHOST_* in tests/common/riscv_test.h """
+    WRITE = 1
+    PRINTF = 2
+    EXIT = 3
+    READ = 4
+
+# Parameter block written by the guest: op, arg0, arg1, arg2, arg3, result
+BLOCK_ARGS = 4
+BLOCK_RESULT = 4*(1 + BLOCK_ARGS)
+
+printf_pattern = re.compile(r'%([-+ #0]*)(\d+|\*)?(?:\.(\d+|\*))?(hh|h|ll|l|z|j|t)?([diouxXcspfFeEgG%])')
+
+class VarArgs:
+    """ Walk a RISC-V ilp32 va_list, 64 bit arguments are 8 byte aligned """
+    def __init__(self,read_word,addr):
+        self.read_word = read_word
+        self.addr = addr
+    def word(self):
+        value = self.read_word(self.addr)
+        self.addr += 4
+        return value
+    def dword(self):
+        self.addr = (self.addr + 7) & ~7
+        low = self.word()
+        return low | (self.word() << 32)
+
+def to_signed(value,bits):
+    return value - (1 << bits) if value & (1 << (bits-1)) else value
+
+def format_printf(fmt,args,read_string):
+    """ Format a C printf format string with the arguments of a guest va_list """
+    def convert(match):
+        flags, width, precision, length, conversion = match.groups()
+        if conversion == '%':
+            return '%'
+        if width == '*':
+            width = str(to_signed(args.word(),32))
+        if precision == '*':
+            precision = str(to_signed(args.word(),32))
+        spec = '%' + flags + (width or '') + (f'.{precision}' if precision is not None else '')
+        wide = length == 'll'
+        if conversion in 'di':
+            return (spec+'d') % (to_signed(args.dword(),64) if wide else to_signed(args.word(),32))
+        if conversion in 'ouxX':
+            return (spec+conversion.replace('u','d')) % (args.dword() if wide else args.word())
+        if conversion == 'p':
+            return '0x' + (spec+'x') % args.word()
+        if conversion == 'c':
+            return (spec+'c') % (args.word() & 0xFF)
+        if conversion == 's':
+            addr = args.word()
+            return (spec+'s') % (read_string(addr) if addr != 0 else '(null)')
+        return (spec+conversion) % struct.unpack('<d',struct.pack('<Q',args.dword()))[0]
+    return printf_pattern.sub(convert,fmt)
+
+class Semihost:
+    """ Host side of the semihosting mailbox, the guest writes the address of a
+    parameter block to the mailbox and the host serves the call directly from
+    the Testbench memory, writing the result back into the block. """
+    def __init__(self,memory,output,exit,file_root=None):
+        self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
+        self.memory = memory
+        self.output = output
+        self.exit = exit
+        self.file_root = Path(file_root).resolve() if file_root is not None else None
+        self.handlers = {
+            SemihostOp.WRITE: self.write,
+            SemihostOp.PRINTF: self.printf,
+            SemihostOp.EXIT: self.exit_call,
+            SemihostOp.READ: self.read,
+        }
+        self.calls = 0
+    def read_word(self,addr):
+        return from_array(self.memory,addr)
+    def read_bytes(self,addr,length):
+        return bytes(self.memory.get(addr+i,0) for i in range(length))
+    def read_string(self,addr):
+        buf = bytearray()
+        while self.memory.get(addr,0) != 0:
+            buf.append(self.memory[addr])
+            addr += 1
+        return buf.decode('latin-1')
+    def write_bytes(self,addr,data):
+        for i,value in enumerate(data):
+            self.memory[addr+i] = value
+    def call(self,block):
+        op = self.read_word(block)
+        args = [self.read_word(block + 4*(i+1)) for i in range(BLOCK_ARGS)]
+        if op not in self.handlers:
+            raise ValueError(f"Unsupported semihosting call {op} at 0x{block:X}")
+        self.calls += 1
+        result = self.handlers[op](*args)
+        self.write_bytes(block + BLOCK_RESULT,to_bytes(result & 0xFFFFFFFF))
+    def write(self,fd,buf,length,_):
+        self.output(self.read_bytes(buf,length).decode('latin-1'))
+        return length
+    def printf(self,fmt,ap,*_):
+        text = format_printf(self.read_string(fmt),VarArgs(self.read_word,ap),self.read_string)
+        self.output(text)
+        return len(text)
+    def exit_call(self,code,*_):
+        self.exit(to_signed(code,32))
+        return 0
+    def read(self,path,buf,length,offset):
+        """ Read up to length bytes of a host file, relative to +semihost_root """
+        if self.file_root is None:
+            self.log.warning("Semihosting file read of %s without +semihost_root",self.read_string(path))
+            return -1
+        file_path = (self.file_root/self.read_string(path)).resolve()
+        if not file_path.is_relative_to(self.file_root) or not file_path.is_file():
+            return -1
+        with open(file_path,'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        self.write_bytes(buf,data)
+        return len(data)
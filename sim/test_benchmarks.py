@@ -0,0 +1,41 @@
+import pytest
+
+from benchmarks import parse_dhrystone, parse_kernels
+
+dhrystone_output = """
+Microseconds for one run through Dhrystone: 35
+Dhrystones per Second:                      28571
+
+DEBUG: User_Time = 70000 Number_Of_Runs = 20 Mic_secs_Per_Second = 1000000 HZ = 100000000
+"""
+
+def test_parse_dhrystone():
+    result = parse_dhrystone(dhrystone_output,period_ns=10)
+    assert result['runs'] == 20
+    assert result['cycles_per_run'] == 3500
+    assert result['clock_mhz'] == 100
+    assert result['dhrystones_per_second'] == pytest.approx(28571.43,rel=1e-4)
+    assert result['dmips_per_mhz'] == pytest.approx(1e6/(3500*1757))
+    assert result['reported']['microseconds'] == 35
+
+def test_parse_dhrystone_without_debug_runtime():
+    with pytest.raises(ValueError):
+        parse_dhrystone("Dhrystones per Second: 10\n",period_ns=10)
+
+kernel_output = """
+KERNEL memcpy iterations=4 cycles=8192 bytes=4096
+KERNEL memset iterations=4 cycles=4096 bytes=4096
+KERNEL muldiv iterations=64 cycles=32000 bytes=0
+"""
+
+def test_parse_kernels():
+    kernels = parse_kernels(kernel_output)
+    assert list(kernels) == ['memcpy','memset','muldiv']
+    assert kernels['memcpy']['cycles_per_iteration'] == 2048
+    assert kernels['memset']['bytes_per_cycle'] == 1
+    assert kernels['muldiv']['cycles_per_iteration'] == 500
+    assert 'bytes_per_cycle' not in kernels['muldiv']
+
+def test_parse_kernels_without_report():
+    with pytest.raises(ValueError):
+        parse_kernels("Hello world\n")
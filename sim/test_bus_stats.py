@@ -0,0 +1,20 @@
+from bus_stats import LatencyHistogram
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(size=8)
+    for latency in [1]*50 + [2]*40 + [5]*9 + [20]:
+        histogram.add(latency)
+    assert histogram.count == 100
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(90) == 2
+    assert histogram.percentile(99) == 5
+    assert histogram.percentile(100) == 20
+    assert histogram.max == 20
+    assert histogram.bins[8] == 1
+    report = histogram.to_dict()
+    assert report['bins'] == [0,50,40,0,0,9,0,0,1]
+
+def test_latency_histogram_empty():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    assert histogram.to_dict()['bins'] == []
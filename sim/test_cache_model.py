@@ -0,0 +1,55 @@
+import pytest
+
+from bus import BusReadTransaction, BusWriteTransaction
+from cache_model import Cache, parse_cache_spec
+
+def test_cache_hits_and_misses():
+    cache = Cache("icache",size=64,ways=1,line_size=16,hit_latency=1,miss_latency=10)
+    assert cache.access(0x0) == 11
+    assert cache.access(0x4) == 1
+    assert cache.access(0xC) == 1
+    assert cache.access(0x40) == 11 # same set, evicts line 0x0
+    assert cache.access(0x0) == 11
+    assert cache.hits == 2 and cache.misses == 3
+    assert cache.stall_cycles == 35
+
+def test_cache_sets():
+    cache = Cache("dcache",size=256,ways=2,line_size=16,hit_latency=0,miss_latency=5)
+    assert len(cache.tags) == len(cache.valid) == len(cache.last_use) == 16
+    # Every set, the last one included, holds two lines
+    for addr in range(0,0x100,0x10):
+        assert cache.access(addr) == 5
+    for addr in range(0,0x100,0x10):
+        assert cache.access(addr) == 0
+    assert cache.access(0x170) == 5
+    assert cache.misses == 17
+
+def test_cache_lru():
+    cache = Cache("dcache",size=64,ways=2,line_size=16,hit_latency=0,miss_latency=5)
+    for addr in (0x0,0x20,0x0,0x40,0x0):
+        cache.access(addr)
+    # 0x20 was the least recently used line of set 0
+    assert cache.misses == 3
+    assert cache.access(0x40) == 0
+    assert cache.access(0x20) == 5
+
+def test_cache_write_back():
+    cache = Cache("dcache",size=32,ways=1,line_size=16,hit_latency=0,miss_latency=4)
+    assert cache.latency(BusWriteTransaction("bus_dw",addr=0x0,data=1,strobe=0xF)) == 4
+    assert cache.latency(BusReadTransaction("bus_dr",addr=0x20)) == 8
+    assert cache.writebacks == 1
+    assert cache.access(0x80000008) == 0
+    assert cache.accesses == 2
+
+def test_cache_write_through():
+    cache = parse_cache_spec("dcache","size=32,ways=1,line=16,hit=0,miss=4,policy=write-through")
+    assert cache.access(0x0,write=True) == 8
+    assert cache.access(0x0,write=True) == 4
+    assert cache.access(0x20) == 4
+    assert cache.writebacks == 0
+
+def test_cache_spec_errors():
+    with pytest.raises(ValueError):
+        parse_cache_spec("icache","size=48,ways=1,line=16")
+    with pytest.raises(ValueError):
+        parse_cache_spec("icache","assoc=2")
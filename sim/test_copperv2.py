@@ -1,9 +1,12 @@
+import os
+import json
 from pathlib import Path
 
 import toml
 import pytest
 from cocotb_test.simulator import run
 
+
 root_dir = Path(__file__).resolve().parent.parent
 sim_dir = root_dir/'sim'
 chisel_dir = root_dir/'work/rtl'
@@ -13,6 +16,10 @@ toml_path = sim_dir/"tests/unit_tests.toml"
 unit_tests = toml.loads(toml_path.read_text())
 
 rv_asm_paths = list(sim_dir.glob('tests/isa/rv32ui/*.S'))
+dhrystone_runs = int(os.environ.get('DHRYSTONE_RUNS',20))
+dhrystone_cflags = os.environ.get('DHRYSTONE_CFLAGS','-O2')
+kernel_names = ['crc32','memcpy_bw','matmul','linked_list','state_machine','muldiv']
+kernel_cflags = os.environ.get('KERNEL_CFLAGS','-O2')
 
 common_run_opts = dict(
     verilog_sources=[
@@ -25,6 +32,30 @@ common_run_opts = dict(
     waves = True,
 )
 
+copperv1_run_opts = dict(
+    verilog_sources=[
+        rtl_v1_dir/"copperv.v",
+        rtl_v1_dir/"control_unit.v",
+        rtl_v1_dir/"idecoder.v",
+        rtl_v1_dir/"register_file.v",
+        rtl_v1_dir/"execution.v",
+    ],
+    includes=[rtl_v1_dir/'include'],
+    toplevel="copperv",
+    module="cocotb_tests",
+    waves = True,
+)
+
+def plus_args(*args):
+    """ Extra simulator plusargs, e.g. PLUSARGS="+cpi_stats" pytest ... """
+    return [*args, *os.environ.get('PLUSARGS','').split()]
+
+def remove_digest(sim_build,test_name):
+    """ A failed run leaves no digest report, the differential check of the
+    session (conftest.py) only compares reports written by this session """
+    for suffix in ('.json','.bin'):
+        (Path(sim_build)/f"{test_name}_digest{suffix}").unlink(missing_ok=True)
+
 @pytest.mark.parametrize(
     "parameters", [pytest.param({"TEST_NAME":name},id=name) for name in unit_tests]
 )
@@ -32,6 +63,7 @@ def test_unit(parameters):
     run(
         **common_run_opts,
         extra_env=parameters,
+        plus_args=plus_args(),
         sim_build=f"work/sim/test_unit_{parameters['TEST_NAME']}",
         testcase = "unit_test",
     )
@@ -41,9 +73,84 @@ def test_unit(parameters):
         for path in rv_asm_paths]
 )
 def test_riscv(parameters):
+    sim_build = f"work/sim/test_riscv_{parameters['TEST_NAME']}"
+    remove_digest(sim_build,parameters['TEST_NAME'])
     run(
         **common_run_opts,
         extra_env=parameters,
-        sim_build=f"work/sim/test_riscv_{parameters['TEST_NAME']}",
+        plus_args=plus_args("+digest"),
+        sim_build=sim_build,
+        testcase = "riscv_test",
+    )
+
+@pytest.mark.parametrize(
+    "parameters", [pytest.param({"TEST_NAME":path.stem,"ASM_PATH":str(path.resolve())},id=path.stem)
+        for path in rv_asm_paths]
+)
+def test_riscv_copperv1(parameters):
+    sim_build = f"work/sim/test_riscv_copperv1_{parameters['TEST_NAME']}"
+    remove_digest(sim_build,parameters['TEST_NAME'])
+    run(
+        **copperv1_run_opts,
+        extra_env=parameters,
+        plus_args=plus_args("+digest","+dut_copperv1"),
+        sim_build=sim_build,
         testcase = "riscv_test",
     )
+
+@pytest.mark.program(sim_dir/"tests/dhrystone")
+@pytest.mark.parametrize("dut",["copperv2","copperv1"])
+def test_dhrystone(dut):
+    sim_build = f"work/sim/test_dhrystone_{dut}"
+    run_opts, dut_plus_args = (common_run_opts,[]) if dut == "copperv2" else (copperv1_run_opts,["+dut_copperv1"])
+    run(
+        **run_opts,
+        extra_env=dict(
+            TEST_NAME="dhrystone",
+            C_TEST_DIR=str(sim_dir/"tests/dhrystone"),
+            C_TEST_CFLAGS=f"{dhrystone_cflags} -DDEBUG_RUNTIME -DNUMBER_OF_RUNS={dhrystone_runs}",
+            BENCHMARK="dhrystone",
+        ),
+        plus_args=plus_args(*dut_plus_args),
+        sim_build=sim_build,
+        testcase = "c_test",
+    )
+    report = json.loads((Path(sim_build)/"dhrystone_dhrystone.json").read_text())
+    assert report['data']['dmips_per_mhz'] > 0, report
+
+@pytest.mark.parametrize("kernel",kernel_names)
+@pytest.mark.parametrize("dut",["copperv2","copperv1"])
+def test_kernel(dut,kernel):
+    sim_build = f"work/sim/test_kernel_{kernel}_{dut}"
+    run_opts, dut_plus_args = (common_run_opts,[]) if dut == "copperv2" else (copperv1_run_opts,["+dut_copperv1"])
+    run(
+        **run_opts,
+        extra_env=dict(
+            TEST_NAME=kernel,
+            C_TEST_DIR=str(sim_dir/"tests"/kernel),
+            C_TEST_CFLAGS=kernel_cflags,
+            BENCHMARK="kernel",
+        ),
+        plus_args=plus_args(*dut_plus_args),
+        sim_build=sim_build,
+        testcase = "c_test",
+    )
+    report = json.loads((Path(sim_build)/f"{kernel}_kernels.json").read_text())
+    assert all(result['cycles_per_iteration'] > 0 for result in report['data'].values()), report
+
+@pytest.mark.program(sim_dir/"tests/hello_world")
+@pytest.mark.parametrize("semihosting",[False,True],ids=["uart","semihosting"])
+def test_hello_world(semihosting):
+    sim_build = f"work/sim/test_hello_world_{'semihosting' if semihosting else 'uart'}"
+    run(
+        **common_run_opts,
+        extra_env=dict(
+            TEST_NAME="hello_world",
+            C_TEST_DIR=str(sim_dir/"tests/hello_world"),
+            C_TEST_CFLAGS="-O2 -DSEMIHOSTING" if semihosting else "-O2",
+        ),
+        plus_args=plus_args(),
+        sim_build=sim_build,
+        testcase = "c_test",
+    )
+    assert (Path(sim_build)/"hello_world_uart.log").read_text() == "Hello world 1\nHello world 2\n"
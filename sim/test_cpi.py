@@ -0,0 +1,47 @@
+from bus import BusReadTransaction
+from regfile import RegFileWriteTransaction
+from cpi import CpiStats
+from hdl_trace import TraceMonitor
+from riscv_utils import decode_instruction
+
+def test_decode_instruction():
+    assert decode_instruction(0x12300293) == ("addi","int_imm")
+    assert decode_instruction(0x406283b3) == ("sub","int_reg")
+    assert decode_instruction(0x4012d293) == ("srai","int_imm")
+    assert decode_instruction(0x00628463) == ("beq","branch")
+    assert decode_instruction(0x0152a303) == ("lw","load")
+    assert decode_instruction(0x0062a1a3) == ("sw","store")
+    assert decode_instruction(0x0080036f) == ("jal","jal")
+
+def test_cpi_stats():
+    cycle = 0
+    ir_monitor = TraceMonitor('bus_ir')
+    regfile_monitor = TraceMonitor('regfile_write')
+    stats = CpiStats(ir_monitor,regfile_monitor,lambda: cycle)
+    program = [
+        (0, 0x0, 0x12300293), # addi
+        (5, 0x4, 0x00628463), # beq taken
+        (12, 0xC, 0x12300293), # addi
+        (17, 0x10, 0x00628463), # beq not taken
+        (21, 0x14, 0x12300293), # addi
+        (26, 0x18, 0x0080036f), # jal taken
+        (31, 0x20, 0x12300293), # addi
+    ]
+    for cycle, addr, inst in program:
+        ir_monitor._recv(BusReadTransaction('bus_ir',addr=addr,data=inst))
+        if inst == 0x12300293:
+            cycle += 3
+            regfile_monitor._recv(RegFileWriteTransaction(5,0x123))
+    report = stats.to_dict()
+    assert report['instructions'] == 6
+    assert report['cycles'] == 31
+    assert report['opcodes']['addi']['count'] == 3
+    assert report['opcodes']['addi']['writeback_cycles'] == 12
+    beq = report['opcodes']['beq']
+    assert beq['count'] == 2 and beq['taken'] == 1
+    assert beq['taken_cpi'] == 7.0
+    assert beq['taken_penalty'] == 3.0
+    jal = report['opcodes']['jal']
+    # Always taken, there is no not taken CPI to compare with
+    assert jal['taken_cpi'] == 5.0 and jal['taken_penalty'] is None
+    assert 'beq' in stats.table()
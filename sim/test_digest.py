@@ -0,0 +1,83 @@
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction
+from hdl_trace import TraceMonitor
+from recorder import Channel
+import json
+import os
+
+from digest import TransactionDigests, compare_digests, first_divergent_checkpoint, read_streams, session_divergences
+
+def run(tmp_path,name,writes,window=4096):
+    monitors = {Channel.REGFILE_WRITE:TraceMonitor('regfile_write'),Channel.BUS_DW:TraceMonitor('bus_dw')}
+    digests = TransactionDigests(monitors,checkpoint_interval=4,window=window)
+    for i,data in enumerate(writes):
+        monitors[Channel.REGFILE_WRITE]._recv(RegFileWriteTransaction(reg=5,data=data))
+        monitors[Channel.BUS_DW]._recv(BusWriteTransaction('bus_dw',addr=4*i,data=i,strobe=0xF,response=1))
+    path = tmp_path/f'{name}.bin'
+    digests.write_streams(path)
+    return digests.to_dict(), read_streams(path)
+
+def test_first_divergent_checkpoint():
+    assert first_divergent_checkpoint(list('abcdef'),list('abcXYZ')) == 3
+    assert first_divergent_checkpoint(list('abc'),list('abc')) == 3
+    assert first_divergent_checkpoint(list('abc'),list('XYZ')) == 0
+
+def test_matching_digests(tmp_path):
+    a = run(tmp_path,'a',range(20))
+    b = run(tmp_path,'b',range(20))
+    assert compare_digests(a[0],b[0],a[1],b[1]) == {}
+
+def test_divergent_digests(tmp_path):
+    writes = list(range(20))
+    a = run(tmp_path,'a',writes)
+    writes[13] = 0xBAD
+    b = run(tmp_path,'b',writes)
+    divergences = compare_digests(a[0],b[0],a[1],b[1])
+    assert list(divergences) == ['REGFILE_WRITE']
+    assert divergences['REGFILE_WRITE']['index'] == 13
+    assert '0xBAD' in divergences['REGFILE_WRITE']['transactions'][1]
+
+def test_truncated_stream(tmp_path):
+    a = run(tmp_path,'a',range(10))
+    b = run(tmp_path,'b',range(7))
+    divergences = compare_digests(a[0],b[0],a[1],b[1])
+    assert divergences['BUS_DW']['index'] == 7
+    assert divergences['BUS_DW']['transactions'][1] is None
+
+def test_bounded_window(tmp_path):
+    writes = list(range(40))
+    a = run(tmp_path,'a',writes,window=8)
+    assert a[0]['REGFILE_WRITE']['window_start'] == 32
+    assert len(a[1][Channel.REGFILE_WRITE]) == 8
+    # Divergence inside the window
+    writes[35] = 0xBAD
+    b = run(tmp_path,'b',writes,window=8)
+    divergences = compare_digests(a[0],b[0],a[1],b[1])
+    assert divergences['REGFILE_WRITE']['index'] == 35
+    # Divergence before the window, only the checkpoint is known
+    writes[13] = 0xBAD
+    b = run(tmp_path,'b',writes,window=8)
+    divergences = compare_digests(a[0],b[0],a[1],b[1])
+    assert divergences['REGFILE_WRITE']['index'] == 12
+    assert 'window' in divergences['REGFILE_WRITE']['reason']
+
+def write_digest(tmp_path,sim_build,test_name,writes):
+    run_dir = tmp_path/sim_build
+    run_dir.mkdir()
+    digests, _ = run(run_dir,f'{test_name}_digest',writes)
+    path = run_dir/f'{test_name}_digest.json'
+    path.write_text(json.dumps(dict(test=test_name,dut='dut',data=digests)))
+    return path
+
+def test_session_divergences(tmp_path):
+    write_digest(tmp_path,'test_riscv_add','add',range(8))
+    write_digest(tmp_path,'test_riscv_copperv1_add','add',[0xBAD,*range(1,8)])
+    write_digest(tmp_path,'test_riscv_sub','sub',range(8))
+    write_digest(tmp_path,'test_riscv_copperv1_sub','sub',range(8))
+    # Only the copperv2 side of and ran in this session
+    write_digest(tmp_path,'test_riscv_and','and',range(8))
+    stale = write_digest(tmp_path,'test_riscv_copperv1_and','and',range(4))
+    os.utime(stale,(1000,1000))
+    diverged = session_divergences(tmp_path,since=2000)
+    assert list(diverged) == ['add']
+    assert diverged['add']['REGFILE_WRITE']['index'] == 0
@@ -0,0 +1,42 @@
+import json
+
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction, RegFileReadTransaction
+from hdl_trace import TraceMonitor
+from functional_coverage import FunctionalCoverage, coverpoint_labels, merge_coverage, uncovered
+
+def make_coverage():
+    monitors = [TraceMonitor(name) for name in ('bus_ir','bus_dw','regfile_read','regfile_write')]
+    return FunctionalCoverage(*monitors), monitors
+
+def test_coverage_bins():
+    coverage, (ir, dw, rs, rd) = make_coverage()
+    for addr,inst in [(0x0,0x00628463),(0xC,0x00628463),(0x10,0x12300293)]: # beq taken, beq not taken, addi
+        ir._recv(BusReadTransaction('bus_ir',addr=addr,data=inst))
+    dw._recv(BusWriteTransaction('bus_dw',addr=0,data=0,strobe=0b0011,response=1))
+    rs._recv(RegFileReadTransaction(reg1=5,data1=0,reg2=6,data2=0))
+    rs._recv(RegFileReadTransaction(reg1=5,data1=0))
+    rd._recv(RegFileWriteTransaction(reg=5,data=0))
+    bins = coverage.to_dict()
+    labels = {name:dict(zip(coverpoint_labels[name],counts)) for name,counts in bins.items()}
+    assert labels['instruction']['beq'] == 2
+    assert labels['instruction']['addi'] == 1
+    assert labels['branch']['beq taken'] == 1
+    assert labels['branch']['beq not taken'] == 1
+    assert labels['store_strobe']['0011'] == 1
+    assert labels['rs_pair']['t0,t1'] == 1
+    assert sum(bins['rs_pair']) == 1
+    assert labels['rd_write']['t0'] == 1
+
+def test_merge_coverage(tmp_path):
+    paths = []
+    for i,strobe in enumerate((0b1111,0b0001,0b1111)):
+        coverage, (ir, dw, rs, rd) = make_coverage()
+        dw._recv(BusWriteTransaction('bus_dw',addr=0,data=0,strobe=strobe,response=1))
+        path = tmp_path/f'test{i}_coverage.json'
+        path.write_text(json.dumps(dict(test=f'test{i}',dut='copperv2',data=coverage.to_dict())))
+        paths.append(path)
+    merged = merge_coverage(paths)
+    assert merged['store_strobe'][0b1111] == 2
+    assert merged['store_strobe'][0b0001] == 1
+    assert len(uncovered(merged,'store_strobe')) == 14
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from hdl_trace import TraceKind, TraceRecord, TraceReplay, read_trace, write_trace
+from regfile import RegFileWriteTransaction
+from riscv_constants import abi_reg_map
+from riscv_utils import StackMonitor
+
+root_dir = Path(__file__).resolve().parent.parent
+work_dir = root_dir/'work/sim/test_hdl_trace'
+work_dir.mkdir(exist_ok=True,parents=True)
+
+records = [
+    TraceRecord(TraceKind.PC,0,10,0x4,0),
+    TraceRecord(TraceKind.FETCH,0,12,0x4,0x00000013),
+    TraceRecord(TraceKind.RD,abi_reg_map['sp'],14,0,0x1000),
+    TraceRecord(TraceKind.DW,0b1111,16,0x80000004,ord('a')),
+    TraceRecord(TraceKind.DR,0,18,0x100,0x123),
+]
+
+def test_trace_roundtrip():
+    path = work_dir/'roundtrip.bin'
+    write_trace(path,records)
+    assert path.stat().st_size == 16*len(records)
+    assert list(read_trace(path,chunk_records=2)) == records
+
+def test_trace_replay():
+    path = work_dir/'replay.bin'
+    stack_records = [
+        TraceRecord(TraceKind.RD,abi_reg_map['sp'],1,0,0x1000),
+        TraceRecord(TraceKind.RD,abi_reg_map['sp'],2,0,0xFF0),
+        TraceRecord(TraceKind.PC,0,3,0x20,0),
+        TraceRecord(TraceKind.RD,abi_reg_map['sp'],4,0,0xFE0),
+        TraceRecord(TraceKind.PC,0,5,0x40,0),
+        TraceRecord(TraceKind.RD,abi_reg_map['sp'],6,0,0xFD0),
+        TraceRecord(TraceKind.RD,abi_reg_map['sp'],7,0,0xFE0),
+    ]
+    write_trace(path,stack_records)
+    replay = TraceReplay()
+    writes = []
+    replay.regfile_write_monitor.add_callback(writes.append)
+    stack_monitor = StackMonitor(replay.regfile_write_monitor, replay.pc_monitor)
+    assert replay.run(read_trace(path)) == len(stack_records)
+    assert writes[0] == RegFileWriteTransaction(reg=abi_reg_map['sp'],data=0x1000)
+    assert stack_monitor.stack == [0x20]
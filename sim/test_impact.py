@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+import test_copperv2
+from impact import ImpactStore, ResultCache, local_imports, param_paths, item_inputs, result_key, file_hash, sim_dir, tests_dir
+
+def collected(function,program=None,**params):
+    """ The parts of a collected test item used by item_inputs, program replaces its program marker """
+    marks = [m for m in getattr(function,'pytestmark',[]) if m.name != 'program' or program is None]
+    if program is not None:
+        marks.append(pytest.mark.program(program).mark)
+    return SimpleNamespace(module=test_copperv2,nodeid=f'test_copperv2.py::{function.__name__}',
+        callspec=SimpleNamespace(params=params),iter_markers=lambda name: [m for m in marks if m.name == name])
+
+def test_local_imports():
+    imports = local_imports(sim_dir/'cpi.py')
+    assert sim_dir/'riscv_utils.py' in imports
+    assert sim_dir/'riscv_constants.py' in imports
+    assert all(path.parent == sim_dir for path in imports)
+
+def test_param_paths():
+    assert set(param_paths('crc32')) == {tests_dir/'crc32/crc32.c',tests_dir/'crc32/Makefile'}
+    assert param_paths({'TEST_NAME':'lui'}) == []
+    assert param_paths('copperv2') == []
+
+def test_c_test_inputs():
+    inputs = item_inputs(collected(test_copperv2.test_dhrystone,dut='copperv2'))
+    assert 'sim/tests/dhrystone/dhrystone.c' in inputs
+    assert 'sim/tests/common/crt0.S' in inputs
+    assert 'toolchain[gcc]' in inputs
+    assert 'sim/tests/hello_world/hello_world.c' in item_inputs(collected(test_copperv2.test_hello_world,semihosting=False))
+
+def test_c_test_edit_changes_key(tmp_path):
+    source = tmp_path/'main.c'
+    source.write_text('int main() { return 0; }\n')
+    item = collected(test_copperv2.test_dhrystone,program=tmp_path,dut='copperv2')
+    key = result_key(item)
+    source.write_text('int main() { return 1; }\n')
+    file_hash.cache_clear()
+    assert result_key(item) != key
+
+def test_impact_store(tmp_path):
+    store = ImpactStore(tmp_path)
+    inputs = {'sim/bus.py':'abc','work/rtl/copperv2.v':'def'}
+    assert store.is_impacted('test_a',inputs)
+    store.save('test_a','passed',inputs)
+    assert not store.is_impacted('test_a',dict(inputs))
+    assert store.is_impacted('test_a',{**inputs,'sim/bus.py':'xyz'})
+    store.save('test_a','failed',inputs)
+    assert store.is_impacted('test_a',inputs)
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(tmp_path)
+    assert not cache.hit('abc')
+    cache.store('abc','test_a')
+    assert cache.hit('abc')
+    assert [p.name for p in tmp_path.iterdir()] == ['abc']
+    cache.invalidate('abc')
+    cache.invalidate('abc')
+    assert not cache.hit('abc')
@@ -0,0 +1,71 @@
+from bus import BusReadTransaction, BusWriteTransaction
+from hdl_trace import TraceMonitor
+from metrics import SimMetrics, is_successor, append_metrics, read_metrics, combine_metrics, junit_properties
+
+class FakeScheduler:
+    """ Every reaction takes 10 ms of the fake wall clock """
+    def __init__(self,state):
+        self.state = state
+        self.triggers = []
+    def _react(self,trigger):
+        self.triggers.append(trigger)
+        self.state['wall'] += 0.01
+        if trigger == 'outer':
+            self._react('inner')
+
+def make_metrics():
+    state = dict(cycle=5,time=100,wall=1.0)
+    monitors = {name:TraceMonitor(name) for name in ('bus_ir','bus_dr','bus_dw')}
+    scheduler = FakeScheduler(state)
+    metrics = SimMetrics(monitors,lambda: state['cycle'],lambda: state['time'],scheduler,clock=lambda: state['wall'])
+    return metrics, monitors, scheduler, state
+
+def test_sim_metrics():
+    metrics, monitors, scheduler, state = make_metrics()
+    # addi, beq taken to 0x10, flushed fetch of 0x8, jal to 0x18, addi
+    for addr,inst in [(0x0,0x12300293),(0x4,0x00628663),(0x8,0x12300293),(0x10,0x0080036f),(0x18,0x12300293)]:
+        monitors['bus_ir']._recv(BusReadTransaction('bus_ir',addr=addr,data=inst))
+    monitors['bus_dw']._recv(BusWriteTransaction('bus_dw',addr=0x100,data=0,strobe=0xF))
+    scheduler._react('outer')
+    state['cycle'] = 25
+    state['time'] = 300
+    state['wall'] += 0.05
+    data = metrics.to_dict()
+    assert scheduler.triggers == ['outer','inner']
+    assert data['cycles'] == 20
+    assert data['sim_time_ns'] == 200
+    assert data['transactions'] == dict(bus_ir=5,bus_dr=0,bus_dw=1)
+    # The flushed fetch and the last one are not retired
+    assert data['instructions'] == 3
+    # The nested react is included in the outer one
+    assert abs(data['python_time'] - 0.02) < 1e-9
+    assert abs(data['wall_time'] - 0.07) < 1e-9
+    assert abs(data['simulator_time'] - 0.05) < 1e-9
+    # Restored on close
+    assert scheduler._react.__func__ is FakeScheduler._react
+    assert metrics.to_dict() == data
+
+def test_combine_metrics(tmp_path):
+    path = tmp_path/'metrics.jsonl'
+    assert read_metrics(path) == []
+    append_metrics(path,'a',dict(wall_time=1.0,sim_time_ns=10,cycles=5,transactions=dict(bus_ir=2),
+        instructions=2,python_time=0.25,simulator_time=0.75))
+    append_metrics(path,'b',dict(wall_time=2.0,sim_time_ns=20,cycles=10,transactions=dict(bus_ir=3,bus_dw=1),
+        instructions=3,python_time=0.5,simulator_time=1.5))
+    combined = combine_metrics(read_metrics(path))
+    assert combined == dict(simulations=2,wall_time=3.0,sim_time_ns=30,cycles=15,transactions=dict(bus_ir=5,bus_dw=1),
+        instructions=5,python_time=0.75,simulator_time=2.25)
+    properties = dict(junit_properties(combined))
+    assert properties['transactions_bus_ir'] == 5
+    assert properties['python_time'] == 0.75
+    assert 'transactions' not in properties
+
+def test_is_successor():
+    # bne x0,x0,-4 at 0x100 and jal x0,-16 at 0x200
+    assert is_successor(0x100,0xfe001ee3,0xFC)
+    assert is_successor(0x100,0xfe001ee3,0x104)
+    assert not is_successor(0x100,0xfe001ee3,0x108)
+    assert is_successor(0x200,0xff1ff06f,0x1F0)
+    assert not is_successor(0x200,0xff1ff06f,0x204 + 4)
+    # jalr goes anywhere
+    assert is_successor(0x300,0x00008067,0x1234)
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from perf_history import PerfHistory, collect_results, compare_table, metric_kind
+
+def write_report(path,dut,data):
+    path.parent.mkdir(parents=True,exist_ok=True)
+    path.write_text(json.dumps(dict(test=path.stem,dut=dut,data=data)))
+
+def test_collect_results(tmp_path):
+    write_report(tmp_path/'test_dhrystone_copperv2/dhrystone_dhrystone.json','copperv2',
+        dict(dmips_per_mhz=0.5,cycles_per_run=3500.0))
+    write_report(tmp_path/'test_kernel_crc32_copperv2/crc32_kernels.json','copperv2',
+        dict(crc32=dict(cycles=1000,iterations=10,cycles_per_iteration=100.0)))
+    write_report(tmp_path/'test_wishbone_adapter_stress_1.0/wishbone_adapter_stress_rate1_throughput.json','WishboneAdapter',
+        dict(transactions_per_cycle=0.25))
+    (tmp_path/'metrics.json').write_text(json.dumps({
+        'sim/test_copperv2.py::test_unit[add]':dict(wall_time=2.0,cycles=1000),
+        'sim/test_copperv2.py::test_unit[sub]':dict(wall_time=2.0,cycles=3000),
+    }))
+    results = collect_results(tmp_path)
+    assert results['dhrystone.copperv2.dmips_per_mhz'] == (0.5,True)
+    assert results['dhrystone.copperv2.cycles_per_run'] == (3500.0,False)
+    assert results['kernel.crc32.copperv2.cycles_per_iteration'] == (100.0,False)
+    assert results['throughput.wishbone_adapter_stress_rate1_throughput.WishboneAdapter.transactions_per_cycle'] == (0.25,True)
+    assert results['test.sim/test_copperv2.py::test_unit[add].wall_time'] == (2.0,False)
+    assert results['test.cycles_per_second'] == (1000.0,True)
+
+def test_collect_results_since(tmp_path):
+    old = tmp_path/'test_dhrystone_copperv1/dhrystone_dhrystone.json'
+    write_report(old,'copperv1',dict(dmips_per_mhz=0.4,cycles_per_run=4000.0))
+    os.utime(old,(1000,1000))
+    write_report(tmp_path/'test_dhrystone_copperv2/dhrystone_dhrystone.json','copperv2',
+        dict(dmips_per_mhz=0.5,cycles_per_run=3500.0))
+    results = collect_results(tmp_path,since=2000)
+    assert set(results) == {'dhrystone.copperv2.dmips_per_mhz','dhrystone.copperv2.cycles_per_run'}
+
+def test_collect_qor(tmp_path):
+    qor_path = tmp_path/'qor.json'
+    qor_path.write_text(json.dumps(dict(Copperv2Core=dict(cells=1200,transistors=30000,logic_depth=42,wires=10))))
+    results = collect_results(tmp_path/'sim',qor_path)
+    assert results == {'qor.Copperv2Core.cells':(1200,False),'qor.Copperv2Core.transistors':(30000,False),
+        'qor.Copperv2Core.logic_depth':(42,False)}
+    assert metric_kind('qor.Copperv2Core.cells') == 'synthesis'
+
+@pytest.fixture
+def history(tmp_path):
+    history = PerfHistory(tmp_path/'history.sqlite')
+    yield history
+    history.close()
+
+def test_compare(history):
+    for i,wall_time in enumerate([10.0,10.4,9.6,10.2,9.8]):
+        history.record(f'base{i}','icarus',{'kernel.crc32.copperv2.cycles_per_iteration':(100.0,False),
+            'test.t.wall_time':(wall_time,False),'dhrystone.copperv2.dmips_per_mhz':(0.5,True)},timestamp=i)
+    history.record('other','verilator',{'test.t.wall_time':(1.0,False)},timestamp=10)
+    # Deterministic cycles regress on any change above the threshold, noisy wall time only beyond z_limit
+    history.record('head','icarus',{'kernel.crc32.copperv2.cycles_per_iteration':(103.0,False),
+        'test.t.wall_time':(10.5,False),'dhrystone.copperv2.dmips_per_mhz':(0.55,True)},timestamp=11)
+    rows = {r['metric']:r for r in history.compare('icarus',baseline=5)}
+    assert rows['kernel.crc32.copperv2.cycles_per_iteration']['regression']
+    assert rows['kernel.crc32.copperv2.cycles_per_iteration']['kind'] == 'core'
+    assert not rows['test.t.wall_time']['regression']
+    assert rows['test.t.wall_time']['kind'] == 'testbench'
+    assert rows['dhrystone.copperv2.dmips_per_mhz']['improvement']
+    assert not rows['dhrystone.copperv2.dmips_per_mhz']['regression']
+    table = compare_table(list(rows.values()))
+    assert 'REGRESSION' in table and 'test.t.wall_time' not in table
+    history.record('slow','icarus',{'test.t.wall_time':(15.0,False)},timestamp=12)
+    rows = {r['metric']:r for r in history.compare('icarus',baseline=5)}
+    assert list(rows) == ['test.t.wall_time']
+    assert rows['test.t.wall_time']['regression']
+
+def test_compare_needs_baseline(history):
+    history.record('head','icarus',{'test.t.wall_time':(1.0,False)})
+    with pytest.raises(ValueError):
+        history.compare('icarus')
+
+def test_record_same_run(history):
+    results = {'kernel.a':(1.0,False),'dhrystone.b':(0.5,True)}
+    assert history.record('head','icarus',results) is not None
+    assert history.record('head','icarus',dict(results)) is None
+    assert history.record('head','verilator',results) is not None
+    assert history.record('head','icarus',{**results,'test.t.wall_time':(1.0,False)}) is not None
+    assert len(history.runs('icarus')) == 2
+
+def test_trend(history):
+    history.record('0123456789','icarus',{'kernel.a':(1.0,False),'test.t.wall_time':(2.0,False)},timestamp=0)
+    history.record('abcdef0123','icarus',{'kernel.a':(1.5,False)},dirty=True,timestamp=1)
+    table = history.trend('icarus',pattern='kernel.*')
+    assert '01234567' in table and 'abcdef01+' in table
+    assert 'kernel.a' in table and 'wall_time' not in table
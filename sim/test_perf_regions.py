@@ -0,0 +1,51 @@
+import pytest
+
+from bus import BusReadTransaction, BusWriteTransaction
+from hdl_trace import TraceMonitor
+from perf_regions import PerfRegions, REGION_END
+
+def make_regions():
+    state = dict(cycle=0)
+    monitors = [TraceMonitor(name) for name in ('bus_ir','bus_dr','bus_dw')]
+    regions = PerfRegions(*monitors,lambda: state['cycle'])
+    return regions, monitors, state
+
+def test_nested_regions():
+    regions, (ir, dr, dw), state = make_regions()
+    regions.write(1)
+    for _ in range(3):
+        ir._recv(BusReadTransaction('bus_ir',addr=0,data=0))
+    state['cycle'] = 10
+    regions.write(2)
+    dr._recv(BusReadTransaction('bus_dr',addr=0x100,data=0))
+    dw._recv(BusWriteTransaction('bus_dw',addr=0x100,data=0,strobe=0xF))
+    ir._recv(BusReadTransaction('bus_ir',addr=4,data=0))
+    state['cycle'] = 25
+    regions.write(2 | REGION_END)
+    state['cycle'] = 30
+    regions.write(1 | REGION_END)
+    stats = regions.to_dict()
+    assert stats[1]['cycles'] == 30
+    assert stats[1]['self_cycles'] == 15
+    assert stats[1]['instructions'] == 4
+    assert stats[1]['dr'] == 1
+    assert stats[2]['cycles'] == 15
+    assert stats[2]['self_cycles'] == 15
+    assert (stats[2]['instructions'],stats[2]['dr'],stats[2]['dw']) == (1,1,1)
+    assert stats[2]['max_depth'] == 1
+
+def test_repeated_region():
+    regions, _, state = make_regions()
+    for start in (0,100):
+        state['cycle'] = start
+        regions.write(7)
+        state['cycle'] = start + 20
+        regions.write(7 | REGION_END)
+    assert regions.stats[7].count == 2
+    assert regions.stats[7].cycles == 40
+
+def test_unbalanced_region():
+    regions, _, _ = make_regions()
+    regions.write(1)
+    with pytest.raises(ValueError):
+        regions.write(2 | REGION_END)
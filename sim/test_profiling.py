@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import cocotb
+import pytest
+
+from profiling import parse_mode, make_profiler, profiled, SamplingProfiler, DeterministicProfiler, SIMULATOR
+
+def test_parse_mode():
+    assert parse_mode(None) is None
+    assert parse_mode('') is None
+    assert parse_mode(True) == ('cprofile',0.001)
+    assert parse_mode('sample') == ('sample',0.001)
+    assert parse_mode('sample:0.5') == ('sample',0.0005)
+    with pytest.raises(ValueError):
+        parse_mode('perf')
+    assert isinstance(make_profiler('sample'),SamplingProfiler)
+    assert isinstance(make_profiler('cprofile'),DeterministicProfiler)
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+async def monitor_task(seconds):
+    spin(seconds)
+    await asyncio.sleep(0)
+
+def test_sampling_profiler_tasks(tmp_path):
+    profiler = SamplingProfiler(interval=0.0005)
+    profiler.start()
+    asyncio.run(monitor_task(0.1))
+    time.sleep(0.05)
+    profiler.stop()
+    tasks, self_samples, total_samples = profiler.summary()
+    assert tasks['test_profiling:monitor_task'] > 0
+    assert self_samples['test_profiling:spin'] > 0
+    assert total_samples['test_profiling:monitor_task'] >= self_samples['test_profiling:spin']
+    folded, table = profiler.write(tmp_path/'x_profile')
+    assert 'test_profiling:monitor_task;test_profiling:spin' in folded.read_text()
+    assert 'test_profiling:spin' in table.read_text()
+
+@profiled
+async def profiled_test(dut):
+    spin(0.05)
+
+def test_sampling_profiler_profiled_task(tmp_path, monkeypatch):
+    """ The task of a @profiled test is the test, not the wrapper """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cocotb,'plusargs',{})
+    monkeypatch.setenv('TB_PROFILE','sample:0.5')
+    asyncio.run(profiled_test(None))
+    tasks = (tmp_path/'profiled_test_profile.txt').read_text().split('\n\n')[1]
+    assert 'test_profiling:profiled_test' in tasks
+    assert 'wrapper' not in tasks
+
+def test_sampling_profiler_idle():
+    """ No Python frame is active in the profiled thread """
+    profiler = SamplingProfiler()
+    profiler.thread_id = -1
+    profiler.sample()
+    assert profiler.summary()[0] == {SIMULATOR:1}
+    assert profiler.folded() == f'{SIMULATOR} 1\n'
+
+def test_profiled(tmp_path, monkeypatch):
+    @profiled
+    async def some_test(dut):
+        spin(0.01)
+        return dut
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cocotb,'plusargs',{})
+    monkeypatch.delenv('TB_PROFILE',raising=False)
+    assert asyncio.run(some_test(1)) == 1
+    assert list(tmp_path.iterdir()) == []
+    monkeypatch.setenv('TB_PROFILE','cprofile')
+    assert asyncio.run(some_test(2)) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['some_test_profile.prof','some_test_profile.txt']
+    assert 'spin' in (tmp_path/'some_test_profile.txt').read_text()
+    assert some_test.__name__ == 'some_test'
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import toml
+
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction, RegFileReadTransaction
+from hdl_trace import TraceMonitor
+from recorder import TransactionRecorder, Channel, ReplayScoreboard, read_recording, unit_test_expected
+
+toml_path = Path(__file__).resolve().parent/'tests/unit_tests.toml'
+
+transactions = [
+    (Channel.BUS_IR, BusReadTransaction('bus_ir',addr=0x100,data=0x12300293)),
+    (Channel.REGFILE_READ, RegFileReadTransaction(reg1=0,data1=0)),
+    (Channel.REGFILE_READ, RegFileReadTransaction(reg1=5,data1=12,reg2=6,data2=34)),
+    (Channel.REGFILE_WRITE, RegFileWriteTransaction(reg=5,data=0x123)),
+    (Channel.BUS_DR, BusReadTransaction('bus_dr',addr=0x20,data=0xCAFE)),
+    (Channel.BUS_DW, BusWriteTransaction('bus_dw',addr=0x24,data=0xBEEF,strobe=0x3,response=1)),
+]
+
+def record(path,transactions,flush_interval=2):
+    monitors = {channel:TraceMonitor(channel.name) for channel in Channel}
+    cycle = 0
+    recorder = TransactionRecorder(path,lambda: cycle,flush_interval=flush_interval)
+    for channel,monitor in monitors.items():
+        recorder.attach(monitor,channel)
+    for cycle,(channel,transaction) in enumerate(transactions):
+        monitors[channel]._recv(transaction)
+    recorder.close()
+    # Monitors can still see transactions after the end of the test
+    monitors[Channel.BUS_IR]._recv(transactions[0][1])
+    recorder.close()
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path/'test.bin'
+    record(path,transactions)
+    records = list(read_recording(path))
+    assert [r.cycle for r in records] == list(range(len(transactions)))
+    for r,(channel,transaction) in zip(records,transactions):
+        assert r.channel == channel
+        assert r.transaction == transaction
+
+def test_replay_unit_test(tmp_path):
+    test = toml.loads(toml_path.read_text())['add']
+    path = tmp_path/'add.bin'
+    recorded = [(channel,t) for channel,expected in unit_test_expected(test).items() for t in expected]
+    record(path,recorded)
+    scoreboard = ReplayScoreboard(unit_test_expected(test))
+    for r in read_recording(path):
+        scoreboard.check(r)
+    assert scoreboard.finish() == []
+    # Corrupt the last regfile write
+    recorded[2] = (Channel.REGFILE_WRITE,RegFileWriteTransaction(reg=7,data=45))
+    record(path,recorded)
+    scoreboard = ReplayScoreboard(unit_test_expected(test))
+    for r in read_recording(path):
+        scoreboard.check(r)
+    errors = scoreboard.finish()
+    assert len(errors) == 1 and 'REGFILE_WRITE' in errors[0]
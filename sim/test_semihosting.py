@@ -0,0 +1,63 @@
+import struct
+
+from cocotb_utils import to_bytes
+from semihosting import Semihost, SemihostOp, VarArgs, format_printf, BLOCK_RESULT
+
+def store(memory,addr,data):
+    for i,value in enumerate(data):
+        memory[addr+i] = value
+
+def store_words(memory,addr,words):
+    store(memory,addr,b''.join(to_bytes(w & 0xFFFFFFFF) for w in words))
+
+def make_semihost(file_root=None):
+    memory = {}
+    output = []
+    exits = []
+    semihost = Semihost(memory,output.append,exits.append,file_root=file_root)
+    return semihost, memory, output, exits
+
+def call(semihost,memory,op,*args):
+    store_words(memory,0x1000,[op,*args,*[0]*(4-len(args)),0])
+    semihost.call(0x1000)
+    result = int.from_bytes(bytes(memory[0x1000+BLOCK_RESULT+i] for i in range(4)),'little')
+    return result - (1 << 32) if result & (1 << 31) else result
+
+def test_format_printf():
+    semihost, memory, _, _ = make_semihost()
+    store(memory,0x200,b'world\0')
+    store_words(memory,0x100,[-5,0xBEEF,0x200,ord('!'),0])
+    # 64 bit arguments are 8 byte aligned
+    store(memory,0x118,struct.pack('<qd',-(1 << 40),1.5))
+    args = VarArgs(semihost.read_word,0x100)
+    text = format_printf("%d %08x %-6s|%c %u%% %lld %.2f",args,semihost.read_string)
+    assert text == f"-5 0000beef world |! 0% {-(1 << 40)} 1.50"
+
+def test_write_and_printf():
+    semihost, memory, output, _ = make_semihost()
+    store(memory,0x200,b'value %d\n\0')
+    store_words(memory,0x300,[42])
+    assert call(semihost,memory,SemihostOp.PRINTF,0x200,0x300) == 9
+    store(memory,0x400,b'abc')
+    assert call(semihost,memory,SemihostOp.WRITE,1,0x400,3) == 3
+    assert output == ['value 42\n','abc']
+
+def test_exit():
+    semihost, memory, _, exits = make_semihost()
+    call(semihost,memory,SemihostOp.EXIT,0)
+    call(semihost,memory,SemihostOp.EXIT,-1)
+    assert exits == [0,-1]
+
+def test_read(tmp_path):
+    (tmp_path/'input.bin').write_bytes(b'0123456789')
+    semihost, memory, _, _ = make_semihost(file_root=tmp_path)
+    store(memory,0x200,b'input.bin\0')
+    assert call(semihost,memory,SemihostOp.READ,0x200,0x800,4,3) == 4
+    assert bytes(memory[0x800+i] for i in range(4)) == b'3456'
+    store(memory,0x300,b'../outside\0')
+    assert call(semihost,memory,SemihostOp.READ,0x300,0x800,4,0) == -1
+
+def test_read_without_root():
+    semihost, memory, _, _ = make_semihost()
+    store(memory,0x200,b'input.bin\0')
+    assert call(semihost,memory,SemihostOp.READ,0x200,0x800,4,0) == -1
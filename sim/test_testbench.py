@@ -1,5 +1,7 @@
 import logging
 import os
+import subprocess
+import sys
 from pathlib import Path
 from textwrap import dedent
 from cocotb.log import SimLog
@@ -10,10 +12,11 @@ from cocotb_test.simulator import run
 from cocotb_utils import Bfm
 
 import cocotb
-from cocotb.triggers import Join, RisingEdge
+from cocotb.triggers import Join, RisingEdge, ReadOnly
 from bus import ReadyValidBfm
 from cocotb_utils import anext
 from wishbone import WishboneBfm
+from profiling import profiled
 
 root_dir = Path(__file__).resolve().parent.parent
 work_dir = root_dir/'work/sim/test_testbench'
@@ -52,7 +55,8 @@ def wishbone_rtl():
         output cyc,
         output stb,
         output ack,
-        output sel
+        output sel,
+        output stall
     );
     initial #1000;
     endmodule
@@ -65,6 +69,7 @@ def fake_signals():
     return Bfm.make_signals("FakeSignals",["a","b"],optional=["c"])
 
 @cocotb.test(timeout_time=10,timeout_unit="us")
+@profiled
 async def run_ready_valid_bfm_test(dut):
     """ ready/valid BFM test """
     SimLog("bfm").setLevel(logging.DEBUG)
@@ -115,6 +120,7 @@ def test_signals_dataclass_missing(fake_signals):
         foo = fake_signals(a=1)
 
 @cocotb.test(timeout_time=10,timeout_unit="us")
+@profiled
 async def run_wishbone_bfm_read_test(dut):
     """ Wishbone BFM read test """
     SimLog("bfm").setLevel(logging.DEBUG)
@@ -137,6 +143,7 @@ async def run_wishbone_bfm_read_test(dut):
     await RisingEdge(dut.clock)
 
 @cocotb.test(timeout_time=10,timeout_unit="us")
+@profiled
 async def run_wishbone_bfm_write_test(dut):
     """ Wishbone BFM write test """
     SimLog("bfm").setLevel(logging.DEBUG)
@@ -179,3 +186,93 @@ def test_wishbone_write(wishbone_rtl):
         sim_build=work_dir/'test_wishbone_write',
         testcase = "run_wishbone_bfm_write_test",
     )
+
+async def run_pipelined_wishbone(dut,sink_depth,count=64):
+    """ Pipelined source and sink BFMs on the same bus, returns the cycles
+    taken by count transfers and the cycles the sink stalled """
+    source = WishboneBfm(dut.clock,entity=dut,reset=dut.reset,pipelined=True,max_outstanding=4)
+    sink = WishboneBfm(dut.clock,entity=dut,reset=dut.reset,pipelined=True,max_outstanding=sink_depth)
+    source.start_clock()
+    await source.reset()
+    # The pipelines sample reset, start them once it is driven
+    source.source_init()
+    sink.sink_init()
+    memory = {}
+    async def responder():
+        async for request in sink.sink_receive():
+            if 'data' in request:
+                memory[request['addr']] = request['data']
+                await sink.sink_reply()
+            else:
+                await sink.sink_reply(memory.get(request['addr'],0))
+    stalls = 0
+    async def count_stalls():
+        nonlocal stalls
+        while True:
+            await RisingEdge(dut.clock)
+            await ReadOnly()
+            stalls += dut.stall.value.binstr == "1"
+    cocotb.start_soon(responder())
+    cocotb.start_soon(count_stalls())
+    start = source.cycle
+    # Writes to 16 addresses then reads of them, issued without waiting for the acks
+    issued = [await source.source_issue(data=i,addr=i % 16,wr_enable=i < 16) for i in range(count)]
+    for i,done in enumerate(issued):
+        await done.wait()
+        assert done.data['ack']
+        if i >= 16:
+            assert done.data['data'] == i % 16, f"Read {i}: {done.data}"
+    return source.cycle - start, stalls
+
+@cocotb.test(timeout_time=10,timeout_unit="us")
+@profiled
+async def run_wishbone_bfm_pipelined_test(dut):
+    """ Pipelined Wishbone BFM throughput with and without sink stalls """
+    count = 64
+    cycles, stalls = await run_pipelined_wishbone(dut,sink_depth=4,count=count)
+    # One transfer per clock once the pipeline is full
+    assert cycles <= count + 4, f"{count} transfers took {cycles} cycles"
+    assert stalls == 0
+    await RisingEdge(dut.clock)
+
+@cocotb.test(timeout_time=10,timeout_unit="us")
+@profiled
+async def run_wishbone_bfm_stall_test(dut):
+    """ Pipelined Wishbone BFM with a sink of one outstanding request """
+    count = 32
+    cycles, stalls = await run_pipelined_wishbone(dut,sink_depth=1,count=count)
+    # The sink stalls until its single request is acknowledged
+    assert cycles >= 2*count - 2, f"{count} transfers took {cycles} cycles"
+    assert stalls >= count - 1
+
+def test_wishbone_pipelined(wishbone_rtl):
+    run(
+        verilog_sources=[wishbone_rtl],
+        toplevel="top",
+        module="test_testbench",
+        waves = True,
+        sim_build=work_dir/'test_wishbone_pipelined',
+        testcase = "run_wishbone_bfm_pipelined_test,run_wishbone_bfm_stall_test",
+    )
+
+def test_cocotb_tests_startup_imports():
+    """ Every simulation imports cocotb_tests, the UVM and report only
+    dependencies must not be loaded until used """
+    code = "import sys, cocotb_tests; print(' '.join(sys.modules))"
+    r = subprocess.run([sys.executable,'-c',code],cwd=root_dir/'sim',capture_output=True,encoding='utf-8',check=True)
+    loaded = set(r.stdout.split())
+    assert loaded.isdisjoint({'pyuvm','wb_adapter_uvm','wishbone','toml','tabulate','elftools','numpy'})
+
+# Wall clock, only checked on request, e.g. STARTUP_TIME_LIMIT_MS=100 on an idle machine
+startup_time_limit_ms = os.environ.get('STARTUP_TIME_LIMIT_MS')
+
+@pytest.mark.skipif(startup_time_limit_ms is None,reason="STARTUP_TIME_LIMIT_MS not set")
+def test_cocotb_tests_startup_time():
+    """ The simulator imports cocotb before the test module, the rest of the
+    startup is ours: about 25 ms, 45 ms without a bytecode cache """
+    def import_time():
+        code = "import cocotb; import cocotb_tests"
+        r = subprocess.run([sys.executable,'-X','importtime','-c',code],cwd=root_dir/'sim',capture_output=True,encoding='utf-8',check=True)
+        line = next(line for line in r.stderr.splitlines() if line.endswith('| cocotb_tests'))
+        return int(line.split('|')[1])/1e6
+    assert min(import_time() for _ in range(3)) < float(startup_time_limit_ms)/1000
@@ -0,0 +1,29 @@
+import pytest
+
+from timing_models import FixedLatency, TraceLatency, parse_latency_model, parse_ready_pattern
+
+def test_fixed_latency():
+    assert parse_latency_model("fixed:3").latency(None) == 3
+    assert isinstance(parse_latency_model("fixed:3"),FixedLatency)
+
+def test_uniform_latency_seeded():
+    a = parse_latency_model("uniform:1:5",seed=7)
+    b = parse_latency_model("uniform:1:5",seed=7)
+    sequence = [a.latency(None) for _ in range(100)]
+    assert sequence == [b.latency(None) for _ in range(100)]
+    assert min(sequence) >= 1 and max(sequence) <= 5
+
+def test_trace_latency_wraps():
+    model = TraceLatency([1,2,3])
+    assert [model.latency(None) for _ in range(5)] == [1,2,3,1,2]
+
+def test_ready_patterns():
+    periodic = parse_ready_pattern("periodic:2:1")
+    assert [periodic.next() for _ in range(6)] == [True,True,False]*2
+    a = parse_ready_pattern("random:0.5",seed=1)
+    b = parse_ready_pattern("random:0.5",seed=1)
+    assert [a.next() for _ in range(50)] == [b.next() for _ in range(50)]
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        parse_latency_model("gaussian:1")
@@ -0,0 +1,106 @@
+import fcntl
+import hashlib
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from riscv_utils import build_riscv_test, build_c_test, write_hex
+
+root_dir = Path(__file__).resolve().parent.parent
+sim_dir = root_dir/'sim'
+tb_dir = sim_dir/'verilog_testbench'
+rtl_v1_dir = root_dir/'src/main/resources/rtl_v1'
+work_dir = root_dir/'work/sim/verilog_testbench'
+simulator = os.environ.get('SIM','icarus')
+rv_asm_paths = sorted(sim_dir.glob('tests/isa/rv32ui/*.S'))
+c_test_names = ['hello_world','crc32','memcpy_bw','matmul','linked_list','state_machine','muldiv']
+run_timeout = 600
+
+# Pure HDL testbench, fake_memory.v loads +HEX_FILE and testbench.v prints the result
+verilog_run_opts = dict(
+    verilog_sources=[
+        rtl_v1_dir/"copperv.v",
+        rtl_v1_dir/"control_unit.v",
+        rtl_v1_dir/"idecoder.v",
+        rtl_v1_dir/"register_file.v",
+        rtl_v1_dir/"execution.v",
+        tb_dir/"testbench.v",
+        tb_dir/"fake_memory.v",
+    ],
+    includes=[rtl_v1_dir/'include',tb_dir/'include'],
+    toplevel="tb",
+)
+
+def sources_hash():
+    files = [*verilog_run_opts['verilog_sources'],tb_dir/'sim_main.cpp',
+        *[p for include in verilog_run_opts['includes'] for p in sorted(include.iterdir())]]
+    h = hashlib.sha1(simulator.encode())
+    for path in files:
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+def build_command(build_dir):
+    includes = [f'-I{include}' for include in verilog_run_opts['includes']]
+    sources = [str(p) for p in verilog_run_opts['verilog_sources']]
+    if simulator == 'icarus':
+        return ['iverilog','-s',verilog_run_opts['toplevel'],*includes,'-o',str(build_dir/'sim.vvp'),*sources]
+    if simulator == 'verilator':
+        return ['verilator','-Wno-fatal',*includes,'--top-module',verilog_run_opts['toplevel'],'--cc','--exe','--build',
+            '-Mdir',str(build_dir/'obj_dir'),'-o','sim',str(tb_dir/'sim_main.cpp'),*sources]
+    raise ValueError(f"Unsupported simulator {simulator}")
+
+def model_command(build_dir):
+    if simulator == 'icarus':
+        return ['vvp','-n',str(build_dir/'sim.vvp')]
+    return [str(build_dir/'obj_dir/sim')]
+
+@pytest.fixture(scope="session")
+def verilog_model():
+    """ Build the simulation model once, the xdist workers wait on the lock
+    for the first one. It is rebuilt only when a source changes. """
+    build_dir = work_dir/simulator
+    build_dir.mkdir(parents=True,exist_ok=True)
+    stamp = build_dir/'sources.sha1'
+    digest = sources_hash()
+    with (build_dir/'build.lock').open('w') as lock:
+        fcntl.flock(lock,fcntl.LOCK_EX)
+        if not stamp.exists() or stamp.read_text() != digest:
+            stamp.unlink(missing_ok=True)
+            subprocess.run(build_command(build_dir),cwd=build_dir,check=True)
+            stamp.write_text(digest)
+    return model_command(build_dir)
+
+def run_hex(model,hex_file,run_dir):
+    r = subprocess.run([*model,f'+HEX_FILE={hex_file}','+no_waves'],cwd=run_dir,
+        capture_output=True,encoding='utf-8',timeout=run_timeout)
+    output = r.stdout + r.stderr
+    (run_dir/'sim.log').write_text(output)
+    return r.returncode, output
+
+def check_result(returncode,output,details=''):
+    """ details are added to the failure message, e.g. the UART output """
+    assert returncode == 0, f"Simulator exited with {returncode}\n{output}{details}"
+    assert 'TEST FAILED' not in output and 'Simulation timeout' not in output, output + details
+    assert 'TEST PASSED' in output, f"No TEST PASSED in the simulator output\n{output}{details}"
+
+def run_directory(name):
+    path = work_dir/'tests'/name
+    path.mkdir(parents=True,exist_ok=True)
+    return path
+
+@pytest.mark.parametrize("asm_path",[pytest.param(str(path),id=path.stem) for path in rv_asm_paths])
+def test_verilog_riscv(verilog_model,asm_path):
+    run_dir = run_directory(Path(asm_path).stem)
+    hex_file = write_hex(build_riscv_test(asm_path,run_dir))
+    check_result(*run_hex(verilog_model,hex_file,run_dir))
+
+@pytest.mark.parametrize("name",c_test_names)
+def test_verilog_c(verilog_model,name):
+    run_dir = run_directory(name)
+    hex_file = write_hex(build_c_test(sim_dir/'tests'/name,['-O2'],run_dir))
+    returncode, output = run_hex(verilog_model,hex_file,run_dir)
+    uart_path = run_dir/'fake_uart.log'
+    uart = uart_path.read_text() if uart_path.exists() else ''
+    check_result(returncode,output,f"\nFake UART output:\n{uart}")
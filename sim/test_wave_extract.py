@@ -0,0 +1,55 @@
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction, RegFileReadTransaction
+from wave_extract import WaveTransactions, parse_vcd
+
+signals = ['clk','rst',*WaveTransactions.bus_signals,*[f'regfile.{s}' for s in WaveTransactions.regfile_signals]]
+
+def write_vcd(path,cycles):
+    """ One entry per clock cycle with the values after the rising edge """
+    codes = {name:chr(33+i) for i,name in enumerate(signals)}
+    lines = ['$timescale 1ns $end','$scope module top $end']
+    for name in signals:
+        if '.' not in name:
+            lines.append(f'$var wire 32 {codes[name]} {name} [31:0] $end')
+    lines.append('$scope module regfile $end')
+    for name in signals:
+        if '.' in name:
+            lines.append(f'$var wire 32 {codes[name]} {name.split(".")[1]} [31:0] $end')
+    lines += ['$upscope $end','$upscope $end','$enddefinitions $end']
+    for cycle,values in enumerate(cycles):
+        lines.append(f'#{10*cycle}')
+        lines.append(f'b1 {codes["clk"]}')
+        for name in signals[1:]:
+            lines.append(f'b{values.get(name,0):b} {codes[name]}')
+        lines.append(f'#{10*cycle+5}')
+        lines.append(f'b0 {codes["clk"]}')
+    path.write_text('\n'.join(lines)+'\n')
+
+def test_parse_vcd_x_values():
+    vcd = ['$scope module top $end','$var wire 4 ! sig [3:0] $end','$upscope $end','$enddefinitions $end',
+        '#0','bxx10 !','#5','b1010 !']
+    sig = parse_vcd(vcd)['top.sig']
+    assert list(sig.times) == [0,5]
+    assert list(sig.at([0,4,5,100])) == [2,2,10,10]
+
+def test_wave_transactions(tmp_path):
+    cycles = [
+        dict(),
+        dict(rst=1),
+        dict(rst=1,ir_addr_valid=1,ir_addr_ready=1,ir_addr=0x100),
+        dict(rst=1,ir_data_valid=1,ir_data_ready=1,ir_data=0x12300293,**{'regfile.rs1_en':1}),
+        dict(rst=1,**{'regfile.rs1':5,'regfile.rs1_dout':12}),
+        dict(rst=1,dw_data_addr_valid=1,dw_data_addr_ready=1,dw_addr=0x20,dw_data=0xBEEF,dw_strobe=0x3),
+        dict(rst=1,dw_resp_valid=1,dw_resp_ready=1,dw_resp=1,**{'regfile.rd_en':1,'regfile.rd':6,'regfile.rd_din':0x123}),
+        dict(rst=1,dr_addr_valid=1,dr_addr_ready=1,dr_addr=0x40),
+        dict(rst=1),
+        dict(rst=1,dr_data_valid=1,dr_data_ready=1,dr_data=0xCAFE),
+    ]
+    path = tmp_path/'dump.vcd'
+    write_vcd(path,cycles)
+    transactions = WaveTransactions(path,'top',prefix='').transactions()
+    assert transactions['bus_ir'] == [BusReadTransaction('bus_ir',addr=0x100,data=0x12300293)]
+    assert transactions['bus_dr'] == [BusReadTransaction('bus_dr',addr=0x40,data=0xCAFE)]
+    assert transactions['bus_dw'] == [BusWriteTransaction('bus_dw',addr=0x20,data=0xBEEF,strobe=0x3,response=1)]
+    assert transactions['regfile_write'] == [RegFileWriteTransaction(reg=6,data=0x123)]
+    assert transactions['regfile_read'] == [RegFileReadTransaction(reg1=5,data1=12)]
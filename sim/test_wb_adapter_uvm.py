@@ -0,0 +1,73 @@
+import itertools
+import logging
+
+import pytest
+
+from wb_adapter_uvm import Scoreboard, ScoreboardConfig, BusReadSeqItem, StressConfig, stress_items
+
+# Components are children of the uvm_root singleton, the names must be unique
+scoreboard_ids = itertools.count()
+
+def make_scoreboard(**kwargs):
+    scoreboard = Scoreboard(f"scoreboard_{next(scoreboard_ids)}",None,ScoreboardConfig(**kwargs))
+    # The pyuvm logger needs a running simulator
+    scoreboard.logger = logging.getLogger('test_wb_adapter_uvm')
+    scoreboard.build_phase()
+    return scoreboard
+
+def read_item(addr,data):
+    item = BusReadSeqItem("item")
+    item.addr = addr
+    item.data = data
+    return item
+
+def test_scoreboard_streaming():
+    scoreboard = make_scoreboard(input_count=2)
+    for i in range(100):
+        scoreboard.exports[0].ref.write(read_item(i,i))
+        scoreboard.exports[0].dut.write(read_item(i,i))
+    for i in range(3):
+        scoreboard.exports[1].dut.write(read_item(i,0))
+    for i in range(3):
+        scoreboard.exports[1].ref.write(read_item(i,0))
+    assert scoreboard.matched == [100,3]
+    assert scoreboard.max_pending == [1,3]
+    assert all(len(p.ref) == len(p.dut) == 0 for p in scoreboard.pending)
+    scoreboard.check_phase()
+
+def test_scoreboard_first_mismatch():
+    scoreboard = make_scoreboard()
+    scoreboard.exports[0].ref.write(read_item(1,1))
+    scoreboard.exports[0].dut.write(read_item(1,1))
+    scoreboard.exports[0].ref.write(read_item(2,2))
+    with pytest.raises(AssertionError,match='Input 0 item 1'):
+        scoreboard.exports[0].dut.write(read_item(2,3))
+
+def test_scoreboard_outstanding_limit():
+    scoreboard = make_scoreboard(max_outstanding=4)
+    for i in range(4):
+        scoreboard.exports[0].ref.write(read_item(i,i))
+    with pytest.raises(AssertionError,match='5 ref items waiting'):
+        scoreboard.exports[0].ref.write(read_item(4,4))
+
+def test_scoreboard_unmatched_at_check():
+    scoreboard = make_scoreboard()
+    scoreboard.exports[0].dut.write(read_item(1,1))
+    with pytest.raises(AssertionError,match='had no reference transaction'):
+        scoreboard.check_phase()
+
+def test_stress_items():
+    config = StressConfig(count=20000,write_ratio=0.25,seed=3)
+    items = list(stress_items(config))
+    assert items == list(stress_items(config))
+    assert all(delay == 0 for delay,*_ in items)
+    writes = sum(1 for _,is_write,*_ in items if is_write)
+    assert 0.23 < writes/config.count < 0.27
+    assert all(addr & 3 == 0 and 0 < strobe <= 0xF and data < 2**32 for _,_,addr,data,strobe in items)
+    assert len({strobe for *_,strobe in items}) == 15
+
+def test_stress_items_issue_rate():
+    items = list(stress_items(StressConfig(count=20000,issue_rate=0.25)))
+    # Geometric idle time, mean (1-p)/p
+    mean_delay = sum(delay for delay,*_ in items)/len(items)
+    assert 2.8 < mean_delay < 3.2
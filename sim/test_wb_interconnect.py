@@ -0,0 +1,84 @@
+import pytest
+
+from wb_interconnect import AddressMap, RamSlave, LatencySlave, MasterStats, ContentionWindow, XbarConfig, jain_index, harness_verilog
+
+def test_address_map():
+    address_map = AddressMap()
+    address_map.add('b',0x1000,0x400)
+    address_map.add('a',0x0000,0x1000)
+    address_map.add('c',0x2000,0x1000)
+    assert address_map.lookup(0x0).name == 'a'
+    assert address_map.lookup(0xFFF).name == 'a'
+    assert address_map.lookup(0x1000).name == 'b'
+    assert address_map.lookup(0x1400) is None
+    assert address_map.lookup(0x2FFF).name == 'c'
+    assert address_map.lookup(0x3000) is None
+    assert [r.index for r in address_map.regions] == [0,1,2]
+    with pytest.raises(ValueError,match='overlaps b'):
+        address_map.add('d',0x1200,0x100)
+    with pytest.raises(ValueError,match='overlaps c'):
+        address_map.add('e',0x1800,0x1000)
+
+def test_wbxbar_parameters():
+    address_map = AddressMap()
+    address_map.add('a',0x0000,0x1000)
+    address_map.add('b',0x1000,0x400)
+    slave_addr, slave_mask = address_map.wbxbar_parameters(16)
+    assert slave_addr == 0x1000_0000
+    assert slave_mask == 0xFC00_F000
+    address_map.add('c',0x1800,0x1000)
+    with pytest.raises(ValueError,match='Region c'):
+        address_map.wbxbar_parameters(16)
+
+def test_ram_slave_sel():
+    ram = RamSlave(4)
+    assert ram.access(1,dict(addr=1,data=0x11223344)) == (None,False)
+    ram.access(1,dict(addr=1,data=0xAABBCCDD,sel=0b0101))
+    assert ram.access(1,dict(addr=1)) == (0x11BB33DD,False)
+    slow = LatencySlave(4,(2,5),seed=1)
+    assert all(2 <= slow.latency() <= 5 for _ in range(100))
+    assert LatencySlave(4,3).latency() == 3
+
+def test_jain_index():
+    assert jain_index([10,10,10,10]) == 1.0
+    assert jain_index([40,0,0,0]) == 0.25
+    assert jain_index([0,0]) == 1.0
+
+def test_master_stats():
+    stats = MasterStats('m0')
+    # (cyc, stb, stall, ack, err): 2 cycles waiting for the grant, two requests, an ack and an err
+    for cycle,signals in enumerate([(0,0,0,0,0),(1,1,1,0,0),(1,1,1,0,0),(1,1,0,0,0),(1,1,0,1,0),
+            (1,0,0,0,1),(0,0,0,0,0),(1,1,0,1,0)]):
+        stats.sample(cycle,*map(bool,signals))
+    assert stats.requests == 3
+    assert stats.stalls == 2
+    assert (stats.acks,stats.errors) == (2,1)
+    assert list(stats.arbitration.bins[:3]) == [1,0,1]
+    assert stats.latency.to_dict()['bins'] == [1,2]
+    assert stats.to_dict(cycles=8)['transactions_per_cycle'] == 3/8
+
+def test_contention_window():
+    window = ContentionWindow(requests=4)
+    # m0 is favoured, it completes its 4 requests while m1 completes 1
+    for cycle,completed in enumerate([(1,0),(2,0),(3,1),(4,1),(4,2),(4,3),(4,4)],start=1):
+        window.update(cycle,completed)
+    assert window.closed
+    assert window.cycles == 4
+    assert window.fairness == jain_index([4,1])
+    data = window.to_dict(['m0','m1'])
+    assert data['transactions'] == dict(m0=4,m1=1)
+    assert data['transactions_per_cycle'] == dict(m0=1.0,m1=0.25)
+
+def test_xbar_config_env():
+    config = XbarConfig(masters=4,count=100)
+    assert XbarConfig.from_env(config.to_env()) == config
+    assert XbarConfig.from_env({}) == XbarConfig()
+
+def test_harness_verilog():
+    config = XbarConfig(masters=2)
+    verilog = harness_verilog(config,config.address_map())
+    assert '.NM(2)' in verilog and '.NS(3)' in verilog
+    assert '.i_mcyc({m1_cyc,m0_cyc})' in verilog
+    assert '.i_sdata({s2_datrd,s1_datrd,s0_datrd})' in verilog
+    assert 'input wire [29:0] m1_adr' in verilog and 'output wire [29:0] s2_adr' in verilog
+    assert "input wire s0_stall" in verilog
@@ -1,11 +1,18 @@
+import os
+
 import pytest
 from pathlib import Path
 from cocotb_test.simulator import run
 
+from wb_interconnect import XbarConfig, harness_verilog
+
 root_dir = Path(__file__).resolve().parent.parent
 sim_dir = root_dir/'sim'
 chisel_dir = root_dir/'work/rtl'
 rtl_v1_dir = root_dir/'src/main/resources/rtl_v1'
+wb2axip_rtl_dir = root_dir/'src/main/resources/external/wb2axip/rtl'
+# Transactions per stress run, e.g. STRESS_COUNT=200000 for a throughput measurement
+stress_count = int(os.environ.get('STRESS_COUNT',2000))
 
 def timescale_fix(verilog):
     verilog = Path(verilog)
@@ -14,14 +21,20 @@ def timescale_fix(verilog):
         verilog.write_text("`timescale 1ns/1ps\n"+lines)
     return verilog
 
-wb_adapter_rtl = timescale_fix(chisel_dir/"wb_adapter.v")
+wb_adapter_rtl = chisel_dir/"wb_adapter.v"
 common_run_opts = dict(
     toplevel = "WishboneAdapter",
     verilog_sources=[wb_adapter_rtl],
-    module = "cocotb_tests",
+    module = "cocotb_wishbone_tests",
     waves = True,
 )
 
+@pytest.fixture(scope="module",autouse=True)
+def wb_adapter_timescale():
+    """ Patched before the first simulation instead of at collection, so
+    collecting the suite does not need the generated RTL """
+    timescale_fix(wb_adapter_rtl)
+
 @pytest.mark.skip(reason="UVM is WIP")
 def test_wishbone_adapter_verify():
     run(
@@ -43,3 +56,34 @@ def test_wishbone_adapter_write():
         sim_build=f"work/sim/test_wishbone_adapter_write",
         testcase = "wishbone_adapter_write_test",
     )
+
+@pytest.mark.parametrize("issue_rate",[1.0,0.25])
+def test_wishbone_adapter_stress(issue_rate):
+    run(
+        **dict(common_run_opts,waves=False),
+        sim_build=f"work/sim/test_wishbone_adapter_stress_{issue_rate}",
+        testcase = "wishbone_adapter_stress_test",
+        extra_env = dict(
+            STRESS_COUNT=str(stress_count),
+            STRESS_ISSUE_RATE=str(issue_rate),
+        ),
+    )
+
+@pytest.fixture(params=[2,4],ids=lambda masters: f"m{masters}")
+def wbxbar_harness(request):
+    config = XbarConfig(masters=request.param)
+    harness = root_dir/f"work/sim/test_wbxbar_contention_m{config.masters}/wbxbar_harness.v"
+    harness.parent.mkdir(parents=True,exist_ok=True)
+    harness.write_text(harness_verilog(config,config.address_map()))
+    return config, harness
+
+def test_wbxbar_contention(wbxbar_harness):
+    config, harness = wbxbar_harness
+    run(
+        verilog_sources=[harness,*[wb2axip_rtl_dir/name for name in ("wbxbar.v","addrdecoder.v","skidbuffer.v")]],
+        toplevel="wbxbar_harness",
+        module="cocotb_wishbone_tests",
+        sim_build=f"work/sim/test_wbxbar_contention_m{config.masters}",
+        testcase="wbxbar_contention_test",
+        extra_env=config.to_env(),
+    )
@@ -1,14 +1,16 @@
+import json
+import os
+
 import cocotb
 from cocotb.log import SimLog
 from cocotb_bus.scoreboard import Scoreboard
 from cocotb.triggers import RisingEdge, ClockCycles, Event
 from pathlib import Path
-from tabulate import tabulate
 
 from bus import BusReadTransaction, BusWriteTransaction, CoppervBusBfm, BusMonitor, BusSourceDriver
 from regfile import RegFileReadMonitor, RegFileWriteMonitor, RegFileReadTransaction, RegFileWriteTransaction, RegFileBfm
 from cocotb_utils import from_array, to_bytes
-from riscv_utils import StackMonitor
+from metrics import SimMetrics, append_metrics
 
 class Testbench():
     def __init__(self, dut,
@@ -24,6 +26,8 @@ class Testbench():
             pass_fail_values = None,
             output_address = None,
             timer_address = None,
+            marker_address = None,
+            semihosting_address = None,
         ):
         self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
         self.test_name = test_name
@@ -36,6 +40,10 @@ class Testbench():
         self.pass_fail_values = pass_fail_values
         self.output_address = output_address
         self.fake_uart = []
+        self.uart_line = ''
+        self.uart_file = None
+        self.uart_path = None
+        self.closed = False
         self.timer_counter = 0
         self.timer_address = timer_address
         if self.timer_address is not None:
@@ -43,7 +51,14 @@ class Testbench():
         self.end_test = Event()
         ## Process parameters
         self.memory = {**instruction_memory,**data_memory}
+        self.semihosting_address = semihosting_address
+        self.semihost = None
+        if self.semihosting_address is not None:
+            from semihosting import Semihost
+            self.semihost = Semihost(self.memory,self.uart_write,lambda code: self.finish_test(code == 0),
+                file_root=cocotb.plusargs.get('semihost_root'))
         if 'debug_test' in cocotb.plusargs:
+            from tabulate import tabulate
             csv_path = Path(test_name+'_memory.csv')
             self.log.debug(f"Dumping initial memory content to {csv_path.resolve()}")
             memory = [(f'0x{k:X}',f'0x{v:X}') for k,v in self.memory.items()]
@@ -60,8 +75,10 @@ class Testbench():
         #self.log.debug(f"Memory: {self.memory}")
         ## Bus functional models
         prefix = None
+        self.dut_name = "copperv1"
         if not cocotb.plusargs.get('dut_copperv1',False):
             prefix = "bus_"
+            self.dut_name = "copperv2"
         self.bus_bfm = CoppervBusBfm(
             clock = self.clock,
             reset_n = self.reset_n,
@@ -84,24 +101,89 @@ class Testbench():
                 rs2_data = "rs2_dout",
             )
         )
+        ## Wait states and backpressure, e.g. +dr_latency=uniform:0:4 +ir_ready=random:0.25
+        self.timing_seed = int(cocotb.plusargs.get('timing_seed',cocotb.RANDOM_SEED))
+        ## Cache timing, e.g. +icache=size=4096,ways=2,line=16,hit=0,miss=10 +dcache=...,policy=write-through
+        self.caches = {}
+        for channels,cache_name in ((('ir',),'icache'),(('dr','dw'),'dcache')):
+            spec = cocotb.plusargs.get(cache_name)
+            if spec is not None:
+                from cache_model import parse_cache_spec
+                cache = parse_cache_spec(cache_name,spec)
+                self.caches.update({channel:cache for channel in channels})
+        ## Passive monitors are left out with +offline_monitors, the transactions
+        ## can be extracted from the waves afterwards with wave_extract.py
+        self.offline_monitors = 'offline_monitors' in cocotb.plusargs
+        if self.offline_monitors and enable_self_checking:
+            raise ValueError("Self checking needs the passive monitors, remove +offline_monitors")
         ## Instruction read
-        self.bus_ir_driver = BusSourceDriver("bus_ir",BusReadTransaction,self.bus_bfm.ir_send_response,self.bus_bfm.ir_drive_ready)
-        self.bus_ir_monitor = BusMonitor("bus_ir",BusReadTransaction,self.bus_bfm.ir_get_request,self.bus_bfm.ir_get_response)
+        self.bus_ir_driver = BusSourceDriver("bus_ir",BusReadTransaction,self.bus_bfm.ir_send_response,self.bus_bfm.ir_drive_ready,
+            **self.timing_models('ir',0))
+        self.bus_ir_monitor = self.passive_monitor("bus_ir",
+            lambda: BusMonitor("bus_ir",BusReadTransaction,self.bus_bfm.ir_get_request,self.bus_bfm.ir_get_response))
         self.bus_ir_req_monitor = BusMonitor("bus_ir_req",BusReadTransaction,self.bus_bfm.ir_get_request,
             callback=self.memory_callback,bus_name="bus_ir")
         ## Data read
-        self.bus_dr_driver = BusSourceDriver("bus_dr",BusReadTransaction,self.bus_bfm.dr_send_response,self.bus_bfm.dr_drive_ready)
-        self.bus_dr_monitor = BusMonitor("bus_dr",BusReadTransaction,self.bus_bfm.dr_get_request,self.bus_bfm.dr_get_response)
+        self.bus_dr_driver = BusSourceDriver("bus_dr",BusReadTransaction,self.bus_bfm.dr_send_response,self.bus_bfm.dr_drive_ready,
+            **self.timing_models('dr',1))
+        self.bus_dr_monitor = self.passive_monitor("bus_dr",
+            lambda: BusMonitor("bus_dr",BusReadTransaction,self.bus_bfm.dr_get_request,self.bus_bfm.dr_get_response))
         self.bus_dr_req_monitor = BusMonitor("bus_dr_req",BusReadTransaction,self.bus_bfm.dr_get_request,
             callback=self.memory_callback,bus_name="bus_dr")
         ## Data write
-        self.bus_dw_driver = BusSourceDriver("bus_dw",BusWriteTransaction,self.bus_bfm.dw_send_response,self.bus_bfm.dw_drive_ready)
-        self.bus_dw_monitor = BusMonitor("bus_dw",BusWriteTransaction,self.bus_bfm.dw_get_request,self.bus_bfm.dw_get_response)
+        self.bus_dw_driver = BusSourceDriver("bus_dw",BusWriteTransaction,self.bus_bfm.dw_send_response,self.bus_bfm.dw_drive_ready,
+            **self.timing_models('dw',2))
+        self.bus_dw_monitor = self.passive_monitor("bus_dw",
+            lambda: BusMonitor("bus_dw",BusWriteTransaction,self.bus_bfm.dw_get_request,self.bus_bfm.dw_get_response))
         self.bus_dw_req_monitor = BusMonitor("bus_dw_req",BusWriteTransaction,self.bus_bfm.dw_get_request,
             callback=self.memory_callback,bus_name="bus_dw")
         ## Regfile
-        self.regfile_write_monitor = RegFileWriteMonitor("regfile_write",regfile_bfm)
-        self.regfile_read_monitor = RegFileReadMonitor("regfile_read",regfile_bfm)
+        self.regfile_write_monitor = self.passive_monitor("regfile_write",
+            lambda: RegFileWriteMonitor("regfile_write",regfile_bfm))
+        self.regfile_read_monitor = self.passive_monitor("regfile_read",
+            lambda: RegFileReadMonitor("regfile_read",regfile_bfm))
+        ## Simulation cost, attached to the pytest results through TB_METRICS (see conftest.py)
+        self.metrics = SimMetrics({'bus_ir':self.bus_ir_monitor,'bus_dr':self.bus_dr_monitor,'bus_dw':self.bus_dw_monitor,
+            'regfile_write':self.regfile_write_monitor,'regfile_read':self.regfile_read_monitor},lambda: self.bus_bfm.cycle)
+        ## Performance statistics, the optional features import their modules
+        ## only when enabled to keep the simulator startup short
+        self.cpi_stats = None
+        if 'cpi_stats' in cocotb.plusargs:
+            from cpi import CpiStats
+            self.cpi_stats = CpiStats(self.bus_ir_monitor,self.regfile_write_monitor,lambda: self.bus_bfm.cycle)
+        self.bus_stats = None
+        if 'bus_stats' in cocotb.plusargs:
+            from bus_stats import BusStats
+            self.bus_stats = BusStats(self.bus_bfm)
+        ## Transaction recording, +record or +record=path
+        self.recorder = None
+        record = cocotb.plusargs.get('record')
+        if record:
+            from recorder import TransactionRecorder, Channel
+            path = record if isinstance(record,str) else f"{test_name}_transactions.bin"
+            self.recorder = TransactionRecorder(path,lambda: self.bus_bfm.cycle)
+            for monitor,channel in ((self.bus_ir_monitor,Channel.BUS_IR),(self.bus_dr_monitor,Channel.BUS_DR),
+                    (self.bus_dw_monitor,Channel.BUS_DW),(self.regfile_write_monitor,Channel.REGFILE_WRITE),
+                    (self.regfile_read_monitor,Channel.REGFILE_READ)):
+                self.recorder.attach(monitor,channel)
+        self.coverage = None
+        if 'coverage' in cocotb.plusargs:
+            from functional_coverage import FunctionalCoverage
+            self.coverage = FunctionalCoverage(self.bus_ir_monitor,self.bus_dw_monitor,
+                self.regfile_read_monitor,self.regfile_write_monitor)
+        ## Architectural transaction digests for differential runs, +digest
+        self.digests = None
+        if 'digest' in cocotb.plusargs:
+            from recorder import Channel
+            from digest import TransactionDigests
+            self.digests = TransactionDigests({Channel.REGFILE_WRITE:self.regfile_write_monitor,
+                Channel.BUS_DR:self.bus_dr_monitor,Channel.BUS_DW:self.bus_dw_monitor})
+        self.marker_address = marker_address
+        self.perf_regions = None
+        if self.marker_address is not None:
+            from perf_regions import PerfRegions
+            self.perf_regions = PerfRegions(self.bus_ir_monitor,self.bus_dr_monitor,self.bus_dw_monitor,
+                lambda: self.bus_bfm.cycle)
         if enable_self_checking:
             ## Self checking
             self.scoreboard = Scoreboard(dut)
@@ -109,6 +191,27 @@ class Testbench():
             self.scoreboard.add_interface(self.regfile_read_monitor, self.expected_regfile_read)
             self.scoreboard.add_interface(self.bus_dr_monitor, self.expected_data_read)
             self.scoreboard.add_interface(self.bus_dw_monitor, self.expected_data_write)
+    def passive_monitor(self,name,make_monitor):
+        if self.offline_monitors:
+            from hdl_trace import TraceMonitor
+            return TraceMonitor(name)
+        return make_monitor()
+    def timing_models(self,channel,index):
+        latency = cocotb.plusargs.get(f'{channel}_latency')
+        ready = cocotb.plusargs.get(f'{channel}_ready')
+        seed = self.timing_seed + index
+        if latency is not None or ready is not None:
+            from timing_models import parse_latency_model, parse_ready_pattern
+        latency_model = parse_latency_model(latency,seed) if latency is not None else None
+        if channel in self.caches:
+            if latency_model is not None:
+                raise ValueError(f"Cannot use both {channel}_latency and a cache model on {channel}")
+            latency_model = self.caches[channel]
+        return dict(
+            clock = self.clock,
+            latency_model = latency_model,
+            ready_pattern = parse_ready_pattern(ready,seed) if ready is not None else None,
+        )
     async def timer(self):
         while True:
             await RisingEdge(self.clock)
@@ -150,15 +253,13 @@ class Testbench():
             raise ValueError(f"Unsupported transaction type: {transaction}")
     def handle_data_write(self,transaction):
         if self.pass_fail_address is not None and self.pass_fail_address == transaction.addr:
-            if len(self.fake_uart) > 0:
-                self.log.info("Fake UART output:\n%s",''.join(self.fake_uart))
-            assert self.pass_fail_values[transaction.data] == True, "Received test fail from bus"
-            self.log.debug("Received test pass from bus")
-            self.end_test.set()
+            self.finish_test(self.pass_fail_values[transaction.data])
         elif self.output_address is not None and self.output_address == transaction.addr:
-            recv = chr(transaction.data)
-            self.fake_uart.append(recv)
-            self.log.info('Fake UART received: %s',repr(recv))
+            self.uart_write(chr(transaction.data))
+        elif self.semihosting_address is not None and self.semihosting_address == transaction.addr:
+            self.semihost.call(transaction.data)
+        elif self.marker_address is not None and self.marker_address == transaction.addr:
+            self.perf_regions.write(transaction.data)
         else:
             mask = f"{transaction.strobe:04b}"
             #self.log.debug('write start: %X mask: %s',from_array(self.memory,transaction.addr),mask)
@@ -167,6 +268,40 @@ class Testbench():
                     #self.log.debug('writing %X -> %X',transaction.addr+i,to_bytes(transaction.data)[i])
                     self.memory[transaction.addr+i] = to_bytes(transaction.data)[i]
             #self.log.debug('write finished: %X',from_array(self.memory,transaction.addr))
+    def finish_test(self,passed):
+        # A semihosted exit ends the test, then the exit code is also written to the pass/fail address
+        if self.end_test.is_set():
+            return
+        self.close()
+        if len(self.fake_uart) > 0:
+            self.log.info("Fake UART output:\n%s",''.join(self.fake_uart))
+        assert passed == True, "Received test fail from bus"
+        self.log.debug("Received test pass from bus")
+        self.end_test.set()
+    def uart_write(self,text):
+        """ Buffer the UART output and log it one line at a time """
+        self.fake_uart.append(text)
+        *lines, self.uart_line = (self.uart_line + text).split('\n')
+        for line in lines:
+            self.uart_write_line(line)
+    def uart_write_line(self,line):
+        self.log.info('Fake UART: %s',line)
+        if self.uart_file is None:
+            # Reopened after close_uart, lines written after the end of the test are appended
+            mode = 'w' if self.uart_path is None else 'a'
+            self.uart_path = Path(f"{self.test_name}_uart.log")
+            self.uart_file = self.uart_path.open(mode)
+        self.uart_file.write(line + '\n')
+        self.uart_file.flush()
+    def flush_uart(self):
+        if self.uart_line != '':
+            self.uart_write_line(self.uart_line)
+            self.uart_line = ''
+    def close_uart(self):
+        self.flush_uart()
+        if self.uart_file is not None:
+            self.uart_file.close()
+            self.uart_file = None
     def handle_data_read(self,transaction):
         value = None
         if self.timer_address is not None and self.timer_address == transaction.addr:
@@ -174,6 +309,48 @@ class Testbench():
         else:
             value = from_array(self.memory,transaction.addr)
         return value
+    def write_report(self,name,data):
+        path = Path(f"{self.test_name}_{name}.json")
+        # Replaced whole, the reports are read by other processes
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(json.dumps(dict(test=self.test_name,dut=self.dut_name,data=data),indent=2))
+        os.replace(tmp,path)
+        self.log.info(f"Generated {name} report: {path.resolve()}")
+        return path
+    def close(self):
+        """ End of test bookkeeping, also done when the test fails or times out """
+        if self.closed:
+            return
+        self.closed = True
+        self.close_uart()
+        metrics = self.metrics.to_dict()
+        if 'metrics' in cocotb.plusargs:
+            self.write_report('metrics',metrics)
+        if 'TB_METRICS' in os.environ:
+            append_metrics(os.environ['TB_METRICS'],self.test_name,metrics)
+        if self.recorder is not None:
+            self.recorder.close()
+    def report(self):
+        if self.cpi_stats is not None:
+            self.log.info("CPI and instruction mix:\n%s",self.cpi_stats.table())
+            self.write_report('cpi',self.cpi_stats.to_dict())
+        if self.bus_stats is not None:
+            self.log.info("Bus channel statistics:\n%s",self.bus_stats.table())
+            self.write_report('bus_stats',self.bus_stats.to_dict())
+        if len(self.caches) != 0:
+            from cache_model import cache_table
+            caches = list({id(c):c for c in self.caches.values()}.values())
+            self.log.info("Cache statistics:\n%s",cache_table(caches))
+            self.write_report('cache',{c.name:c.to_dict() for c in caches})
+        if self.coverage is not None:
+            self.write_report('coverage',self.coverage.to_dict())
+        if self.digests is not None:
+            # The streams first, a digest report is only read once it exists
+            self.digests.write_streams(f"{self.test_name}_digest.bin")
+            self.write_report('digest',self.digests.to_dict())
+        if self.perf_regions is not None and len(self.perf_regions.stats) != 0:
+            self.log.info("Performance regions:\n%s",self.perf_regions.table())
+            self.write_report('regions',self.perf_regions.to_dict())
     @cocotb.coroutine
     async def finish(self):
         last_pending = ""
@@ -16,6 +16,12 @@ TEST_NAME:
 #define T_ADDR 0x80000000
 #define O_ADDR 0x80000004
 #define TC_ADDR 0x80000008
+#define M_ADDR 0x8000000C
+#define S_ADDR 0x80000010
+#define SEMIHOST_WRITE 1
+#define SEMIHOST_PRINTF 2
+#define SEMIHOST_EXIT 3
+#define SEMIHOST_READ 4
 #define T_PASS 0x01000001
 #define T_FAIL 0x02000001
 
@@ -17,10 +17,22 @@
 int volatile * const TEST_RESULT = T_ADDR;
 int volatile * const SIM_OUT = O_ADDR;
 
+#ifdef SEMIHOSTING
+uintptr_t semihost_call(uintptr_t op, uintptr_t arg0, uintptr_t arg1, uintptr_t arg2, uintptr_t arg3)
+{
+    volatile uintptr_t block[6] = {op, arg0, arg1, arg2, arg3, 0};
+    *(uintptr_t volatile *) S_ADDR = (uintptr_t) block;
+    return block[5];
+}
+#endif
+
 uintptr_t syscall(uintptr_t which, uint64_t arg0, uint64_t arg1, uint64_t arg2)
 {
     switch (which) {
         case SYS_write: {
+#ifdef SEMIHOSTING
+            return semihost_call(SEMIHOST_WRITE, arg0, arg1, arg2, 0);
+#endif
             char * buf = (char*)arg1;
             for(int i = 0; i < arg2; i++){
                 *SIM_OUT = buf[i];
@@ -56,6 +68,9 @@ void setStats(int enable)
 
 void __attribute__((noreturn)) tohost_exit(uintptr_t code)
 {
+#ifdef SEMIHOSTING
+  semihost_call(SEMIHOST_EXIT, code, 0, 0, 0);
+#endif
   if(code == 0) {
     *TEST_RESULT = T_PASS;
   } else {
@@ -131,6 +146,11 @@ void _init(void)
 #undef putchar
 int putchar(int ch)
 {
+#ifdef SEMIHOSTING
+  char c = ch;
+  syscall(SYS_write, 1, (uintptr_t)&c, 1);
+  return 0;
+#endif
   static char buf[64] __attribute__((aligned(64)));
   static int buflen = 0;
 
@@ -362,6 +382,12 @@ int printf(const char* fmt, ...)
   va_list ap;
   va_start(ap, fmt);
 
+#ifdef SEMIHOSTING
+  // va_list is a pointer to the spilled arguments, the host walks it
+  int len = semihost_call(SEMIHOST_PRINTF, (uintptr_t)fmt, (uintptr_t)ap, 0, 0);
+  va_end(ap);
+  return len;
+#endif
   vprintfmt((void*)putchar, 0, fmt, ap);
 
   va_end(ap);
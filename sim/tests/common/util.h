@@ -54,8 +54,36 @@ static uintptr_t insn_len(uintptr_t pc)
 
 #ifdef __riscv
 #include "encoding.h"
+#include "riscv_test.h"
+
+// Testbench cycle counter
+static inline unsigned int read_timer(void)
+{
+  return *(volatile unsigned int *) TC_ADDR;
+}
+
+// Performance regions measured by the testbench, regions can nest
+#define PERF_REGION_END 0x80000000
+#define perf_region_begin(id) (*(volatile unsigned int *) M_ADDR = (id))
+#define perf_region_end(id) (*(volatile unsigned int *) M_ADDR = (id) | PERF_REGION_END)
+
+#ifdef SEMIHOSTING
+// Host proxied calls, see sim/semihosting.py
+uintptr_t semihost_call(uintptr_t op, uintptr_t arg0, uintptr_t arg1, uintptr_t arg2, uintptr_t arg3);
+// Read a file relative to +semihost_root, returns the bytes read or -1
+#define semihost_read(path, buf, len, offset) \
+  ((int) semihost_call(SEMIHOST_READ, (uintptr_t)(path), (uintptr_t)(buf), (len), (offset)))
+#endif
 #endif
 
+// Keep the compiler from merging or hoisting benchmark iterations
+#define compiler_barrier() asm volatile("" ::: "memory")
+
+// Benchmark kernel result, parsed by sim/benchmarks.py
+#define kernel_report(name, iterations, cycles, bytes) \
+  printf("KERNEL %s iterations=%d cycles=%u bytes=%d\n", \
+         name, (int)(iterations), (unsigned int)(cycles), (int)(bytes))
+
 #define stringify_1(s) #s
 #define stringify(s) stringify_1(s)
 #define stats(code, iter) do { \
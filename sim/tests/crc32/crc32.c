@@ -0,0 +1,37 @@
+#include <stdio.h>
+#include <stdint.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 4
+#endif
+#define BUF_SIZE 256
+#define CRC32_EXPECTED 0x78825239
+
+static uint8_t buf[BUF_SIZE];
+
+// Bitwise CRC-32 (IEEE 802.3, reflected), no table to keep the data footprint small
+static uint32_t crc32(const uint8_t *data, int len)
+{
+    uint32_t crc = 0xffffffff;
+    for (int i = 0; i < len; i++) {
+        crc ^= data[i];
+        for (int bit = 0; bit < 8; bit++)
+            crc = (crc >> 1) ^ (0xedb88320 & -(crc & 1));
+    }
+    return ~crc;
+}
+
+int main(){
+    for (int i = 0; i < BUF_SIZE; i++)
+        buf[i] = (i*7 + 3) & 0xff;
+    uint32_t crc = 0;
+    unsigned int start = read_timer();
+    for (int i = 0; i < ITERATIONS; i++) {
+        crc |= crc32(buf, BUF_SIZE) ^ CRC32_EXPECTED;
+        compiler_barrier();
+    }
+    unsigned int cycles = read_timer() - start;
+    kernel_report("crc32", ITERATIONS, cycles, ITERATIONS*BUF_SIZE);
+    return crc != 0;
+}
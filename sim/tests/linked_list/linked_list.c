@@ -0,0 +1,40 @@
+#include <stdio.h>
+#include <stdint.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 4
+#endif
+#define NODES 128
+// Odd stride so consecutive nodes are not adjacent in memory
+#define STRIDE 37
+
+struct node {
+    struct node *next;
+    int value;
+};
+
+static struct node nodes[NODES];
+
+int main(){
+    for (int i = 0; i < NODES; i++) {
+        nodes[i].next = &nodes[(i + STRIDE) % NODES];
+        nodes[i].value = i;
+    }
+
+    int sum = 0;
+    unsigned int start = read_timer();
+    for (int iter = 0; iter < ITERATIONS; iter++) {
+        struct node *n = &nodes[0];
+        for (int i = 0; i < NODES; i++) {
+            sum += n->value;
+            n = n->next;
+        }
+        compiler_barrier();
+    }
+    unsigned int cycles = read_timer() - start;
+    kernel_report("linked_list", ITERATIONS, cycles, 0);
+
+    // STRIDE and NODES are coprime, every node is visited once per traversal
+    return sum != ITERATIONS*NODES*(NODES-1)/2;
+}
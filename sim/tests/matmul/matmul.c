@@ -0,0 +1,41 @@
+#include <stdio.h>
+#include <stdint.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 2
+#endif
+#define N 8
+
+static int a[N][N];
+static int b[N][N];
+static int c[N][N];
+
+int main(){
+    for (int i = 0; i < N; i++)
+        for (int j = 0; j < N; j++) {
+            a[i][j] = i + j;
+            b[i][j] = i == j ? 2 : 0;
+        }
+
+    unsigned int start = read_timer();
+    for (int iter = 0; iter < ITERATIONS; iter++) {
+        for (int i = 0; i < N; i++)
+            for (int j = 0; j < N; j++) {
+                int sum = 0;
+                for (int k = 0; k < N; k++)
+                    sum += a[i][k]*b[k][j];
+                c[i][j] = sum;
+            }
+        compiler_barrier();
+    }
+    unsigned int cycles = read_timer() - start;
+    kernel_report("matmul", ITERATIONS, cycles, 0);
+
+    // b is 2*I, so c must be 2*a
+    int errors = 0;
+    for (int i = 0; i < N; i++)
+        for (int j = 0; j < N; j++)
+            errors += c[i][j] != 2*(i + j);
+    return errors != 0;
+}
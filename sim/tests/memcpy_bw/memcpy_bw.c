@@ -0,0 +1,45 @@
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 4
+#endif
+#define BUF_WORDS 256
+#define REGION_MEMCPY 1
+#define REGION_MEMSET 2
+
+static uint32_t src[BUF_WORDS];
+static uint32_t dst[BUF_WORDS];
+
+int main(){
+    int errors = 0;
+    for (int i = 0; i < BUF_WORDS; i++)
+        src[i] = i*0x01010101;
+
+    unsigned int start = read_timer();
+    for (int i = 0; i < ITERATIONS; i++) {
+        perf_region_begin(REGION_MEMCPY);
+        memcpy(dst, src, sizeof(src));
+        perf_region_end(REGION_MEMCPY);
+        compiler_barrier();
+    }
+    unsigned int cycles = read_timer() - start;
+    errors += verify(BUF_WORDS, (const volatile int*) dst, (const int*) src);
+    kernel_report("memcpy", ITERATIONS, cycles, ITERATIONS*sizeof(src));
+
+    start = read_timer();
+    for (int i = 0; i < ITERATIONS; i++) {
+        perf_region_begin(REGION_MEMSET);
+        memset(dst, i+1, sizeof(dst));
+        perf_region_end(REGION_MEMSET);
+        compiler_barrier();
+    }
+    cycles = read_timer() - start;
+    for (int i = 0; i < BUF_WORDS; i++)
+        errors += dst[i] != ITERATIONS*0x01010101;
+    kernel_report("memset", ITERATIONS, cycles, ITERATIONS*sizeof(dst));
+
+    return errors != 0;
+}
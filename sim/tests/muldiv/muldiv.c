@@ -0,0 +1,31 @@
+#include <stdio.h>
+#include <stdint.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 64
+#endif
+
+// The core is RV32I, multiplication and division go through the libgcc routines
+int main(){
+    volatile int32_t a = 0x12345;
+    volatile int32_t b = -37;
+    int errors = 0;
+
+    unsigned int start = read_timer();
+    for (int i = 0; i < ITERATIONS; i++) {
+        int32_t x = a + i;
+        int32_t y = b - i;
+        int32_t p = x*y;
+        int32_t q = p/y;
+        int32_t r = p%y;
+        uint32_t uq = (uint32_t) x/(uint32_t) (i + 3);
+        uint32_t ur = (uint32_t) x%(uint32_t) (i + 3);
+        errors += q != x || r != 0;
+        errors += uq*(uint32_t) (i + 3) + ur != (uint32_t) x;
+    }
+    unsigned int cycles = read_timer() - start;
+    kernel_report("muldiv", ITERATIONS, cycles, 0);
+
+    return errors != 0;
+}
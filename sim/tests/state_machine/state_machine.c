@@ -0,0 +1,74 @@
+#include <stdio.h>
+#include <stdint.h>
+#include "util.h"
+
+#ifndef ITERATIONS
+#define ITERATIONS 4
+#endif
+
+// Number scanner in the style of the CoreMark state machine
+enum state { START, INT, S1, FLOAT, S2, EXPONENT, SCIENTIFIC, INVALID, NUM_STATES };
+
+static const char *inputs[] = {
+    "5012", "1234", "-874", "+122", "35.54", "0.1234", "-110.7", "+0.64",
+    "5.500e+3", "-.123e-2", "-87e+832", "+0.6e-12", "T0.3e-1F", "-T.T++Tq", "1T3.4e4z", "34.0e-T^",
+};
+#define NUM_INPUTS (sizeof(inputs)/sizeof(inputs[0]))
+
+static enum state next_state(enum state s, char c)
+{
+    int digit = c >= '0' && c <= '9';
+    int sign = c == '+' || c == '-';
+    switch (s) {
+        case START:
+            if (digit) return INT;
+            if (sign) return S1;
+            if (c == '.') return FLOAT;
+            return INVALID;
+        case S1:
+            if (digit) return INT;
+            if (c == '.') return FLOAT;
+            return INVALID;
+        case INT:
+            if (digit) return INT;
+            if (c == '.') return FLOAT;
+            if (c == 'e' || c == 'E') return S2;
+            return INVALID;
+        case FLOAT:
+            if (digit) return FLOAT;
+            if (c == 'e' || c == 'E') return S2;
+            return INVALID;
+        case S2:
+            if (sign) return EXPONENT;
+            return INVALID;
+        case EXPONENT:
+            if (digit) return SCIENTIFIC;
+            return INVALID;
+        case SCIENTIFIC:
+            if (digit) return SCIENTIFIC;
+            return INVALID;
+        default:
+            return INVALID;
+    }
+}
+
+int main(){
+    static const unsigned int expected[NUM_STATES] = {0, 4*ITERATIONS, 0, 4*ITERATIONS, 0, 0, 4*ITERATIONS, 4*ITERATIONS};
+    unsigned int final_count[NUM_STATES] = {0};
+
+    unsigned int start = read_timer();
+    for (int iter = 0; iter < ITERATIONS; iter++)
+        for (int i = 0; i < NUM_INPUTS; i++) {
+            enum state s = START;
+            for (const char *p = inputs[i]; *p != 0 && s != INVALID; p++)
+                s = next_state(s, *p);
+            final_count[s]++;
+        }
+    unsigned int cycles = read_timer() - start;
+    kernel_report("state_machine", ITERATIONS, cycles, 0);
+
+    int errors = 0;
+    for (int s = 0; s < NUM_STATES; s++)
+        errors += final_count[s] != expected[s];
+    return errors != 0;
+}
@@ -0,0 +1,67 @@
+import itertools
+import random
+from pathlib import Path
+
+class FixedLatency:
+    def __init__(self,cycles):
+        self.cycles = int(cycles)
+    def latency(self,transaction):
+        return self.cycles
+
+class UniformLatency:
+    def __init__(self,low,high,seed=None):
+        self.low = int(low)
+        self.high = int(high)
+        self.random = random.Random(seed)
+    def latency(self,transaction):
+        return self.random.randint(self.low,self.high)
+
+class TraceLatency:
+    """ Replay latencies from a list or a file with one integer per line, wrapping around at the end """
+    def __init__(self,trace):
+        if isinstance(trace,(str,Path)):
+            trace = [int(line) for line in Path(trace).read_text().split()]
+        if len(trace) == 0:
+            raise ValueError("Empty latency trace")
+        self.trace = itertools.cycle(trace)
+    def latency(self,transaction):
+        return next(self.trace)
+
+class RandomReady:
+    """ Deassert ready with the given probability on every cycle """
+    def __init__(self,probability,seed=None):
+        self.probability = float(probability)
+        self.random = random.Random(seed)
+    def next(self):
+        return self.random.random() >= self.probability
+
+class PeriodicReady:
+    """ Keep ready asserted for `on` cycles and deasserted for `off` cycles """
+    def __init__(self,on,off):
+        self.pattern = itertools.cycle([True]*int(on) + [False]*int(off))
+    def next(self):
+        return next(self.pattern)
+
+latency_models = dict(
+    fixed = lambda seed,cycles: FixedLatency(cycles),
+    uniform = lambda seed,low,high: UniformLatency(low,high,seed),
+    trace = lambda seed,path: TraceLatency(path),
+)
+
+ready_patterns = dict(
+    random = lambda seed,probability: RandomReady(probability,seed),
+    periodic = lambda seed,on,off: PeriodicReady(on,off),
+)
+
+def parse_spec(spec,factories,seed=None):
+    """ Build a model from a "name:arg1:arg2" spec, e.g. "uniform:0:4" """
+    name, *args = spec.split(':')
+    if name not in factories:
+        raise ValueError(f"Unknown model {name} in {spec}, expected one of {list(factories)}")
+    return factories[name](seed,*args)
+
+def parse_latency_model(spec,seed=None):
+    return parse_spec(spec,latency_models,seed)
+
+def parse_ready_pattern(spec,seed=None):
+    return parse_spec(spec,ready_patterns,seed)
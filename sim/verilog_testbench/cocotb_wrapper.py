@@ -5,6 +5,7 @@ from cocotb.log import SimLog
 import logging
 from cocotb.triggers import RisingEdge
 from riscv_utils import StackMonitor, PcMonitor
+from hdl_trace import TraceReplay, read_trace
 
 @cocotb.test()
 async def wrapper(dut):
@@ -15,6 +16,15 @@ async def wrapper(dut):
     core = dut.dut
     if not cocotb.plusargs.get('dut_copperv1',False):
         prefix = "bus_"
+    trace_file = cocotb.plusargs.get('TRACE_FILE',None)
+    if trace_file is not None:
+        # testbench.v writes the trace, replay it once the simulation is done
+        replay = TraceReplay()
+        StackMonitor(replay.regfile_write_monitor, replay.pc_monitor)
+        await wait_finish(dut)
+        count = replay.run(read_trace(trace_file))
+        SimLog("cocotb").info("Replayed %d trace records from %s",count,trace_file)
+        return
     clock = core.clk
     reset_n = core.rst
     bus_bfm = CoppervBusBfm(
@@ -50,6 +60,9 @@ async def wrapper(dut):
     regfile_read_monitor = RegFileReadMonitor("regfile_read",regfile_bfm)
     pc_monitor = PcMonitor('pc_monitor',core.pc)
     StackMonitor(regfile_write_monitor, pc_monitor)
+    await wait_finish(dut)
+
+async def wait_finish(dut):
     while True:
         await RisingEdge(dut.finish_cocotb)
         if dut.finish_cocotb.value.binstr == '1':
@@ -4,3 +4,8 @@
 `define FALSE               0
 `define CPU_INST            tb.dut
 `define FAKE_MEM_ADDR_WIDTH 24
+`define TRACE_KIND_PC       0
+`define TRACE_KIND_FETCH    1
+`define TRACE_KIND_RD       2
+`define TRACE_KIND_DR       3
+`define TRACE_KIND_DW       4
@@ -107,12 +107,57 @@ initial begin
     if (!$value$plusargs("VCD_FILE=%s", vcd_file)) begin
         vcd_file = "tb.vcd";
     end
-    $dumpfile(vcd_file);
-    $dumpvars(0, tb);
+    if ($test$plusargs("no_waves") == 0) begin
+        $dumpfile(vcd_file);
+        $dumpvars(0, tb);
+    end
     fake_uart_fp = $fopen("fake_uart.log","w");
 end
 reg [`DATA_WIDTH-1:0] timer_counter;
 initial timer_counter = 0;
+// Binary trace: fixed-width records of 4 little-endian 32 bit words
+// {aux, kind}, cycle, addr, data. See sim/hdl_trace.py for the reader.
+integer trace_fp;
+`STRING trace_file;
+initial begin
+    trace_fp = 0;
+    if ($value$plusargs("TRACE_FILE=%s", trace_file)) begin
+        trace_fp = $fopen(trace_file,"wb");
+    end
+end
+reg [`BUS_WIDTH-1:0] trace_ir_addr;
+reg [`BUS_WIDTH-1:0] trace_dr_addr;
+reg [`PC_WIDTH-1:0] trace_pc;
+initial trace_pc = `PC_INIT;
+task trace_record;
+input [7:0] kind;
+input [7:0] aux;
+input [`DATA_WIDTH-1:0] addr;
+input [`DATA_WIDTH-1:0] data;
+begin
+    $fwrite(trace_fp, "%u%u%u%u", {16'b0, aux, kind}, timer_counter, addr, data);
+end
+endtask
+always @(posedge clk) begin
+    if(trace_fp != 0 && rst) begin
+        if(`CPU_INST.pc != trace_pc) begin
+            trace_record(`TRACE_KIND_PC, 0, `CPU_INST.pc, 0);
+            trace_pc = `CPU_INST.pc;
+        end
+        if(ir_addr_valid && ir_addr_ready)
+            trace_ir_addr = ir_addr;
+        if(ir_data_valid && ir_data_ready)
+            trace_record(`TRACE_KIND_FETCH, 0, trace_ir_addr, ir_data);
+        if(`CPU_INST.rd_en)
+            trace_record(`TRACE_KIND_RD, `CPU_INST.rd, 0, `CPU_INST.rd_din);
+        if(dr_addr_valid && dr_addr_ready)
+            trace_dr_addr = dr_addr;
+        if(dr_data_valid && dr_data_ready)
+            trace_record(`TRACE_KIND_DR, 0, trace_dr_addr, dr_data);
+        if(dw_data_addr_valid && dw_data_addr_ready)
+            trace_record(`TRACE_KIND_DW, dw_strobe, dw_addr, dw_data);
+    end
+end
 reg flag = 0;
 // Fake IO
 always @(posedge clk) begin
@@ -171,6 +216,10 @@ task finish_sim;
 begin
     $fwrite(fake_uart_fp, "\n# copperv testbench finished\n");
     $fclose(fake_uart_fp);  
+    if (trace_fp != 0) begin
+        $fclose(trace_fp);
+        trace_fp = 0;
+    end
     if ($test$plusargs("cocotb") > 0) begin
         finish_cocotb = 1;
     end else begin
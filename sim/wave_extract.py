@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from bus import BusReadTransaction, BusWriteTransaction
+from regfile import RegFileWriteTransaction, RegFileReadTransaction
+
+class Signal:
+    """ Value changes of one signal as columnar arrays, x and z read as 0 """
+    def __init__(self,name,width,times,values):
+        self.name = name
+        self.width = width
+        self.times = np.asarray(times,dtype=np.int64)
+        self.values = np.asarray(values,dtype=np.uint64)
+    def at(self,times):
+        """ Value of the signal after every change up to and including each time,
+        like a cocotb monitor sampling in ReadOnly """
+        index = np.searchsorted(self.times,times,side='right') - 1
+        values = self.values[np.maximum(index,0)]
+        values[index < 0] = 0
+        return values
+    def rising_edges(self):
+        high = (self.values & 1).astype(bool)
+        return self.times[high & ~np.concatenate(([False],high[:-1]))]
+
+xz_to_zero = str.maketrans('xXzZuUwW-','000000000')
+var_pattern = re.compile(r'\$var\s+\S+\s+(\d+)\s+(\S+)\s+(\S+)')
+
+def parse_vcd(lines,signals=None):
+    """ Parse a VCD stream, keeping only the signals with these hierarchical
+    names (scopes joined with '.', without bit ranges) if given """
+    scope = []
+    ids = {}
+    wanted = None if signals is None else set(signals)
+    changes = {}
+    time = 0
+    lines = iter(lines)
+    for line in lines:
+        line = line.strip()
+        if line.startswith('$scope'):
+            scope.append(line.split()[2])
+        elif line.startswith('$upscope'):
+            scope.pop()
+        elif line.startswith('$var'):
+            width, code, reference = var_pattern.match(line).groups()
+            name = '.'.join([*scope,reference])
+            if wanted is None or name in wanted:
+                ids.setdefault(code,[]).append((name,int(width)))
+                changes.setdefault(code,([],[]))
+        elif line.startswith('$enddefinitions'):
+            break
+    for line in lines:
+        if not line or line[0] == '$':
+            continue
+        kind = line[0]
+        if kind == '#':
+            time = int(line[1:])
+            continue
+        if kind in 'bB':
+            value, code = line[1:].split()
+        elif kind in 'rR':
+            continue
+        else:
+            value, code = kind, line[1:].strip()
+        if code in changes:
+            times, values = changes[code]
+            times.append(time)
+            values.append(int(value.translate(xz_to_zero),2))
+    return {name:Signal(name,width,*changes[code]) for code,names in ids.items() for name,width in names}
+
+def load_waves(path,signals=None):
+    """ Read a VCD file, FST files are converted on the fly with gtkwave's fst2vcd """
+    path = Path(path)
+    if path.suffix == '.fst':
+        process = subprocess.Popen(['fst2vcd',str(path)],stdout=subprocess.PIPE,encoding='utf-8')
+        try:
+            return parse_vcd(process.stdout,signals)
+        finally:
+            process.stdout.close()
+            if process.wait() != 0:
+                raise RuntimeError(f"fst2vcd failed on {path}")
+    with path.open() as f:
+        return parse_vcd(f,signals)
+
+def fire_times(edges,ready,valid):
+    return edges[(ready.at(edges) & valid.at(edges)).astype(bool)]
+
+def pair_fires(requests,responses):
+    """ Pair each request with the first response after it, a request seen
+    while waiting for a response is dropped, like BusMonitor does """
+    pairs = []
+    after = -1
+    for request in requests:
+        if request <= after:
+            continue
+        index = np.searchsorted(responses,request,side='right')
+        if index == len(responses):
+            break
+        after = responses[index]
+        pairs.append((request,after))
+    return np.array(pairs,dtype=np.int64).reshape(-1,2)
+
+class WaveTransactions:
+    """ Rebuild the Testbench monitor transactions from a wave dump """
+    bus_signals = [
+        "ir_addr_valid", "ir_addr_ready", "ir_addr",
+        "ir_data_valid", "ir_data_ready", "ir_data",
+        "dr_addr_valid", "dr_addr_ready", "dr_addr",
+        "dr_data_valid", "dr_data_ready", "dr_data",
+        "dw_data_addr_ready", "dw_data_addr_valid", "dw_data", "dw_addr", "dw_strobe",
+        "dw_resp_ready", "dw_resp_valid", "dw_resp",
+    ]
+    regfile_signals = ["rd_en", "rd", "rd_din", "rs1_en", "rs1", "rs1_dout", "rs2_en", "rs2", "rs2_dout"]
+    def __init__(self,path,top,prefix='',clock='clk',reset_n='rst'):
+        self.top = top
+        self.prefix = prefix
+        names = [f'{top}.{clock}',f'{top}.{reset_n}',
+            *[f'{top}.{prefix}{s}' for s in self.bus_signals],
+            *[f'{top}.regfile.{s}' for s in self.regfile_signals]]
+        self.signals = load_waves(path,names)
+        missing = [name for name in names if name not in self.signals]
+        if missing:
+            raise ValueError(f"Signals not found in {path}: {missing}")
+        edges = self.signals[f'{top}.{clock}'].rising_edges()
+        self.edges = edges[self.signals[f'{top}.{reset_n}'].at(edges).astype(bool)]
+    def bus(self,name):
+        return self.signals[f'{self.top}.{self.prefix}{name}']
+    def regfile(self,name):
+        return self.signals[f'{self.top}.regfile.{name}']
+    def channel_fires(self,channel):
+        return fire_times(self.edges,self.bus(f'{channel}_ready'),self.bus(f'{channel}_valid'))
+    def bus_read(self,bus_name):
+        pairs = pair_fires(self.channel_fires(f'{bus_name}_addr'),self.channel_fires(f'{bus_name}_data'))
+        addr = self.bus(f'{bus_name}_addr').at(pairs[:,0])
+        data = self.bus(f'{bus_name}_data').at(pairs[:,1])
+        return [BusReadTransaction(bus_name=f'bus_{bus_name}',addr=int(a),data=int(d)) for a,d in zip(addr,data)]
+    def bus_write(self):
+        pairs = pair_fires(self.channel_fires('dw_data_addr'),self.channel_fires('dw_resp'))
+        request = pairs[:,0]
+        columns = zip(self.bus('dw_addr').at(request),self.bus('dw_data').at(request),
+            self.bus('dw_strobe').at(request),self.bus('dw_resp').at(pairs[:,1]))
+        return [BusWriteTransaction(bus_name='bus_dw',addr=int(a),data=int(d),strobe=int(s),response=int(r))
+            for a,d,s,r in columns]
+    def regfile_write(self):
+        edges = self.edges[self.regfile('rd_en').at(self.edges).astype(bool)]
+        return [RegFileWriteTransaction(reg=int(r),data=int(d))
+            for r,d in zip(self.regfile('rd').at(edges),self.regfile('rd_din').at(edges))]
+    def regfile_read(self):
+        """ Enables are seen on one edge and the data read on the next one, like RegFileBfm.recv_rs """
+        en1 = self.regfile('rs1_en').at(self.edges).astype(bool)
+        en2 = self.regfile('rs2_en').at(self.edges).astype(bool)
+        selected = []
+        for index in np.flatnonzero(en1 | en2):
+            if (len(selected) == 0 or index > selected[-1] + 1) and index + 1 < len(self.edges):
+                selected.append(index)
+        selected = np.array(selected,dtype=np.int64)
+        edges = self.edges[selected + 1]
+        columns = zip(en1[selected],en2[selected],
+            self.regfile('rs1').at(edges),self.regfile('rs1_dout').at(edges),
+            self.regfile('rs2').at(edges),self.regfile('rs2_dout').at(edges))
+        transactions = []
+        for e1,e2,rs1,data1,rs2,data2 in columns:
+            if e1 and e2:
+                transactions.append(RegFileReadTransaction(int(rs1),int(data1),int(rs2),int(data2)))
+            elif e1:
+                transactions.append(RegFileReadTransaction(int(rs1),int(data1)))
+            else:
+                transactions.append(RegFileReadTransaction(int(rs2),int(data2)))
+        return transactions
+    def transactions(self):
+        """ Transactions of every Testbench monitor, by monitor name """
+        return dict(
+            bus_ir = self.bus_read('ir'),
+            bus_dr = self.bus_read('dr'),
+            bus_dw = self.bus_write(),
+            regfile_write = self.regfile_write(),
+            regfile_read = self.regfile_read(),
+        )
+
+def replay(transactions,monitors):
+    """ Feed extracted transactions to TraceMonitor stand-ins, by monitor name """
+    for name,monitor in monitors.items():
+        for transaction in transactions.get(name,[]):
+            monitor._recv(transaction)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract bus and regfile transactions from a VCD or FST dump')
+    parser.add_argument('waves',type=Path)
+    parser.add_argument('-top',default='Copperv2',help='Top level scope')
+    parser.add_argument('-prefix',default='bus_',help='Bus signal prefix, empty for copperv1')
+    parser.add_argument('-monitor',action='append',help='Only print these monitors')
+    args = parser.parse_args()
+    extracted = WaveTransactions(args.waves,args.top,args.prefix).transactions()
+    for name,transactions in extracted.items():
+        if args.monitor is None or name in args.monitor:
+            for transaction in transactions:
+                print(f'{name:<13} {transaction}')
+    print(' '.join(f'{name}={len(t)}' for name,t in extracted.items()),file=sys.stderr)
@@ -1,4 +1,7 @@
 import logging
+import collections
+import functools
+import math
 from typing import Tuple
 import cocotb
 from cocotb.decorators import RunningTask
@@ -119,45 +122,82 @@ class BusSeq(uvm.uvm_sequence):
             bus_write_tr.randomize()
             await self.finish_item(bus_write_tr)
 
+@dataclasses.dataclass
+class StressConfig:
+    count: int = 100000
+    write_ratio: float = 0.5
+    # Probability of issuing a request in each cycle the bus is free, 1 is back-to-back
+    issue_rate: float = 1.0
+    addr_mask: int = 0xFFFFFFFC
+    seed: int = 0
+
+def stress_items(config):
+    """ (delay, is_write, addr, data, strobe) of config.count interleaved reads
+    and writes, delay is the idle cycles before the request. Every field comes
+    from one getrandbits call, randint per field is several times slower. """
+    rng = random.Random(config.seed)
+    getrandbits = rng.getrandbits
+    uniform = rng.random
+    write_threshold = int(config.write_ratio*(1 << 16))
+    # Geometric idle time: failed issue attempts before the successful one
+    log_idle = math.log(1.0-config.issue_rate) if config.issue_rate < 1 else None
+    addr_mask = config.addr_mask
+    for _ in range(config.count):
+        bits = getrandbits(84)
+        delay = 0 if log_idle is None else int(math.log(1.0-uniform())/log_idle)
+        strobe = (bits >> 64) & 0xF
+        yield (delay, (bits >> 68) < write_threshold, bits & addr_mask,
+            (bits >> 32) & 0xFFFFFFFF, strobe if strobe != 0 else 0xF)
+
 @dataclasses.dataclass
 class ScoreboardConfig:
     input_count: int = 1
+    max_outstanding: int = 64
 
 class Scoreboard(uvm.uvm_component):
+    """ Compares every DUT item with the reference item of the same input as
+    soon as both have arrived, only the items still waiting for their pair are
+    kept. The test fails at the first mismatch or when more than
+    max_outstanding items of one side wait for the other side. """
     def __init__(self, name, parent, config):
         super().__init__(name, parent)
         self.config = config
     def build_phase(self):
-        self.fifos = [SimpleNamespace(
-            ref=uvm.uvm_tlm_analysis_fifo(f"ref_fifo_{i}", self),
-            dut=uvm.uvm_tlm_analysis_fifo(f"dut_fifo_{i}", self)) 
-            for i in range(self.config.input_count)]
-        self.ports = [SimpleNamespace(
-            ref=uvm.uvm_get_port(f"ref_port_{i}", self),
-            dut=uvm.uvm_get_port(f"dut_port_{i}", self)) 
+        self.pending = [SimpleNamespace(ref=collections.deque(),dut=collections.deque())
             for i in range(self.config.input_count)]
+        self.matched = [0]*self.config.input_count
+        self.max_pending = [0]*self.config.input_count
         self.exports = [SimpleNamespace(
-            ref=fifo.ref.analysis_export,
-            dut=fifo.dut.analysis_export)
-            for fifo in self.fifos]
-    def connect_phase(self):
-        for port,fifo in zip(self.ports,self.fifos):
-            port.ref.connect(fifo.ref.get_export)
-            port.dut.connect(fifo.dut.get_export)
+            ref=uvm_AnalysisImp(f"ref_export_{i}", self, functools.partial(self.write,i,'ref')),
+            dut=uvm_AnalysisImp(f"dut_export_{i}", self, functools.partial(self.write,i,'dut')))
+            for i in range(self.config.input_count)]
+    def write(self, index, side, item):
+        pending = self.pending[index]
+        other = pending.dut if side == 'ref' else pending.ref
+        if len(other) == 0:
+            queue = getattr(pending,side)
+            queue.append(item)
+            self.max_pending[index] = max(self.max_pending[index],len(queue))
+            if len(queue) > self.config.max_outstanding:
+                self.fail(f"Input {index}: {len(queue)} {side} items waiting, limit {self.config.max_outstanding}")
+            return
+        ref, dut = (item, other.popleft()) if side == 'ref' else (other.popleft(), item)
+        if ref != dut:
+            self.fail(f"Input {index} item {self.matched[index]}: {ref} != {dut}")
+        self.matched[index] += 1
+    def fail(self, message):
+        self.logger.error(f"FAILED: {message}")
+        raise AssertionError(message)
     def check_phase(self):
-        for port in self.ports:
-            while port.ref.can_get():
-                _, ref = port.ref.try_get()
-                dut_success, dut = port.dut.try_get()
-                if not dut_success:
-                    self.logger.critical(f"Reference transaction {ref} had no DUT transaction")
-                    assert False
-                else:
-                    if ref == dut:
-                        self.logger.info(f"PASSED: {ref} == {dut}")
-                    else:
-                        self.logger.error(f"FAILED: {ref} != {dut}")
-                        assert False
+        for index,pending in enumerate(self.pending):
+            if len(pending.ref) != 0:
+                self.fail(f"Input {index}: reference transaction {pending.ref[0]} had no DUT transaction")
+            if len(pending.dut) != 0:
+                self.fail(f"Input {index}: DUT transaction {pending.dut[0]} had no reference transaction")
+    def report_phase(self):
+        summary = ', '.join(f"input {i}: {matched} matched, at most {waiting} waiting"
+            for i,(matched,waiting) in enumerate(zip(self.matched,self.max_pending)))
+        self.logger.info(f"Scoreboard {summary}")
 
 class uvm_AnalysisImp(uvm.uvm_analysis_export):
     def __init__(self, name, parent, write_fn):
@@ -294,7 +334,6 @@ class WbAdapterEnv(uvm.uvm_env):
         self.scoreboard = Scoreboard("scoreboard", self, scoreboard_config)
         self.ref_model = WbAdapterRefModel('ref_model',self)
     def connect_phase(self):
-        print(self.scoreboard.fifos[1].dut.analysis_export,self.scoreboard.exports[1].dut)
         self.bus_agent.resp_ap.connect(self.scoreboard.exports[0].dut)
         self.ref_model.resp_ap.connect(self.scoreboard.exports[0].ref)
         self.bus_agent.req_ap.connect(self.scoreboard.exports[1].ref)
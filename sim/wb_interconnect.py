@@ -0,0 +1,312 @@
+import bisect
+import dataclasses
+import os
+import random
+from collections import deque
+
+import cocotb
+from cocotb.log import SimLog
+from cocotb.triggers import RisingEdge, ReadOnly, ClockCycles
+
+from bus_stats import LatencyHistogram
+
+@dataclasses.dataclass
+class Region:
+    name: str
+    base: int
+    size: int
+    slave: object = None
+    index: int = 0
+    def __contains__(self,addr):
+        return self.base <= addr < self.base + self.size
+
+class AddressMap:
+    """ Non overlapping [base, base+size) regions, a lookup bisects the sorted
+    bases. The slave index in the interconnect is the order of add. """
+    def __init__(self):
+        self.bases = []
+        self.sorted = []
+        self.regions = []
+    def add(self,name,base,size,slave=None):
+        if size <= 0:
+            raise ValueError(f"Region {name}: size {size}")
+        i = bisect.bisect_right(self.bases,base)
+        if i > 0 and self.sorted[i-1].base + self.sorted[i-1].size > base:
+            raise ValueError(f"Region {name} overlaps {self.sorted[i-1].name}")
+        if i < len(self.sorted) and base + size > self.sorted[i].base:
+            raise ValueError(f"Region {name} overlaps {self.sorted[i].name}")
+        region = Region(name,base,size,slave,len(self.regions))
+        self.bases.insert(i,base)
+        self.sorted.insert(i,region)
+        self.regions.append(region)
+        return region
+    def lookup(self,addr):
+        """ Region of addr, None if unmapped """
+        i = bisect.bisect_right(self.bases,addr) - 1
+        if i >= 0 and addr in self.sorted[i]:
+            return self.sorted[i]
+        return None
+    def __getitem__(self,name):
+        return next(r for r in self.regions if r.name == name)
+    def __len__(self):
+        return len(self.regions)
+    def wbxbar_parameters(self,addr_width):
+        """ SLAVE_ADDR and SLAVE_MASK of wbxbar, slave 0 in the low bits. The
+        decoder compares masked addresses, regions are naturally aligned powers of two. """
+        slave_addr = slave_mask = 0
+        for region in reversed(self.regions):
+            if region.size & (region.size - 1) or region.base & (region.size - 1):
+                raise ValueError(f"Region {region.name} is not a naturally aligned power of two")
+            mask = ~(region.size - 1) & ((1 << addr_width) - 1)
+            slave_addr = (slave_addr << addr_width) | region.base
+            slave_mask = (slave_mask << addr_width) | mask
+        return slave_addr, slave_mask
+
+class RamSlave:
+    """ Word memory, answers in the cycle after the request """
+    def __init__(self,size,data_width=32):
+        self.words = [0]*size
+        sel_width = data_width//8
+        self.byte_masks = [sum(0xFF << 8*byte for byte in range(sel_width) if sel >> byte & 1)
+            for sel in range(1 << sel_width)]
+    def latency(self):
+        return 0
+    def access(self,offset,request):
+        """ (read data, err) of a sink request """
+        if 'data' not in request:
+            return self.words[offset], False
+        # Without sel every byte is written, the last mask
+        mask = self.byte_masks[request.get('sel',-1)]
+        self.words[offset] = (self.words[offset] & ~mask) | (request['data'] & mask)
+        return None, False
+
+class LatencySlave(RamSlave):
+    """ Memory that takes latency cycles per request, a (min, max) pair draws
+    it per request. It answers one request at a time. """
+    def __init__(self,size,latency,data_width=32,seed=0):
+        super().__init__(size,data_width)
+        self.range = latency if isinstance(latency,tuple) else (latency,latency)
+        self.rng = random.Random(seed)
+    def latency(self):
+        low, high = self.range
+        return low if low == high else self.rng.randint(low,high)
+
+class ErrorSlave:
+    """ Ends every request with err """
+    def latency(self):
+        return 0
+    def access(self,offset,request):
+        return None, True
+
+async def serve(bfm,region):
+    """ Answer the requests of a pipelined sink BFM with the slave model of region """
+    slave = region.slave
+    async for request in bfm.sink_receive():
+        data, err = slave.access(request['addr'] - region.base,request)
+        latency = slave.latency()
+        if latency != 0:
+            await ClockCycles(bfm.clock,latency)
+        await bfm.sink_reply(data,err)
+
+def jain_index(values):
+    """ Jain's fairness index, 1 when every value is equal, 1/n when one takes all """
+    total = sum(values)
+    squares = sum(v*v for v in values)
+    return total*total/(len(values)*squares) if squares else 1.0
+
+class MasterStats:
+    """ Per cycle accounting of a master port of the interconnect. Arbitration
+    latency counts the cycles from cyc rising to the first accepted request,
+    request latency from acceptance to ack or err. """
+    def __init__(self,name,histogram_size=64):
+        self.name = name
+        self.requests = 0
+        self.acks = 0
+        self.errors = 0
+        self.stalls = 0
+        self.latency = LatencyHistogram(histogram_size)
+        self.arbitration = LatencyHistogram(histogram_size)
+        self.pending = deque()
+        self.cyc_start = None
+        self.granted = False
+    def sample(self,cycle,cyc,stb,stall,ack,err):
+        if not cyc:
+            self.cyc_start = None
+        elif self.cyc_start is None:
+            self.cyc_start = cycle
+            self.granted = False
+        if cyc and stb:
+            if stall:
+                self.stalls += 1
+            else:
+                self.requests += 1
+                self.pending.append(cycle)
+                if not self.granted:
+                    self.arbitration.add(cycle - self.cyc_start)
+                    self.granted = True
+        if (ack or err) and len(self.pending) != 0:
+            self.latency.add(cycle - self.pending.popleft())
+            if ack:
+                self.acks += 1
+            else:
+                self.errors += 1
+    @property
+    def completed(self):
+        return self.acks + self.errors
+    def to_dict(self,cycles):
+        return dict(
+            requests = self.requests,
+            acks = self.acks,
+            errors = self.errors,
+            stall_cycles = self.stalls,
+            transactions_per_cycle = self.completed/cycles if cycles else 0.0,
+            latency = self.latency.to_dict(),
+            arbitration = self.arbitration.to_dict(),
+        )
+
+class ContentionWindow:
+    """ Completed transactions of every master until the first one has completed
+    requests. Every master issues the same number of requests, so over the whole
+    run they all complete the same count. Only while all of them compete does
+    the share each one gets show the arbitration. """
+    def __init__(self,requests):
+        self.requests = requests
+        self.cycles = 0
+        self.completed = None
+        self.closed = False
+    def update(self,cycles,completed):
+        if self.closed:
+            return
+        self.cycles = cycles
+        self.completed = list(completed)
+        self.closed = self.requests is not None and max(self.completed) >= self.requests
+    @property
+    def fairness(self):
+        return jain_index(self.completed) if self.completed else 1.0
+    def to_dict(self,names):
+        completed = self.completed or [0]*len(names)
+        return dict(
+            cycles = self.cycles,
+            fairness = self.fairness,
+            transactions = dict(zip(names,completed)),
+            transactions_per_cycle = {name:c/self.cycles if self.cycles else 0.0 for name,c in zip(names,completed)},
+        )
+
+class XbarStats:
+    """ Aggregate throughput, fairness and latencies of the master ports,
+    fairness is measured over the contention window """
+    def __init__(self,master_bfms,histogram_size=64,window_requests=None):
+        self.log = SimLog('cocotb.'+__name__+'.'+self.__class__.__name__)
+        self.bfms = master_bfms
+        self.masters = [MasterStats(f"m{i}",histogram_size) for i in range(len(master_bfms))]
+        self.cycles = 0
+        self.window = ContentionWindow(window_requests)
+        cocotb.start_soon(self.sample())
+    async def sample(self):
+        clock = self.bfms[0].clock
+        ports = [(stats,bfm.bus) for stats,bfm in zip(self.masters,self.bfms)]
+        while True:
+            await RisingEdge(clock)
+            await ReadOnly()
+            if self.bfms[0].in_reset:
+                continue
+            self.cycles += 1
+            for stats,bus in ports:
+                stats.sample(self.cycles,bus.cyc.value.binstr == '1',bus.stb.value.binstr == '1',
+                    bus.stall.value.binstr == '1',bus.ack.value.binstr == '1',bus.err.value.binstr == '1')
+            self.window.update(self.cycles,[m.completed for m in self.masters])
+    @property
+    def fairness(self):
+        return self.window.fairness
+    def to_dict(self):
+        completed = sum(m.completed for m in self.masters)
+        return dict(
+            cycles = self.cycles,
+            transactions = completed,
+            transactions_per_cycle = completed/self.cycles if self.cycles else 0.0,
+            fairness = self.fairness,
+            window = self.window.to_dict([m.name for m in self.masters]),
+            masters = {m.name:m.to_dict(self.cycles) for m in self.masters},
+        )
+    def table(self):
+        from tabulate import tabulate
+        cycles = max(self.cycles,1)
+        window = self.window.to_dict([m.name for m in self.masters])['transactions_per_cycle']
+        masters = tabulate([[m.name,m.completed,f"{m.completed/cycles:.3f}",f"{window[m.name]:.3f}",m.errors,m.stalls,
+                f"{m.arbitration.mean:.2f}",m.arbitration.max,f"{m.latency.mean:.2f}",m.latency.percentile(99)]
+                for m in self.masters],
+            headers=['master','transactions','per cycle','window per cycle','errors','stall cycles',
+                'arbitration mean','arbitration max','latency mean','latency p99'])
+        total = sum(m.completed for m in self.masters)
+        return f"{masters}\n\n{total/cycles:.3f} transactions/cycle in {self.cycles} cycles, " \
+            f"fairness {self.fairness:.3f} over the first {self.window.cycles} cycles"
+
+@dataclasses.dataclass
+class XbarConfig:
+    masters: int = 3
+    # Requests of each master
+    count: int = 2000
+    burst: int = 8
+    seed: int = 0
+    addr_width: int = 30
+    data_width: int = 32
+    slow_latency: tuple = (1,4)
+    # Share of the bursts that go to the RAM, the slow device and the error device
+    weights: tuple = (0.7,0.25,0.05)
+    env_fields = ('masters','count','burst','seed')
+    def to_env(self):
+        return {f"XBAR_{name.upper()}":str(getattr(self,name)) for name in self.env_fields}
+    @classmethod
+    def from_env(cls,environ=os.environ):
+        return cls(**{name:int(environ[f"XBAR_{name.upper()}"]) for name in cls.env_fields
+            if f"XBAR_{name.upper()}" in environ})
+    def address_map(self):
+        address_map = AddressMap()
+        address_map.add('ram',0x0000,0x1000,RamSlave(0x1000,self.data_width))
+        address_map.add('slow',0x1000,0x400,LatencySlave(0x400,self.slow_latency,self.data_width,self.seed))
+        address_map.add('error',0x2000,0x1000,ErrorSlave())
+        return address_map
+
+master_ports = [('cyc',1,'input'),('stb',1,'input'),('we',1,'input'),('adr','AW','input'),('datwr','DW','input'),
+    ('sel','SW','input'),('stall',1,'output'),('ack',1,'output'),('err',1,'output'),('datrd','DW','output')]
+xbar_master_ports = dict(cyc='i_mcyc',stb='i_mstb',we='i_mwe',adr='i_maddr',datwr='i_mdata',sel='i_msel',
+    stall='o_mstall',ack='o_mack',err='o_merr',datrd='o_mdata')
+xbar_slave_ports = dict(cyc='o_scyc',stb='o_sstb',we='o_swe',adr='o_saddr',datwr='o_sdata',sel='o_ssel',
+    stall='i_sstall',ack='i_sack',err='i_serr',datrd='i_sdata')
+
+def harness_verilog(config,address_map):
+    """ wbxbar with its flattened master and slave vectors split into m<i>_*
+    and s<i>_* ports, the WishboneBfm signal names with a prefix """
+    widths = dict(AW=config.addr_width,DW=config.data_width,SW=config.data_width//8)
+    flip = dict(input='output',output='input')
+    ports = ['input wire clock','input wire reset']
+    for prefix,count,direction in (('m',config.masters,lambda d: d),('s',len(address_map),lambda d: flip[d])):
+        for i in range(count):
+            for name,width,port_direction in master_ports:
+                width = widths.get(width,width)
+                vector = f"[{width-1}:0] " if width != 1 else ""
+                ports.append(f"{direction(port_direction)} wire {vector}{prefix}{i}_{name}")
+    slave_addr, slave_mask = address_map.wbxbar_parameters(config.addr_width)
+    bits = len(address_map)*config.addr_width
+    connections = ['.i_clk(clock)','.i_reset(reset)']
+    for prefix,count,xbar_ports in (('m',config.masters,xbar_master_ports),('s',len(address_map),xbar_slave_ports)):
+        for name,xbar_port in xbar_ports.items():
+            signals = ','.join(f"{prefix}{i}_{name}" for i in reversed(range(count)))
+            connections.append(f".{xbar_port}({{{signals}}})")
+    separator = ',\n    '
+    return f"""`timescale 1ns/1ps
+module wbxbar_harness (
+    {separator.join(ports)}
+);
+wbxbar #(
+    .NM({config.masters}),
+    .NS({len(address_map)}),
+    .AW({config.addr_width}),
+    .DW({config.data_width}),
+    .SLAVE_ADDR({bits}'h{slave_addr:x}),
+    .SLAVE_MASK({bits}'h{slave_mask:x})
+) xbar (
+    {separator.join(connections)}
+);
+endmodule
+"""
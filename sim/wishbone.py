@@ -1,14 +1,28 @@
+import collections
+
+import cocotb
+from cocotb.queue import Queue
 from cocotb_utils import SimpleBfm
-from cocotb.triggers import RisingEdge, ReadOnly, NextTimeStep, ClockCycles
+from cocotb.triggers import RisingEdge, ReadOnly, NextTimeStep, ClockCycles, Event
 
 class WishboneBfm(SimpleBfm):
+    """ Classic Wishbone cycles by default, one transfer holds cyc/stb until
+    ack. With pipelined=True the source and sink follow the B4 pipelined
+    protocol: a request is accepted on every clock stb is high and stall low,
+    up to max_outstanding requests wait for their ack, acks come in order.
+    A slave ends a request with err instead of ack when the bus has err. """
     Signals = SimpleBfm.make_signals("WishboneBfm",[
         "adr", "datwr", "datrd",
         "we", "cyc", "stb", "ack",
-    ],optional=["sel"])
+    ],optional=["sel","stall","err"])
     has_sel = property(lambda self: self.bus.sel is not None)
-    def __init__(self, clock, entity = None, signals = None, reset=None, reset_n=None, period=10, period_unit="ns",prefix=None):
+    has_stall = property(lambda self: self.bus.stall is not None)
+    has_err = property(lambda self: self.bus.err is not None)
+    def __init__(self, clock, entity = None, signals = None, reset=None, reset_n=None, period=10, period_unit="ns",prefix=None,
+            pipelined=False, max_outstanding=1):
         super().__init__(clock, signals=signals, entity=entity, reset=reset, reset_n=reset_n, period=period, period_unit=period_unit, prefix=prefix)
+        self.pipelined = pipelined
+        self.max_outstanding = max_outstanding
     def source_init(self):
         self.bus.cyc.setimmediatevalue(0)
         self.bus.stb.setimmediatevalue(0)
@@ -17,14 +31,29 @@ class WishboneBfm(SimpleBfm):
         self.bus.datwr.setimmediatevalue(0)
         if self.has_sel:
             self.bus.sel.setimmediatevalue(0)
+        if self.pipelined:
+            self.source_requests = Queue(maxsize=self.max_outstanding)
+            cocotb.start_soon(self.source_pipeline())
     def sink_init(self):
         self.bus.ack.setimmediatevalue(0)
         self.bus.datrd.setimmediatevalue(0)
+        if self.has_stall:
+            self.bus.stall.setimmediatevalue(0)
+        if self.has_err:
+            self.bus.err.setimmediatevalue(0)
+        if self.pipelined:
+            self.sink_requests = Queue()
+            self.sink_responses = collections.deque()
+            cocotb.start_soon(self.sink_pipeline())
     def source_read(self,addr):
         return self.source_read_write(addr=addr,wr_enable=False)
     def source_write(self,data,addr,sel=None):
         return self.source_read_write(data=data,addr=addr,sel=sel,wr_enable=True)
     async def source_read_write(self,data=None,addr=None,sel=None,wr_enable=False):
+        if self.pipelined:
+            done = await self.source_issue(data,addr,sel,wr_enable)
+            await done.wait()
+            return done.data
         await RisingEdge(self.clock)
         self.bus.cyc.value = 1
         self.bus.stb.value = 1
@@ -57,8 +86,119 @@ class WishboneBfm(SimpleBfm):
                 if self.bus.we.value.binstr == "0":
                     received['data'] = self.bus.datrd.value.integer
                 yield received
+    async def source_issue(self,data=None,addr=None,sel=None,wr_enable=False):
+        """ Queue a pipelined request, returns an Event set with the response
+        (ack and data of reads) when it is acknowledged. Waits while the
+        request queue is full, so a producer stays a few requests ahead. """
+        if wr_enable and sel is None and self.has_sel:
+            sel = int("1"*self.bus.sel.value.n_bits,2)
+        done = Event()
+        await self.source_requests.put((dict(addr=addr,data=data,sel=sel,we=wr_enable),done))
+        return done
+    def source_drive(self,request):
+        self.bus.adr.value = request['addr']
+        self.bus.we.value = request['we']
+        if request['we']:
+            self.bus.datwr.value = request['data']
+            if self.has_sel:
+                self.bus.sel.value = request['sel']
+    async def source_pipeline(self):
+        """ Drive the queued requests back to back, a new one every clock
+        stall is low and fewer than max_outstanding wait for their ack """
+        current = None
+        waiting = collections.deque()
+        stalled = False
+        # Response of the oldest request sampled in the last ReadOnly, None without ack or err
+        response = None
+        while True:
+            if current is None and len(waiting) == 0 and self.source_requests.empty():
+                # Idle, cyc and stb are low until the next request
+                current = await self.source_requests.get()
+                self.source_drive(current[0])
+                self.bus.cyc.value = 1
+                self.bus.stb.value = 1
+            else:
+                await RisingEdge(self.clock)
+                if self.in_reset:
+                    current = None
+                    waiting.clear()
+                    stalled = False
+                    response = None
+                    self.bus.cyc.value = 0
+                    self.bus.stb.value = 0
+                    continue
+                # The transfers of the cycle sampled in the last ReadOnly happen on this edge
+                if current is not None and not stalled:
+                    waiting.append(current)
+                    current = None
+                if response is not None:
+                    _,done = waiting.popleft()
+                    done.set(response)
+                if current is None and len(waiting) < self.max_outstanding and not self.source_requests.empty():
+                    current = self.source_requests.get_nowait()
+                    self.source_drive(current[0])
+                self.bus.stb.value = current is not None
+                self.bus.cyc.value = current is not None or len(waiting) != 0
+            await ReadOnly()
+            stalled = current is not None and self.has_stall and self.bus.stall.value.binstr == "1"
+            errored = self.has_err and self.bus.err.value.binstr == "1"
+            response = None
+            if errored or self.bus.ack.value.binstr == "1":
+                if current is None and len(waiting) == 0:
+                    raise RuntimeError("Wishbone ack without an outstanding request")
+                oldest = waiting[0] if len(waiting) != 0 else current
+                response = dict(ack=not errored)
+                if self.has_err:
+                    response['err'] = errored
+                if not oldest[0]['we'] and not errored:
+                    response['data'] = self.bus.datrd.value.integer
+    async def sink_pipeline(self):
+        """ Accept a request every clock stb is high and stall is not, stall
+        while max_outstanding requests wait for a response. The responses
+        queued by sink_reply are acknowledged one per clock in order. """
+        outstanding = 0
+        stalled = ending = False
+        request = None
+        while True:
+            await RisingEdge(self.clock)
+            if self.in_reset:
+                outstanding = 0
+                request = None
+                self.sink_responses.clear()
+                self.bus.ack.value = 0
+                if self.has_err:
+                    self.bus.err.value = 0
+                if self.has_stall:
+                    self.bus.stall.value = 0
+                continue
+            if request is not None:
+                self.sink_requests.put_nowait(request)
+                outstanding += 1
+            if ending:
+                outstanding -= 1
+            ending = len(self.sink_responses) != 0 and outstanding != 0
+            data, err = self.sink_responses.popleft() if ending else (None,False)
+            self.bus.ack.value = ending and not err
+            if self.has_err:
+                self.bus.err.value = err
+            if data is not None:
+                self.bus.datrd.value = data
+            stalled = outstanding - ending >= self.max_outstanding
+            if self.has_stall:
+                self.bus.stall.value = stalled
+            await ReadOnly()
+            request = None
+            if not stalled and self.bus.cyc.value.binstr == "1" and self.bus.stb.value.binstr == "1":
+                request = dict(addr=int(self.bus.adr.value))
+                if self.bus.we.value.binstr == "1":
+                    request['data'] = int(self.bus.datwr.value)
+                    if self.has_sel:
+                        request['sel'] = int(self.bus.sel.value)
     async def sink_receive(self):
         """ Receive WB sink transaction: addr, datwr and sel """
+        if self.pipelined:
+            while True:
+                yield await self.sink_requests.get()
         while True:
             await RisingEdge(self.clock)
             await ReadOnly()
@@ -73,11 +213,19 @@ class WishboneBfm(SimpleBfm):
                         received['sel'] = int(self.bus.sel.value)
                 self.log.debug(f"WB sink received {received}")
                 yield received
-    async def sink_reply(self,data=None):
+    async def sink_reply(self,data=None,err=False):
+        """ Acknowledge the request, or end it with err """
+        if err and not self.has_err:
+            raise ValueError("Wishbone bus without err")
+        if self.pipelined:
+            # Acknowledged by sink_pipeline in request order
+            self.sink_responses.append((data,err))
+            return
+        end = self.bus.err if err else self.bus.ack
         await RisingEdge(self.clock)
-        self.bus.ack.value = 1
-        if self.bus.we.value.binstr == "0":
+        end.value = 1
+        if self.bus.we.value.binstr == "0" and not err:
             self.bus.datrd.value = data
         await self.wait_for_signal(self.bus.stb,0)
-        self.bus.ack.value = 0
+        end.value = 0
 